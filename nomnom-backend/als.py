@@ -0,0 +1,150 @@
+# ----------------------------------------------------------------------
+# FILE: als.py (Implicit-Feedback ALS Candidate Engine)
+# ----------------------------------------------------------------------
+# Alternating least squares over a sparse user x restaurant confidence
+# matrix (Hu, Koren & Volinsky, "Collaborative Filtering for Implicit
+# Feedback Datasets"). Unlike Surprise's SVD it learns from every signal
+# we log - meals, reviews and swipe interactions - and each half-step
+# updates all users (or all restaurants) as batched float32 linear systems
+# spread across a thread pool.
+# ----------------------------------------------------------------------
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from threadpoolctl import threadpool_limits
+
+from model_store import FactorModel
+
+# How much each logged signal adds to r_ui, the raw user x restaurant
+# preference. Confidence is then c_ui = 1 + ALPHA * r_ui.
+MEAL_WEIGHT = 1.0
+REVIEW_WEIGHT = 0.5 # multiplied by the implicit rating (1-7)
+INTERACTION_WEIGHT = 0.5 # any swipe other than a decline
+ALPHA = 10.0
+
+ALS_THREADS = int(os.environ.get('ALS_THREADS') or os.cpu_count() or 1)
+# Upper bound on non-zeros per exact-solver batch; each one costs factors^2
+# floats. Conjugate gradient batches only cost factors floats, so they are
+# 16x larger.
+_BATCH_NNZ = 4096
+
+def build_confidence_matrix(implicit_reviews_df, meals_df, interactions_df, user_ids=None, item_ids=None):
+    """
+    Returns (R, user_ids, item_ids) where R is a float32 CSR matrix of raw
+    preferences r_ui. Passing item_ids (e.g. the whole catalogue) keeps
+    restaurants nobody has visited yet in the model.
+    """
+    parts = []
+    if meals_df is not None and not meals_df.empty:
+        parts.append(meals_df[['user_id', 'restaurant_id']].assign(weight=MEAL_WEIGHT))
+    if implicit_reviews_df is not None and not implicit_reviews_df.empty:
+        parts.append(implicit_reviews_df[['user_id', 'restaurant_id']].assign(weight=REVIEW_WEIGHT * implicit_reviews_df['implicit_rating'].astype(float)))
+    if interactions_df is not None and not interactions_df.empty:
+        accepted = interactions_df[interactions_df['user_action'] != 'decline']
+        parts.append(accepted[['user_id', 'restaurant_id']].assign(weight=INTERACTION_WEIGHT))
+    events = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['user_id', 'restaurant_id', 'weight'])
+    events = events.dropna(subset=['user_id', 'restaurant_id'])
+
+    user_ids = pd.Index(pd.unique(events['user_id']) if user_ids is None else user_ids)
+    item_ids = pd.Index(pd.unique(events['restaurant_id']) if item_ids is None else item_ids)
+    rows = user_ids.get_indexer(events['user_id']); cols = item_ids.get_indexer(events['restaurant_id'])
+    keep = (rows >= 0) & (cols >= 0)
+    R = csr_matrix((events['weight'].to_numpy(np.float32)[keep], (rows[keep], cols[keep])), shape=(len(user_ids), len(item_ids)), dtype=np.float32)
+    R.sum_duplicates()
+    return R, user_ids.to_numpy(), item_ids.to_numpy()
+
+def _batches(indptr, max_nnz=_BATCH_NNZ):
+    """Splits CSR rows into contiguous [start, end) ranges of about max_nnz non-zeros."""
+    start = 0; n_rows = len(indptr) - 1
+    while start < n_rows:
+        end = int(np.searchsorted(indptr, indptr[start] + max_nnz, side='right')) - 1
+        end = min(max(end, start + 1), n_rows)
+        yield start, end
+        start = end
+
+def _solve_batch(R, fixed, YtY, reg, alpha, start, end, out):
+    """Solves x_u = (YtY + Yu^T (Cu - I) Yu + reg*I)^-1 Yu^T Cu p_u exactly for rows start..end."""
+    indptr = R.indptr[start:end + 1]; lo, hi = indptr[0], indptr[-1]
+    active = np.diff(indptr) > 0
+    out[start:end][~active] = 0
+    if not active.any(): return
+    cols = R.indices[lo:hi]; conf = alpha * R.data[lo:hi] # c_ui - 1
+    Y = fixed[cols]
+    starts = (indptr[:-1] - lo)[active]
+    # Per-row sums over each row's non-zeros, via reduceat on the CSR offsets.
+    A = np.add.reduceat(np.einsum('n,nk,nl->nkl', conf, Y, Y), starts, axis=0)
+    b = np.add.reduceat(Y * (1.0 + conf)[:, None], starts, axis=0)
+    A += YtY; A += reg * np.eye(fixed.shape[1], dtype=fixed.dtype)
+    out[start:end][active] = np.linalg.solve(A, b[..., None])[..., 0]
+
+def _cg_batch(R, fixed, YtY, reg, alpha, start, end, out, cg_steps):
+    """
+    Improves rows start..end of `out` in place with a few conjugate gradient
+    steps on the same system, warm-started from the previous iteration.
+    Costs O(nnz * factors) per step instead of O(nnz * factors^2).
+    """
+    indptr = R.indptr[start:end + 1]; lo, hi = indptr[0], indptr[-1]
+    counts = np.diff(indptr); active = counts > 0
+    out[start:end][~active] = 0
+    if not active.any(): return
+    cols = R.indices[lo:hi]; conf = alpha * R.data[lo:hi] # c_ui - 1
+    Y = fixed[cols]; row = np.repeat(np.arange(active.sum()), counts[active])
+    starts = (indptr[:-1] - lo)[active]
+    A_reg = YtY + reg * np.eye(fixed.shape[1], dtype=fixed.dtype)
+
+    def apply_A(V):
+        return V @ A_reg + np.add.reduceat(Y * (conf * np.einsum('nk,nk->n', Y, V[row]))[:, None], starts, axis=0)
+
+    X = out[start:end][active]
+    r = np.add.reduceat(Y * (1.0 + conf)[:, None], starts, axis=0) - apply_A(X)
+    p = r.copy(); rs_old = np.einsum('nk,nk->n', r, r)
+    for _ in range(cg_steps):
+        Ap = apply_A(p)
+        denom = np.einsum('nk,nk->n', p, Ap)
+        step = np.divide(rs_old, denom, out=np.zeros_like(rs_old), where=denom > 1e-20)
+        X += step[:, None] * p; r -= step[:, None] * Ap
+        rs_new = np.einsum('nk,nk->n', r, r)
+        p = r + np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 1e-20)[:, None] * p
+        rs_old = rs_new
+    out[start:end][active] = X
+
+def _half_step(R, fixed, current, reg, alpha, cg_steps, pool):
+    out = current.copy()
+    YtY = fixed.T @ fixed
+    if cg_steps:
+        futures = [pool.submit(_cg_batch, R, fixed, YtY, reg, alpha, start, end, out, cg_steps) for start, end in _batches(R.indptr, _BATCH_NNZ * 16)]
+    else:
+        futures = [pool.submit(_solve_batch, R, fixed, YtY, reg, alpha, start, end, out) for start, end in _batches(R.indptr)]
+    for f in futures: f.result()
+    return out
+
+def train_als(R, factors=50, reg=0.1, iterations=15, alpha=ALPHA, threads=None, random_state=None, cg_steps=3):
+    """
+    Fits implicit ALS on the raw preference matrix R. Returns (user_factors,
+    item_factors) as float32. cg_steps=0 solves every least-squares system
+    exactly; otherwise each half-step runs that many conjugate gradient steps.
+    """
+    threads = threads or ALS_THREADS
+    rng = np.random.default_rng(random_state)
+    X = (rng.standard_normal((R.shape[0], factors)) * 0.01).astype(np.float32)
+    Y = (rng.standard_normal((R.shape[1], factors)) * 0.01).astype(np.float32)
+    R = R.tocsr().astype(np.float32); Rt = R.T.tocsr()
+    # Parallelism comes from our own thread pool; keep BLAS single-threaded
+    # inside it so the two don't oversubscribe the cores.
+    with threadpool_limits(limits=1 if threads > 1 else None), ThreadPoolExecutor(max_workers=threads) as pool:
+        for it in range(iterations):
+            start = time.time()
+            X = _half_step(R, Y, X, reg, alpha, cg_steps, pool)
+            Y = _half_step(Rt, X, Y, reg, alpha, cg_steps, pool)
+            print(f"[DEBUG] ALS iteration {it + 1}/{iterations} done in {time.time() - start:.2f}s")
+    return X, Y
+
+def fit_als_factors(implicit_reviews_df, meals_df, interactions_df, item_ids=None, factors=50, reg=0.1, iterations=15, alpha=ALPHA, threads=None, random_state=None, cg_steps=3):
+    """Builds the confidence matrix, trains ALS, and wraps the factors as an unclipped FactorModel."""
+    R, user_ids, item_ids = build_confidence_matrix(implicit_reviews_df, meals_df, interactions_df, item_ids=item_ids)
+    X, Y = train_als(R, factors=factors, reg=reg, iterations=iterations, alpha=alpha, threads=threads, random_state=random_state, cg_steps=cg_steps)
+    return FactorModel(user_ids, item_ids, 0.0, np.zeros(len(user_ids), np.float32), np.zeros(len(item_ids), np.float32), X, Y, kind='als', clip=None)
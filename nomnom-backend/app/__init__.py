@@ -38,6 +38,10 @@ def create_app(config_class=Config):
     bcrypt.init_app(app)
     jwt.init_app(app)
     
+    # Request timing for /api/metrics and the X-Request-Timing breakdown
+    import metrics
+    metrics.init_app(app)
+    
     # --- Import and Register Blueprints ---
     # Blueprints are used to organize routes into different modules.
     from app.routes import main as main_blueprint
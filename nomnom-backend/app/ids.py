@@ -0,0 +1,88 @@
+# =======================================================================
+# app/ids.py
+# -----------------------------------------------------------------------
+# Allocates the human-readable ids for new users (USR_001), meals
+# (MEAL_001_001, numbered per user), reviews (REV_001) and swipe
+# interactions (INT_000001, handed out in blocks). Each series
+# keeps its last number in the id_counter table and is advanced with a
+# single UPDATE ... RETURNING, so no two writers get the same id and no
+# table has to be sorted to find the next one. A series is seeded from
+# the highest id already in its table the first time it is used, which
+# keeps it compatible with the seeded CSV ids. The table itself is created
+# on first use if scripts/migrate_indexes.py hasn't made it yet.
+#
+# On Postgres the counter is advanced in its own short transaction, like
+# a sequence, so concurrent writers never wait on each other's requests;
+# an id whose request later fails is simply skipped. SQLite has a single
+# writer anyway, so there the counter moves inside the caller's
+# transaction rather than locking against it.
+# =======================================================================
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import User, Meal, Review, InteractionLog, IdCounter
+from data_store import has_table
+
+def _highest_number(conn, id_column, where=None):
+    """The largest numeric suffix among existing ids, or 0."""
+    stmt = select(id_column) if where is None else select(id_column).where(where)
+    suffixes = (value.rsplit('_', 1)[-1] for value in conn.execute(stmt).scalars())
+    return max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=0)
+
+def _advance(conn, name, id_column, where=None, count=1):
+    table = IdCounter.__table__
+    bump = update(table).where(table.c.name == name).values(value=table.c.value + count).returning(table.c.value)
+    value = conn.execute(bump).scalar()
+    if value is None:
+        # First use of this series. Concurrent first uses race on the
+        # insert, not the ids: only one seed row lands, and each caller
+        # still gets its own number from the UPDATE.
+        insert = postgresql_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+        conn.execute(insert(table).values(name=name, value=_highest_number(conn, id_column, where)).on_conflict_do_nothing(index_elements=['name']))
+        value = conn.execute(bump).scalar()
+    return value
+
+def _ensure_counter_table():
+    """Creates id_counter on first use, for databases that haven't run scripts/migrate_indexes.py."""
+    if has_table('id_counter'): return
+    with db.engine.begin() as conn: conn.execute(CreateTable(IdCounter.__table__, if_not_exists=True))
+
+def _next_number(name, id_column, where=None, count=1):
+    """Reserves `count` numbers of a series and returns the last one."""
+    _ensure_counter_table()
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn: return _advance(conn, name, id_column, where, count)
+    return _advance(db.session.connection(), name, id_column, where, count)
+
+def next_user_id():
+    return f"USR_{_next_number('user', User.id):03}"
+
+def next_meal_id(user_id):
+    return f"MEAL_{user_id.split('_')[1]}_{_next_number(f'meal:{user_id}', Meal.id, Meal.user_id == user_id):03}"
+
+def next_review_id():
+    return f"REV_{_next_number('review', Review.id):03}"
+
+def next_interaction_ids(count):
+    """A block of `count` consecutive interaction ids, reserved with a single counter update."""
+    last = _next_number('interaction', InteractionLog.id, count=count)
+    return [f"INT_{n:06}" for n in range(last - count + 1, last + 1)]
+
+def raise_counters(conn):
+    """
+    Moves every counter that already exists past the highest id now in its
+    table. Run after loading rows with explicit ids (scripts/bulk_load.py),
+    so the next allocation can't hand out an id that was just loaded.
+    Counters never move backwards, so ids already handed out stay unique.
+    """
+    highest = {'user': _highest_number(conn, User.id), 'review': _highest_number(conn, Review.id), 'interaction': _highest_number(conn, InteractionLog.id)}
+    for user_id, meal_id in conn.execute(select(Meal.user_id, Meal.id)):
+        suffix = meal_id.rsplit('_', 1)[-1]
+        if user_id and suffix.isdigit(): highest[f'meal:{user_id}'] = max(highest.get(f'meal:{user_id}', 0), int(suffix))
+    table = IdCounter.__table__
+    stmt = update(table).where(table.c.name == bindparam('counter'), table.c.value < bindparam('highest')).values(value=bindparam('highest'))
+    conn.execute(stmt, [{'counter': name, 'highest': value} for name, value in highest.items()])
@@ -8,6 +8,10 @@ from app import db
 import datetime
 
 # Each class represents a table in the database.
+# Secondary indexes cover the per-user lookups that /api/profile, /api/rate
+# and the recommender run on every request. Existing databases pick them up
+# with scripts/migrate_indexes.py; scripts/explain_queries.py checks that
+# the query planner actually uses them.
 
 class User(db.Model):
     id = db.Column(db.String(20), primary_key=True)
@@ -24,6 +28,12 @@ class User(db.Model):
     last_login = db.Column(db.DateTime, nullable=True)
     password = db.Column(db.String(120), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # Login and register match on lower(username) / lower(email), which the
+    # plain unique indexes above can't serve.
+    __table_args__ = (
+        db.Index('ix_user_lower_username', db.func.lower(username)),
+        db.Index('ix_user_lower_email', db.func.lower(email)),
+    )
 
 class Restaurant(db.Model):
     id = db.Column(db.String(20), primary_key=True)
@@ -52,6 +62,11 @@ class Meal(db.Model):
     date = db.Column(db.Date, nullable=False)
     day = db.Column(db.String(20), nullable=True)
     meal_time = db.Column(db.String(20), nullable=True)
+    __table_args__ = (
+        db.Index('ix_meal_user_id_date', 'user_id', 'date'),
+        db.Index('ix_meal_meal_time_restaurant_id', 'meal_time', 'restaurant_id'),
+        db.Index('ix_meal_date', 'date'),
+    )
 
 class Review(db.Model):
     id = db.Column(db.String(20), primary_key=True)
@@ -61,6 +76,11 @@ class Review(db.Model):
     rating = db.Column(db.Integer, nullable=False)
     price_satisfaction = db.Column(db.Boolean, nullable=True)
     visit_frequency = db.Column(db.Integer, nullable=True)
+    __table_args__ = (
+        db.Index('ix_review_user_id_restaurant_id_date', 'user_id', 'restaurant_id', 'date'),
+        db.Index('ix_review_restaurant_id', 'restaurant_id'),
+        db.Index('ix_review_date', 'date'),
+    )
 
 class InteractionLog(db.Model):
     id = db.Column(db.String(20), primary_key=True)
@@ -72,3 +92,59 @@ class InteractionLog(db.Model):
     swipe_time_sec = db.Column(db.Integer, nullable=True)
     final_ordered = db.Column(db.Boolean, nullable=True)
     user_feedback = db.Column(db.Text, nullable=True)
+    __table_args__ = (
+        db.Index('ix_interaction_log_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_interaction_log_timestamp', 'timestamp'),
+    )
+
+# --- Materialized Recommender Features ---
+# Derived numeric columns, written alongside the rows they describe so the
+# recommender can read them instead of recomputing them (see features.py).
+
+class RestaurantFeature(db.Model):
+    restaurant_id = db.Column(db.String(20), db.ForeignKey('restaurant.id'), primary_key=True)
+    price_min_value = db.Column(db.Float, nullable=True)
+    price_max_value = db.Column(db.Float, nullable=True)
+    price_mid = db.Column(db.Float, nullable=True)
+    open_minute = db.Column(db.Integer, nullable=True)
+    close_minute = db.Column(db.Integer, nullable=True)
+    always_open = db.Column(db.Boolean, nullable=False)
+
+class MealFeature(db.Model):
+    meal_id = db.Column(db.String(20), db.ForeignKey('meal.id'), primary_key=True)
+    distance_travelled = db.Column(db.Float, nullable=True)
+
+class ReviewFeature(db.Model):
+    review_id = db.Column(db.String(20), db.ForeignKey('review.id'), primary_key=True)
+    implicit_rating = db.Column(db.Float, nullable=False)
+
+class UserRestaurantStats(db.Model):
+    """Running per-restaurant counters a user's recommender profile is derived from (see profiles.py)."""
+    user_id = db.Column(db.String(20), db.ForeignKey('user.id'), primary_key=True)
+    restaurant_id = db.Column(db.String(20), db.ForeignKey('restaurant.id'), primary_key=True)
+    weekday_meals = db.Column(db.Integer, nullable=False, default=0)
+    weekend_meals = db.Column(db.Integer, nullable=False, default=0)
+    declines = db.Column(db.Integer, nullable=False, default=0)
+
+# --- Profile Page Stats ---
+# Running totals behind /api/profile, kept current by /api/rate so the page
+# costs the same however long a user's history is.
+
+class UserStats(db.Model):
+    user_id = db.Column(db.String(20), db.ForeignKey('user.id'), primary_key=True)
+    total_meals = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+
+class UserTagStats(db.Model):
+    """Tag histogram: how many distinct restaurants the user has eaten at carry each tag."""
+    user_id = db.Column(db.String(20), db.ForeignKey('user.id'), primary_key=True)
+    tag = db.Column(db.String(50), primary_key=True)
+    restaurant_count = db.Column(db.Integer, nullable=False, default=0)
+
+# --- ID Allocation ---
+
+class IdCounter(db.Model):
+    """The last number handed out for each id series (see app/ids.py)."""
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
@@ -13,16 +13,70 @@ from zoneinfo import ZoneInfo
 # Third-party imports
 from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from sqlalchemy import func
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # Local application imports
 from app import db, bcrypt
-from app.models import User, Restaurant, Meal, Review, InteractionLog
-from recommender import get_recommendations
+from app.ids import next_user_id, next_meal_id, next_review_id, next_interaction_ids
+from app.models import User, Restaurant, Meal, Review, InteractionLog, MealFeature, ReviewFeature, UserRestaurantStats, UserStats, UserTagStats
+from recommender import get_recommendations, update_user_factors
+from data_store import meals_changed, has_table
+from features import meal_distance, implicit_rating, meal_counter, PROFILE_COUNTERS
+from interaction_queue import get_interaction_queue, swipe_event
+from metrics import span, render_metrics
 
 # Create a Blueprint object. All routes will be registered with this blueprint.
 main = Blueprint('main', __name__)
 
+MAX_INTERACTION_BATCH = 1000
+
+def upsert_increments(model, keys, increments, returning=()):
+    """
+    Adds `increments` to the counters of the `model` row with primary key
+    `keys`, inserting it if needed, inside the current transaction. The
+    upsert is a single statement, so concurrent writers can't lose an
+    increment. Returns the `returning` columns of the updated row.
+    """
+    insert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    table = model.__table__
+    stmt = insert(table).values(**keys, **increments).on_conflict_do_update(index_elements=list(keys), set_={c: table.c[c] + n for c, n in increments.items()})
+    if returning: return db.session.execute(stmt.returning(*(table.c[c] for c in returning))).one()
+    db.session.execute(stmt)
+
+def increment_user_restaurant_stats(user_id, restaurant_id, counter):
+    """Adds 1 to one of a user's per-restaurant profile counters (see profiles.py); returns the row's meal total."""
+    weekday, weekend = upsert_increments(UserRestaurantStats, {'user_id': user_id, 'restaurant_id': restaurant_id}, {c: int(c == counter) for c in PROFILE_COUNTERS}, returning=('weekday_meals', 'weekend_meals'))
+    return weekday + weekend
+
+def record_profile_stats(user_id, restaurant, meals=0, rating_delta=0, new_ratings=0, first_visit=False):
+    """
+    Applies one write's changes to the user's /api/profile totals and, on a
+    first visit, to their tag histogram. Users without a user_stats row (or
+    databases without the table) are left alone: /api/profile aggregates
+    their raw rows instead.
+    """
+    if not has_table('user_stats'): return
+    updated = UserStats.query.filter_by(user_id=user_id).update({UserStats.total_meals: UserStats.total_meals + meals, UserStats.rating_sum: UserStats.rating_sum + rating_delta, UserStats.rating_count: UserStats.rating_count + new_ratings}, synchronize_session=False)
+    if updated and first_visit and restaurant and has_table('user_tag_stats'):
+        for tag in (restaurant.tag_1, restaurant.tag_2, restaurant.tag_3):
+            if tag: upsert_increments(UserTagStats, {'user_id': user_id, 'tag': tag}, {'restaurant_count': 1})
+
+# Fallback for users with no user_stats row (e.g. a database that predates
+# the table and hasn't run scripts/build_features.py): the same totals,
+# aggregated from the raw rows in one round trip.
+PROFILE_STATS_SQL = text("""
+    SELECT (SELECT COUNT(*) FROM meal WHERE user_id = :user_id) AS total_meals,
+           (SELECT COALESCE(SUM(rating), 0) FROM review WHERE user_id = :user_id) AS rating_sum,
+           (SELECT COUNT(rating) FROM review WHERE user_id = :user_id) AS rating_count,
+           (SELECT tag FROM (
+                SELECT tag_1 AS tag FROM restaurant WHERE id IN (SELECT restaurant_id FROM meal WHERE user_id = :user_id)
+                UNION ALL SELECT tag_2 FROM restaurant WHERE id IN (SELECT restaurant_id FROM meal WHERE user_id = :user_id)
+                UNION ALL SELECT tag_3 FROM restaurant WHERE id IN (SELECT restaurant_id FROM meal WHERE user_id = :user_id)
+            ) AS tags WHERE tag IS NOT NULL AND tag <> '' GROUP BY tag ORDER BY COUNT(*) DESC, tag LIMIT 1) AS favorite_cuisine
+""")
+
 # =======================================================================
 # API Endpoints
 # =======================================================================
@@ -41,15 +95,21 @@ def register():
         try:
             dob = datetime.datetime.strptime(dob_str, "%Y-%m-%d").date(); today = datetime.date.today(); age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
         except ValueError: return jsonify({'message': 'Invalid date format'}), 400
-    last_user = User.query.order_by(User.id.desc()).first()
-    next_id = f"USR_{int(last_user.id.split('_')[1]) + 1:03}" if last_user else "USR_001"
-    if User.query.filter(func.lower(User.username) == username).first(): return jsonify({'message': 'Username already exists'}), 409
-    if User.query.filter(func.lower(User.email) == email).first(): return jsonify({'message': 'Email already exists'}), 409
-    hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
+    with span('db.register.lookup'):
+        username_taken = User.query.filter(func.lower(User.username) == username).first() is not None
+        email_taken = not username_taken and User.query.filter(func.lower(User.email) == email).first() is not None
+    if username_taken: return jsonify({'message': 'Username already exists'}), 409
+    if email_taken: return jsonify({'message': 'Email already exists'}), 409
+    with span('auth.hash_password'): hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
     default_location = "4.38284661761217, 100.97441771522674"; lat, lon = map(float, default_location.split(", "))
-    new_user = User(id=next_id, username=username, name=name, email=email, phone=phone, dob=dob, age=age, gender="M", location=default_location, latitude=lat, longitude=lon, last_login=None, password=hashed_pw)
     try:
-        db.session.add(new_user); db.session.commit()
+        with span('db.register.insert'):
+            next_id = next_user_id()
+            new_user = User(id=next_id, username=username, name=name, email=email, phone=phone, dob=dob, age=age, gender="M", location=default_location, latitude=lat, longitude=lon, last_login=None, password=hashed_pw)
+            db.session.add(new_user)
+            # Until scripts/build_features.py creates user_stats, /api/profile aggregates the raw rows instead.
+            if has_table('user_stats'): db.session.add(UserStats(user_id=next_id, total_meals=0, rating_sum=0, rating_count=0))
+            db.session.commit()
         return jsonify({'message': 'User registered successfully'}), 201
     except Exception as e:
         db.session.rollback(); print(f"❌ Registration error: {e}")
@@ -60,8 +120,9 @@ def login():
     """Logs in a user and returns a JWT access token."""
     data = request.get_json()
     username = data.get('username').lower(); password = data.get('password')
-    user = User.query.filter(func.lower(User.username) == username).first()
-    if user and bcrypt.check_password_hash(user.password, password):
+    with span('db.login.lookup'): user = User.query.filter(func.lower(User.username) == username).first()
+    with span('auth.check_password'): valid = user is not None and bcrypt.check_password_hash(user.password, password)
+    if valid:
         access_token = create_access_token(identity=str(user.id))
         return jsonify({'access_token': access_token, 'username': user.username}), 200
     return jsonify({'message': 'Invalid credentials'}), 401
@@ -74,7 +135,7 @@ def login():
 def get_users():
     """Returns a list of all users (for administrative purposes)."""
     try:
-        users = User.query.all()
+        with span('db.users.list'): users = User.query.all()
         result = [{'id': u.id, 'username': u.username, 'name': u.name, 'email': u.email, 'phone': u.phone, 'age': u.age, 'gender': u.gender, 'location': u.location, 'latitude': u.latitude, 'longitude': u.longitude, 'dob': u.dob.isoformat() if u.dob else None, 'last_login': u.last_login.isoformat() if u.last_login else None, 'created_at': u.created_at.isoformat() if u.created_at else None } for u in users]
         return jsonify(result), 200
     except Exception as e:
@@ -87,30 +148,28 @@ def user_profile():
     """Fetches detailed profile information for the currently logged-in user."""
     try:
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
+        # User, totals and favourite tag in one query; ties for the favourite go to the first tag alphabetically.
+        favorite_tag = db.session.query(UserTagStats.tag).filter(UserTagStats.user_id == User.id).order_by(UserTagStats.restaurant_count.desc(), UserTagStats.tag).limit(1).correlate(User).scalar_subquery()
+        with span('db.profile.user'):
+            if has_table('user_stats'): row = db.session.query(User, UserStats, favorite_tag).outerjoin(UserStats, UserStats.user_id == User.id).filter(User.id == user_id).first()
+            else: row = (User.query.filter_by(id=user_id).first(), None, None)
+        user, user_stats, favorite_cuisine = row or (None, None, None)
         if not user: return jsonify({'message': 'User not found'}), 404
         user_info = {'username': user.username, 'email': user.email, 'name': user.name, 'age': user.age, 'phone': user.phone, 'gender': user.gender, 'location': user.location}
-        meals = Meal.query.filter_by(user_id=user_id).all()
-        reviews = Review.query.filter_by(user_id=user_id).all()
-        total_meals = len(meals)
-        avg_rating = (sum(r.rating for r in reviews) / len(reviews)) if reviews else 0.0
-        favorite_cuisine = 'N/A'
-        if meals:
-            meal_restaurant_ids = [m.restaurant_id for m in meals]
-            if meal_restaurant_ids:
-                tags = db.session.query(Restaurant.tag_1, Restaurant.tag_2, Restaurant.tag_3).filter(Restaurant.id.in_(meal_restaurant_ids)).all()
-                tag_counts = pd.Series([tag for row in tags for tag in row if tag]).value_counts()
-                if not tag_counts.empty: favorite_cuisine = tag_counts.index[0]
-        stats = {'total_meals': total_meals, 'average_rating': avg_rating, 'favorite_cuisine': favorite_cuisine}
+        if user_stats: total_meals, rating_sum, rating_count = user_stats.total_meals, user_stats.rating_sum, user_stats.rating_count
+        else:
+            with span('db.profile.stats'): total_meals, rating_sum, rating_count, favorite_cuisine = db.session.execute(PROFILE_STATS_SQL, {'user_id': user_id}).one()
+        stats = {'total_meals': total_meals, 'average_rating': rating_sum / rating_count if rating_count else 0.0, 'favorite_cuisine': favorite_cuisine or 'N/A'}
         
-        recent_meals_query = db.session.query(Meal, Restaurant.name).join(Restaurant, Meal.restaurant_id == Restaurant.id).filter(Meal.user_id == user_id).order_by(Meal.date.desc()).limit(5).all()
+        # The latest review of each meal's restaurant comes back with the meal, not one query per meal.
+        latest_rating = db.session.query(Review.rating).filter(Review.user_id == Meal.user_id, Review.restaurant_id == Meal.restaurant_id).order_by(Review.date.desc()).limit(1).correlate(Meal).scalar_subquery()
+        with span('db.profile.recent_meals'): recent_meals_query = db.session.query(Meal, Restaurant.name, latest_rating).join(Restaurant, Meal.restaurant_id == Restaurant.id).filter(Meal.user_id == user_id).order_by(Meal.date.desc()).limit(5).all()
         recent_meals = []
-        for meal, name in recent_meals_query:
-            latest_review = Review.query.filter_by(user_id=user_id, restaurant_id=meal.restaurant_id).order_by(Review.date.desc()).first()
+        for meal, name, rating in recent_meals_query:
             recent_meals.append({
                 'meal_id': meal.id, 'restaurant_name': name, 'date': meal.date.isoformat(), 
                 'meal_time': meal.meal_time, 
-                'rating': latest_review.rating if latest_review else None
+                'rating': rating
             })
             
         return jsonify({'user_info': user_info, 'stats': stats, 'recent_meals': recent_meals}), 200
@@ -124,14 +183,14 @@ def update_user_profile():
     """Updates profile information for the currently logged-in user."""
     try:
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
+        with span('db.profile_update.lookup'): user = User.query.filter_by(id=user_id).first()
         if not user: return jsonify({'message': 'User not found'}), 404
         data = request.get_json()
         user.name = data.get('name', user.name)
         user.phone = data.get('phone', user.phone)
         user.gender = data.get('gender', user.gender)
         user.location = data.get('location', user.location)
-        db.session.commit()
+        with span('db.profile_update.commit'): db.session.commit()
         updated_user_info = {'username': user.username, 'email': user.email, 'name': user.name, 'age': user.age, 'phone': user.phone, 'gender': user.gender, 'location': user.location}
         return jsonify({'message': 'Profile updated successfully!', 'user': updated_user_info}), 200
     except Exception as e:
@@ -145,18 +204,19 @@ def change_password():
     """Changes the password for the currently logged-in user."""
     try:
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
+        with span('db.change_password.lookup'): user = User.query.filter_by(id=user_id).first()
         if not user: return jsonify({'message': 'User not found'}), 404
 
         data = request.get_json()
         current_password = data.get('currentPassword')
         new_password = data.get('newPassword')
 
-        if not bcrypt.check_password_hash(user.password, current_password):
+        with span('auth.check_password'): valid = bcrypt.check_password_hash(user.password, current_password)
+        if not valid:
             return jsonify({'message': 'Current password is incorrect'}), 401
 
-        user.password = bcrypt.generate_password_hash(new_password).decode('utf-8')
-        db.session.commit()
+        with span('auth.hash_password'): user.password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        with span('db.change_password.commit'): db.session.commit()
         
         return jsonify({'message': 'Password updated successfully!'}), 200
     except Exception as e:
@@ -172,7 +232,7 @@ def change_password():
 def get_restaurants():
     """Returns a list of all restaurants in the database."""
     try:
-        restaurants = Restaurant.query.all()
+        with span('db.restaurants.list'): restaurants = Restaurant.query.all()
         result = [{'id': r.id, 'name': r.name, 'tags': [r.tag_1, r.tag_2, r.tag_3], 'google_rating': r.google_rating, 'price_range': f"{r.price_min} - {r.price_max}", 'location': f"{r.latitude}, {r.longitude}", 'description': r.description} for r in restaurants]
         return jsonify(result), 200
     except Exception as e:
@@ -190,7 +250,7 @@ def recommend():
         recommended_ids = get_recommendations(user_id, exclude_ids=exclude_ids)
         if not recommended_ids:
             return jsonify({'user_id': user_id, 'recommendations': []}), 200
-        recommendations = Restaurant.query.filter(Restaurant.id.in_(recommended_ids)).all()
+        with span('db.recommend.details'): recommendations = Restaurant.query.filter(Restaurant.id.in_(recommended_ids)).all()
         recommendations_dict = {r.id: r for r in recommendations}
         ordered_recs = [recommendations_dict[rid] for rid in recommended_ids if rid in recommendations_dict]
         result = [{'id': r.id, 'name': r.name, 'tags': [t for t in [r.tag_1, r.tag_2, r.tag_3] if t], 'google_rating': r.google_rating, 'price_range': f"{r.price_min} - {r.price_max}", 'location': f"{r.latitude},{r.longitude}", 'description': r.description, 'address': r.address, 'opening_time': r.opening_time, 'closing_time': r.closing_time, 'phone': r.phone} for r in ordered_recs]
@@ -229,40 +289,63 @@ def rate_restaurant():
         elif 22.0 <= hour < 23.5: meal_time = "Late Dinner"
         else: meal_time = "Midnight Snack"
 
-        # Generate a new unique Meal ID
-        last_meal = Meal.query.filter_by(user_id=user_id).order_by(Meal.id.desc()).first()
-        meal_count = int(last_meal.id.split('_')[-1]) + 1 if last_meal else 1
-        new_meal_id = f"MEAL_{user_id.split('_')[1]}_{meal_count:03}"
-
-        new_meal = Meal(
-            id=new_meal_id,
-            user_id=user_id,
-            restaurant_id=restaurant_id,
-            date=now.date(),
-            day=day,
-            meal_time=meal_time
-        )
-        db.session.add(new_meal)
-
-        # --- Logic for creating/updating the Review (as before) ---
-        review = Review.query.filter_by(user_id=user_id, restaurant_id=restaurant_id).order_by(Review.date.desc()).first()
-        if review:
-            review.rating = rating
-            review.date = now.date()
-        else:
-            last_review = Review.query.order_by(Review.id.desc()).first()
-            next_id_num = int(last_review.id.split('_')[1]) + 1 if last_review else 1
-            new_review_id = f"REV_{next_id_num:03}" # Note: This ID generation is simple; for a larger app, a more robust method is needed.
-            review = Review(
-                id=new_review_id,
+        with span('db.rate.write'):
+            # Generate a new unique Meal ID
+            new_meal_id = next_meal_id(user_id)
+
+            new_meal = Meal(
+                id=new_meal_id,
                 user_id=user_id,
                 restaurant_id=restaurant_id,
                 date=now.date(),
-                rating=rating
+                day=day,
+                meal_time=meal_time
             )
-            db.session.add(review)
+            db.session.add(new_meal)
+
+            # --- Logic for creating/updating the Review (as before) ---
+            review = Review.query.filter_by(user_id=user_id, restaurant_id=restaurant_id).order_by(Review.date.desc()).first()
+            previous_rating = review.rating if review else None
+            if review:
+                review.rating = rating
+                review.date = now.date()
+            else:
+                new_review_id = next_review_id()
+                review = Review(
+                    id=new_review_id,
+                    user_id=user_id,
+                    restaurant_id=restaurant_id,
+                    date=now.date(),
+                    rating=rating
+                )
+                db.session.add(review)
+
+            # --- Materialize the recommender features in the same transaction ---
+            # Each table is skipped until scripts/build_features.py creates it;
+            # the readers derive the same values from the raw rows meanwhile.
+            user = User.query.filter_by(id=user_id).first(); restaurant = Restaurant.query.filter_by(id=restaurant_id).first()
+            if has_table('meal_feature'):
+                distance = meal_distance(user.latitude if user else None, user.longitude if user else None, restaurant.latitude if restaurant else None, restaurant.longitude if restaurant else None)
+                db.session.add(MealFeature(meal_id=new_meal_id, distance_travelled=None if pd.isna(distance) else distance))
+            if has_table('review_feature'):
+                db.session.merge(ReviewFeature(review_id=review.id, implicit_rating=implicit_rating(review.rating, review.price_satisfaction, review.visit_frequency)))
+            if has_table('user_restaurant_stats'): restaurant_meals = increment_user_restaurant_stats(user_id, restaurant_id, meal_counter(day))
+            else: restaurant_meals = Meal.query.filter_by(user_id=user_id, restaurant_id=restaurant_id).count()
+            record_profile_stats(user_id, restaurant, meals=1, rating_delta=int(rating) - (previous_rating or 0), new_ratings=int(previous_rating is None), first_visit=restaurant_meals == 1)
+
+            db.session.commit()
+        meals_changed()
+
+        # --- Fold the new rating into the user's SVD factors ---
+        # Best effort: the rating is already saved, and the next full
+        # retrain (scripts/train_model.py) picks it up regardless.
+        try:
+            with span('db.rate.user_reviews'): user_reviews = Review.query.filter_by(user_id=user_id).all()
+            user_reviews_df = pd.DataFrame([{'restaurant_id': r.restaurant_id, 'rating': r.rating, 'price_satisfaction': r.price_satisfaction, 'visit_frequency': r.visit_frequency} for r in user_reviews])
+            with span('svd.fold_in'): update_user_factors(user_id, user_reviews_df)
+        except Exception as e:
+            print(f"⚠️ Could not update SVD factors for {user_id}: {e}")
 
-        db.session.commit()
         return jsonify({'message': 'Rating and meal logged successfully!'}), 201
 
     except Exception as e:
@@ -270,10 +353,47 @@ def rate_restaurant():
         print(f"❌ Error in /api/rate: {e}")
         return jsonify({'message': 'Server error submitting rating'}), 500
 
+@main.route('/api/interactions', methods=['POST'])
+@jwt_required()
+def log_interactions():
+    """
+    Accepts a batch of swipe events for the current user. They are journaled
+    before the response and written to interaction_log in the background
+    (see interaction_queue.py).
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    events = data.get('events') if isinstance(data, dict) else data
+    if not isinstance(events, list) or not events: return jsonify({'message': 'Expected a non-empty list of events'}), 400
+    if len(events) > MAX_INTERACTION_BATCH: return jsonify({'message': f'At most {MAX_INTERACTION_BATCH} events per request'}), 413
+    now = datetime.datetime.now(ZoneInfo("Asia/Kuala_Lumpur"))
+    try: events = [swipe_event(user_id, event, now) for event in events]
+    except ValueError as e: return jsonify({'message': str(e)}), 400
+    try:
+        # Unknown restaurants are rejected here: once acknowledged, a row
+        # that fails its foreign key would hold up every batch behind it.
+        restaurant_ids = {event['restaurant_id'] for event in events}
+        with span('db.interactions.validate'): known_ids = {row.id for row in db.session.query(Restaurant.id).filter(Restaurant.id.in_(restaurant_ids))}
+        if restaurant_ids - known_ids: return jsonify({'message': f"Unknown restaurant_id: {sorted(restaurant_ids - known_ids)[0]}"}), 400
+        with span('db.interactions.ids'):
+            for event, interaction_id in zip(events, next_interaction_ids(len(events))): event['id'] = interaction_id
+            db.session.commit()
+        with span('interactions.journal'): get_interaction_queue().submit(events)
+        return jsonify({'message': 'Interactions accepted', 'accepted': len(events)}), 202
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error in /api/interactions: {e}")
+        return jsonify({'message': 'Server error logging interactions'}), 500
+
 # -----------------------------------------------------------------------
-# Debugging Endpoints
+# Debugging & Monitoring Endpoints
 # -----------------------------------------------------------------------
 
+@main.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Per-stage and per-endpoint latency histograms of this worker, in the Prometheus text format."""
+    return current_app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @main.route('/api/debug', methods=['GET'])
 def debug_config():
     """A utility endpoint to check the live database configuration."""
@@ -0,0 +1,274 @@
+# ----------------------------------------------------------------------
+# FILE: data_store.py (Recommender Data Access)
+# ----------------------------------------------------------------------
+# load_snapshot() reads the five recommender tables, with their precomputed
+# features (features.py) joined on, into a Snapshot for the offline
+# scripts: training, evaluation and snapshot export. refresh_snapshot()
+# updates an exported snapshot with just the rows written since.
+#
+# Serving doesn't need the whole snapshot: the user-scoped queries at the
+# bottom fetch one user's rows with parameterized SQL, and only the
+# restaurant catalogue is cached in full. Cached frames are shared between
+# requests: treat them as read-only and copy before adding or changing
+# columns. The one other cross-user read, meals per restaurant at a meal
+# time, is cached until /api/rate logs a meal and calls meals_changed(). With
+# SNAPSHOT_CATALOGUE set, a freshly started worker takes its first
+# catalogue from the newest exported snapshot (snapshot_files.py) instead
+# of the database.
+# ----------------------------------------------------------------------
+import os
+import time
+import threading
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, DateTime, MetaData, Table, bindparam, create_engine, inspect, select, text
+from sqlalchemy.exc import SAWarning
+
+from features import with_restaurant_features, with_meal_features, with_review_features, user_restaurant_stats
+
+# --- Database Connection ---
+db_url = os.environ.get('DATABASE_URL')
+if db_url and db_url.startswith("postgres://"):
+    db_url = db_url.replace("postgres://", "postgresql://", 1)
+engine = create_engine(db_url or 'sqlite:///nomnom.db')
+# pd.read_sql_table reflects the table first, and reflection can't describe
+# the lower(...) expression indexes on "user"; reading doesn't need them.
+warnings.filterwarnings('ignore', message='Skipped unsupported reflection of expression-based index', category=SAWarning)
+
+Snapshot = namedtuple('Snapshot', ['version', 'users', 'reviews', 'restaurants', 'interactions', 'meals', 'user_restaurant_stats'])
+
+SNAPSHOT_CATALOGUE = os.environ.get('SNAPSHOT_CATALOGUE', '').lower() in ('1', 'true', 'yes')
+
+_lock = threading.Lock()
+
+_existing_tables = set()
+
+def has_table(table):
+    """Whether a table exists yet. Only positive answers are cached, so tables created later are noticed."""
+    if table not in _existing_tables and inspect(engine).has_table(table): _existing_tables.add(table)
+    return table in _existing_tables
+
+def _read_features(table, key):
+    """A feature table with its key renamed to 'id', or None if the table hasn't been created yet."""
+    if not has_table(table): return None
+    return pd.read_sql_table(table, engine).rename(columns={key: 'id'})
+
+def load_snapshot(version=None):
+    """Reads every recommender table, with its stored features, into a new Snapshot."""
+    users_df = pd.read_sql_table('user', engine); reviews_df = pd.read_sql_table('review', engine); restaurants_df = pd.read_sql_table('restaurant', engine); interactions_df = pd.read_sql_table('interaction_log', engine); meals_df = pd.read_sql_table('meal', engine)
+    restaurants_df = with_restaurant_features(restaurants_df, _read_features('restaurant_feature', 'restaurant_id'))
+    reviews_df = with_review_features(reviews_df, _read_features('review_feature', 'review_id'))
+    if not meals_df.empty and not users_df.empty and not restaurants_df.empty:
+        meals_df = with_meal_features(meals_df, users_df, restaurants_df, _read_features('meal_feature', 'meal_id'))
+    else:
+        print("[DEBUG] One or more dataframes are empty. Skipping distance calculation.")
+    # Profile counters are rebuilt from the raw rows if the table doesn't exist yet.
+    stats_df = pd.read_sql_table('user_restaurant_stats', engine) if has_table('user_restaurant_stats') else user_restaurant_stats(meals_df, interactions_df)
+    return Snapshot(version, users_df, reviews_df, restaurants_df, interactions_df, meals_df, stats_df)
+
+# --- Delta Refresh ---
+# refresh_snapshot() brings an older snapshot (e.g. the last exported one)
+# up to date by reading only the history rows past each table's high-water
+# mark: meals and reviews by date (/api/rate moves a review's date forward
+# when it changes the rating) and interactions by timestamp. The mark is the
+# newest value already in the frame; rows at or past it replace the rows
+# with the same id, so re-reading the mark's day is harmless. Stored
+# features are attached to those rows only, and profile counters are
+# re-read only for the users they touch. users and restaurants are small
+# and have no update time (profile edits change users in place), so they
+# are re-read in full. A frame with nothing new is kept as the same object.
+# A row count that doesn't match the table afterwards means rows were
+# deleted or loaded with old dates, and the caller must do a full load.
+DELTA_MARKS = {
+    'meals': ('meal', 'date', Date()),
+    'reviews': ('review', 'date', Date()),
+    'interactions': ('interaction_log', 'timestamp', DateTime()),
+}
+
+def _mark_value(column, sql_type):
+    """The newest value in a frame column as a bind value, or None if it has none."""
+    mark = pd.to_datetime(column).max() if not column.empty else pd.NaT
+    if pd.isna(mark): return None
+    return mark.date() if isinstance(sql_type, Date) else mark.to_pydatetime()
+
+_tables = {}
+
+def _table(name):
+    """A reflected table, so delta reads come back with the same column types as pd.read_sql_table."""
+    if name not in _tables: _tables[name] = Table(name, MetaData(), autoload_with=engine)
+    return _tables[name]
+
+def _read_since(table, column, sql_type, mark, frame):
+    """The rows of `table` at or past the mark (all of them without one), in the frame's dtypes."""
+    t = _table(table); stmt = select(t)
+    if mark is not None: stmt = stmt.where(t.c[column] >= bindparam('mark', mark, type_=sql_type))
+    rows = pd.read_sql(stmt, engine)
+    for c in rows.columns.intersection(frame.columns):
+        if frame[c].dtype.kind == 'M':
+            # Keep the frame's resolution unless it would drop sub-seconds; concat then widens the column like a full read would.
+            values = pd.to_datetime(rows[c]); coarse = values.astype(frame[c].dtype)
+            rows[c] = coarse if ((coarse == values) | values.isna()).all() else values
+        elif isinstance(frame[c].dtype, pd.StringDtype) and rows[c].dtype == object:
+            rows[c] = rows[c].astype(frame[c].dtype) # all-NULL text columns come back as object
+    return rows
+
+def _read_features_since(feature_table, key, table, column, sql_type, mark):
+    """Stored features for the rows _read_since returns, keyed by 'id', or None if the feature table doesn't exist."""
+    if not has_table(feature_table): return None
+    f = _table(feature_table); t = _table(table); stmt = select(f).join(t, t.c.id == f.c[key])
+    if mark is not None: stmt = stmt.where(t.c[column] >= bindparam('mark', mark, type_=sql_type))
+    return pd.read_sql(stmt, engine).rename(columns={key: 'id'})
+
+def _merge_rows(frame, rows, key='id'):
+    """
+    frame with `rows` merged in: a row replaces the row with the same key in
+    place, new rows go at the end. Returns frame itself if rows is empty.
+    """
+    if rows.empty: return frame
+    positions = pd.Series(range(len(frame)), index=frame[key])
+    order = rows[key].map(positions).to_numpy(dtype=float); new = np.isnan(order)
+    order = np.where(new, len(frame) + np.cumsum(new) - 1, order)
+    replaced = frame[key].isin(rows[key]).to_numpy(); kept = frame[~replaced]
+    for c in kept.columns.intersection(rows.columns):
+        # Snapshots read from disk hold tags and meal times as categoricals.
+        if isinstance(kept[c].dtype, pd.CategoricalDtype):
+            categories = kept[c].cat.categories.union(pd.Index(rows[c].dropna().unique()))
+            kept = kept.assign(**{c: kept[c].cat.set_categories(categories)}); rows = rows.assign(**{c: pd.Categorical(rows[c], categories=categories)})
+    merged = pd.concat([kept.assign(_order=np.flatnonzero(~replaced)), rows.assign(_order=order)], ignore_index=True)
+    return merged.sort_values('_order', kind='stable').drop(columns='_order').reset_index(drop=True)
+
+def _keep_if_equal(old, new):
+    return old if old.equals(new) else new
+
+def _table_rows(table):
+    with engine.connect() as conn: return conn.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+
+def refresh_snapshot(snapshot, version=None):
+    """
+    A new Snapshot with every row written since `snapshot` merged in, or None
+    if a table no longer matches (rows deleted or loaded with old dates) and
+    a full load_snapshot() is needed.
+    """
+    frames = snapshot._asdict(); deltas = {}
+    frames['users'] = _keep_if_equal(snapshot.users, pd.read_sql_table('user', engine))
+    frames['restaurants'] = _keep_if_equal(snapshot.restaurants, with_restaurant_features(pd.read_sql_table('restaurant', engine), _read_features('restaurant_feature', 'restaurant_id')))
+    for name, (table, column, sql_type) in DELTA_MARKS.items():
+        mark = _mark_value(frames[name][column], sql_type)
+        rows = _read_since(table, column, sql_type, mark, frames[name])
+        if name == 'meals' and not rows.empty and not frames['users'].empty and not frames['restaurants'].empty:
+            rows = with_meal_features(rows, frames['users'], frames['restaurants'], _read_features_since('meal_feature', 'meal_id', table, column, sql_type, mark))
+        elif name == 'reviews' and not rows.empty:
+            rows = with_review_features(rows, _read_features_since('review_feature', 'review_id', table, column, sql_type, mark))
+        deltas[name] = rows; frames[name] = _merge_rows(frames[name], rows)
+        if len(frames[name]) != _table_rows(table):
+            print(f"[DEBUG] {table} doesn't match the snapshot after the delta; a full load is needed.")
+            return None
+    touched = set(deltas['meals'].get('user_id', [])) | set(deltas['interactions'].get('user_id', []))
+    if touched and has_table('user_restaurant_stats'):
+        stmt = text('SELECT * FROM user_restaurant_stats WHERE user_id IN :user_ids').bindparams(bindparam('user_ids', expanding=True))
+        changed = pd.read_sql(stmt, engine, params={'user_ids': sorted(touched)})
+        stats = frames['user_restaurant_stats']
+        frames['user_restaurant_stats'] = pd.concat([stats[~stats['user_id'].isin(touched)], changed], ignore_index=True)
+    elif touched:
+        frames['user_restaurant_stats'] = user_restaurant_stats(frames['meals'], frames['interactions'])
+    print(f"[DEBUG] Snapshot refreshed: {', '.join(f'{len(rows)} {name}' for name, rows in deltas.items())} re-read.")
+    frames['version'] = version
+    return Snapshot(**frames)
+
+# --- Derived Per-Frame Caches ---
+# Structures derived from a shared frame (e.g. the restaurant catalogue) are
+# cached against that exact frame object. A reloaded catalogue that changed
+# is a new frame, so the derived structure is rebuilt once per change. The
+# cache keeps a reference to the frame so its id can't be reused while it
+# is cached.
+_derived = {}
+_derived_lock = threading.Lock()
+
+def cached_for_frame(name, df, build):
+    """Returns build(df), reusing the last result for `name` while df is the same object."""
+    cached = _derived.get(name)
+    if cached is not None and cached[0] is df: return cached[1]
+    value = build(df)
+    with _derived_lock:
+        _derived[name] = (df, value)
+    return value
+
+# --- User-Scoped Queries ---
+# Everything a single recommendation reads, fetched with bound parameters so
+# the work per request follows one user's history. "user" is quoted because
+# it is a reserved word in Postgres.
+# The API never writes restaurants, so the catalogue is re-read on a timer
+# rather than after every write.
+CATALOGUE_RELOAD_INTERVAL = float(os.environ.get('CATALOGUE_RELOAD_INTERVAL', 3600))
+_catalogue = None # (time loaded, frame)
+_meals_version = 0 # bumped by meals_changed()
+_meals_version_lock = threading.Lock()
+_meal_time_counts = (0, {}) # (meals version, counts per meal time)
+
+def get_catalogue():
+    """
+    The restaurant catalogue with its stored features, re-read every
+    CATALOGUE_RELOAD_INTERVAL and kept as the same frame (so its derived
+    caches survive) if nothing changed.
+    """
+    global _catalogue
+    catalogue = _catalogue
+    if catalogue is not None and time.monotonic() - catalogue[0] < CATALOGUE_RELOAD_INTERVAL: return catalogue[1]
+    with _lock:
+        if _catalogue is None or time.monotonic() - _catalogue[0] >= CATALOGUE_RELOAD_INTERVAL:
+            restaurants_df = _snapshot_catalogue() if SNAPSHOT_CATALOGUE and _catalogue is None else None
+            if restaurants_df is None:
+                restaurants_df = with_restaurant_features(pd.read_sql_table('restaurant', engine), _read_features('restaurant_feature', 'restaurant_id'))
+            if _catalogue is not None and _catalogue[1].equals(restaurants_df): restaurants_df = _catalogue[1]
+            _catalogue = (time.monotonic(), restaurants_df)
+        return _catalogue[1]
+
+def _snapshot_catalogue():
+    """The restaurants of the newest exported snapshot (features included), or None if there is none."""
+    from snapshot_files import read_snapshot # snapshot_files imports Snapshot from here
+    try: return read_snapshot().restaurants
+    except FileNotFoundError as e:
+        print(f"[DEBUG] {e} Reading the catalogue from the database.")
+        return None
+
+def load_user(user_id):
+    """The user's row as a one-row frame (empty if there is no such user)."""
+    return pd.read_sql(text('SELECT * FROM "user" WHERE id = :user_id'), engine, params={'user_id': user_id})
+
+def load_user_meals(user_df, restaurants_df):
+    """The user's meals with their stored distance_travelled (computed for meals that have none)."""
+    user_id = user_df['id'].iloc[0]
+    meals_df = pd.read_sql(text('SELECT * FROM meal WHERE user_id = :user_id'), engine, params={'user_id': user_id})
+    if meals_df.empty or restaurants_df.empty: return meals_df
+    features_df = None
+    if has_table('meal_feature'):
+        features_df = pd.read_sql(text('SELECT f.* FROM meal_feature f JOIN meal m ON m.id = f.meal_id WHERE m.user_id = :user_id'), engine, params={'user_id': user_id}).rename(columns={'meal_id': 'id'})
+    return with_meal_features(meals_df, user_df, restaurants_df, features_df)
+
+def load_user_interactions(user_id):
+    return pd.read_sql(text('SELECT * FROM interaction_log WHERE user_id = :user_id'), engine, params={'user_id': user_id})
+
+def load_user_stats(user_id, meals_df=None, interactions_df=None):
+    """The user's profile counter rows, rebuilt from their meals and interactions if the table doesn't exist yet."""
+    if not has_table('user_restaurant_stats'): return user_restaurant_stats(meals_df, interactions_df)
+    return pd.read_sql(text('SELECT * FROM user_restaurant_stats WHERE user_id = :user_id'), engine, params={'user_id': user_id})
+
+def meals_changed():
+    """Marks the cached meal_time_counts as stale. Call after committing a new meal."""
+    global _meals_version
+    with _meals_version_lock:
+        _meals_version += 1
+
+def meal_time_counts(meal_time):
+    """Meals logged per restaurant at a meal time, most first (ties by id). Cached until meals_changed()."""
+    global _meal_time_counts
+    version = _meals_version
+    if _meal_time_counts[0] != version: _meal_time_counts = (version, {})
+    cached = _meal_time_counts[1]; counts = cached.get(meal_time)
+    if counts is None:
+        counts_df = pd.read_sql(text('SELECT restaurant_id, COUNT(*) AS meals FROM meal WHERE meal_time = :meal_time AND restaurant_id IS NOT NULL GROUP BY restaurant_id ORDER BY meals DESC, restaurant_id'), engine, params={'meal_time': meal_time})
+        counts = cached[meal_time] = counts_df.set_index('restaurant_id')['meals']
+    return counts
@@ -0,0 +1,156 @@
+# ----------------------------------------------------------------------
+# FILE: features.py (Materialized Recommender Features)
+# ----------------------------------------------------------------------
+# Numeric columns the recommender derives from raw rows: each restaurant's
+# price range and opening hours, each meal's user→restaurant distance and
+# each review's implicit rating. They are written to the *_feature tables
+# together with the rows they describe (/api/rate, the seed scripts and
+# scripts/build_features.py) and joined onto the snapshot frames, so a
+# request reads them instead of re-deriving them. Values follow the code
+# they replace exactly, NaNs included. Prices are stored as strings like
+# "RM1.00"; parse_prices() strips the currency before converting them.
+# ----------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+from geo import add_distance_travelled, haversine_array
+
+RESTAURANT_FEATURES = ['price_min_value', 'price_max_value', 'price_mid', 'open_minute', 'close_minute', 'always_open']
+MEAL_FEATURES = ['distance_travelled']
+REVIEW_FEATURES = ['implicit_rating']
+
+# --- Restaurants ---
+PRICE_PREFIX = r'^\s*RM\s*'
+
+def parse_prices(values):
+    """Price strings like "RM12.50" (or plain numbers) as a float Series, NaN where they don't parse."""
+    values = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    prices = pd.to_numeric(values.astype('string').str.replace(PRICE_PREFIX, '', regex=True, case=False), errors='coerce')
+    return pd.Series(prices.to_numpy(dtype=float, na_value=np.nan), index=values.index)
+
+def parse_minutes(time_str):
+    """'HH:MM:SS' -> minutes since midnight, or None if it can't be parsed."""
+    try:
+        hour, minute, _ = map(int, time_str.split(':'))
+        return hour * 60 + minute
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def minutes_to_hours(minutes):
+    """Inverse of parse_minutes, as hour + minute / 60.0 so it compares exactly with get_current_context()."""
+    minutes = np.asarray(minutes, dtype=float)
+    return np.floor_divide(minutes, 60) + np.mod(minutes, 60) / 60.0
+
+def restaurant_features(restaurants_df):
+    """
+    Price range as numbers (NaN where the string doesn't parse) and opening
+    hours in minutes. always_open covers everything is_restaurant_open()
+    treats as open around the clock: missing, identical or unparseable hours.
+    """
+    price_min = parse_prices(restaurants_df['price_min']).to_numpy(); price_max = parse_prices(restaurants_df['price_max']).to_numpy()
+    opening = restaurants_df['opening_time']; closing = restaurants_df['closing_time']
+    open_minute = pd.array([parse_minutes(v) if pd.notna(v) else None for v in opening], dtype='Int64')
+    close_minute = pd.array([parse_minutes(v) if pd.notna(v) else None for v in closing], dtype='Int64')
+    always_open = (opening.isna() | closing.isna() | (opening == closing)).to_numpy(dtype=bool) | open_minute.isna() | close_minute.isna()
+    return pd.DataFrame({
+        'id': restaurants_df['id'].to_numpy(), 'price_min_value': price_min, 'price_max_value': price_max, 'price_mid': (price_min + price_max) / 2,
+        'open_minute': open_minute, 'close_minute': close_minute, 'always_open': always_open,
+    }, index=restaurants_df.index)
+
+# --- Meals ---
+def meal_features(meals_df, users_df, restaurants_df):
+    return add_distance_travelled(meals_df[['id', 'user_id', 'restaurant_id']], users_df, restaurants_df)[['id'] + MEAL_FEATURES]
+
+def meal_distance(user_lat, user_lon, restaurant_lat, restaurant_lon):
+    """distance_travelled for a single meal; missing coordinates give NaN, as in add_distance_travelled."""
+    coords = [np.nan if v is None else float(v) for v in (user_lat, user_lon, restaurant_lat, restaurant_lon)]
+    return float(haversine_array(*coords))
+
+# --- Reviews ---
+def implicit_rating(rating, price_satisfaction=None, visit_frequency=None):
+    """A review's 1-7 implicit rating: the star rating adjusted by price satisfaction and repeat visits."""
+    score = float(rating)
+    if price_satisfaction == True: score += 1.0
+    if pd.notna(visit_frequency) and visit_frequency > 2: score += 1.0
+    if price_satisfaction == False: score -= 0.5
+    return min(7.0, max(1.0, score))
+
+def implicit_ratings(reviews_df):
+    """implicit_rating() for every row of reviews_df, as an array."""
+    score = reviews_df['rating'].to_numpy(dtype=float).copy()
+    if 'price_satisfaction' in reviews_df.columns:
+        satisfied = reviews_df['price_satisfaction'].to_numpy(dtype=object)
+        score += (satisfied == True).astype(bool) - 0.5 * (satisfied == False).astype(bool)
+    if 'visit_frequency' in reviews_df.columns:
+        score += pd.to_numeric(reviews_df['visit_frequency'], errors='coerce').to_numpy(dtype=float) > 2
+    return np.fmin(7.0, np.fmax(1.0, score))
+
+def review_features(reviews_df):
+    return pd.DataFrame({'id': reviews_df['id'].to_numpy(), 'implicit_rating': implicit_ratings(reviews_df)}, index=reviews_df.index)
+
+# --- Joining & Writing ---
+def attach_features(df, features_df, columns, compute):
+    """
+    Joins stored feature rows (keyed by 'id') onto a copy of df. Rows with
+    no stored features, e.g. written before the feature tables existed, are
+    computed with compute(rows) instead. Feature columns come back as float.
+    """
+    df = df.drop(columns=[c for c in columns if c in df.columns])
+    stored = features_df.drop_duplicates('id').set_index('id')[columns] if features_df is not None else pd.DataFrame(columns=columns)
+    values = stored.reindex(df['id'].to_numpy()).astype(float); values.index = df.index
+    missing = ~df['id'].isin(stored.index).to_numpy()
+    if missing.any():
+        values.loc[missing, columns] = compute(df[missing])[columns].astype(float).to_numpy()
+    return pd.concat([df, values], axis=1)
+
+def with_restaurant_features(restaurants_df, features_df=None):
+    return attach_features(restaurants_df, features_df, RESTAURANT_FEATURES, restaurant_features)
+
+def with_meal_features(meals_df, users_df, restaurants_df, features_df=None):
+    return attach_features(meals_df, features_df, MEAL_FEATURES, lambda rows: meal_features(rows, users_df, restaurants_df))
+
+def with_review_features(reviews_df, features_df=None):
+    return attach_features(reviews_df, features_df, REVIEW_FEATURES, review_features)
+
+def feature_table_rows(features_df, key):
+    """Renames 'id' to the feature table's key column and NaN/NA to None, ready to insert."""
+    rows = features_df.rename(columns={'id': key}).astype(object)
+    return rows.where(rows.notna(), None)
+
+# --- Per-User Profile Counters ---
+# Meal and decline counts per (user, restaurant): everything profiles.py
+# needs to derive a user profile without reading the user's full history.
+PROFILE_COUNTERS = ['weekday_meals', 'weekend_meals', 'declines']
+WEEKEND_DAYS = ['Saturday', 'Sunday']
+
+def meal_counter(day):
+    """The counter a meal logged on `day` adds to."""
+    return 'weekend_meals' if day in WEEKEND_DAYS else 'weekday_meals'
+
+def user_restaurant_stats(meals_df, interactions_df):
+    """Rebuilds every (user_id, restaurant_id) row of PROFILE_COUNTERS from the raw meal and interaction rows."""
+    parts = []
+    if meals_df is not None and not meals_df.empty:
+        weekend = meals_df['day'].isin(WEEKEND_DAYS).to_numpy()
+        parts.append(pd.DataFrame({'user_id': meals_df['user_id'].to_numpy(), 'restaurant_id': meals_df['restaurant_id'].to_numpy(), 'weekday_meals': (~weekend).astype(int), 'weekend_meals': weekend.astype(int), 'declines': 0}))
+    if interactions_df is not None and not interactions_df.empty:
+        declined = interactions_df[interactions_df['user_action'] == 'decline']
+        parts.append(pd.DataFrame({'user_id': declined['user_id'].to_numpy(), 'restaurant_id': declined['restaurant_id'].to_numpy(), 'weekday_meals': 0, 'weekend_meals': 0, 'declines': 1}))
+    if not parts: return pd.DataFrame({c: pd.Series(dtype=object if c.endswith('_id') else int) for c in ['user_id', 'restaurant_id'] + PROFILE_COUNTERS})
+    return pd.concat(parts, ignore_index=True).groupby(['user_id', 'restaurant_id'], as_index=False)[PROFILE_COUNTERS].sum()
+
+# --- Profile Page Stats ---
+# The user_stats and user_tag_stats rows behind /api/profile. A tag counts
+# once per distinct restaurant the user has eaten at, as the profile page
+# always counted it; empty tags are skipped.
+def user_profile_stats(users_df, meals_df, reviews_df, restaurants_df):
+    """Rebuilds the user_stats row of every user and all user_tag_stats rows from the raw rows."""
+    meal_totals = meals_df.groupby('user_id').size().rename('total_meals')
+    ratings = reviews_df.groupby('user_id')['rating'].agg(rating_sum='sum', rating_count='count')
+    stats_df = pd.concat([meal_totals, ratings], axis=1).reindex(users_df['id'].unique()).fillna(0).astype(int).rename_axis('user_id').reset_index()
+
+    visited = meals_df[['user_id', 'restaurant_id']].drop_duplicates().merge(restaurants_df[['id', 'tag_1', 'tag_2', 'tag_3']], left_on='restaurant_id', right_on='id')
+    tags = visited.melt(id_vars='user_id', value_vars=['tag_1', 'tag_2', 'tag_3'], value_name='tag')
+    tags = tags[tags['tag'].notna() & (tags['tag'] != '')]
+    tags_df = tags.groupby(['user_id', 'tag']).size().rename('restaurant_count').reset_index()
+    return stats_df[['user_id', 'total_meals', 'rating_sum', 'rating_count']], tags_df
@@ -0,0 +1,91 @@
+# ----------------------------------------------------------------------
+# FILE: geo.py (Distance Helpers)
+# ----------------------------------------------------------------------
+# Scalar and vectorized great-circle distances in km. The array versions
+# follow the scalar haversine() exactly for missing coordinates: a None
+# (or any non-numeric value) gives inf, while a NaN propagates as NaN.
+#
+# Serving needs one user's distances (distances_from). Offline jobs that
+# score many users against the same catalogue, like scripts/evaluation.py,
+# share a users x restaurants DistanceMatrix instead.
+# ----------------------------------------------------------------------
+import threading
+from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371
+
+def haversine(lat1, lon1, lat2, lon2):
+    if any(v is None or not isinstance(v, (int, float)) for v in [lat1, lon1, lat2, lon2]):
+        return float('inf')
+    R = 6371; lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2]); dlon = lon2 - lon1; dlat = lat2 - lat1; a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2; c = 2 * atan2(sqrt(a), sqrt(1 - a)); return R * c
+
+_is_invalid = np.frompyfunc(lambda v: v is None or not isinstance(v, (int, float)), 1, 1)
+
+def _as_coords(values):
+    """Returns (float array, invalid mask or None). Float input takes the fast path."""
+    values = np.asarray(values.to_numpy() if isinstance(values, pd.Series) else values)
+    if values.dtype.kind == 'f': return values, None
+    invalid = np.asarray(_is_invalid(values), dtype=bool)
+    return np.where(invalid, np.nan, values).astype(float), invalid
+
+def haversine_array(lat1, lon1, lat2, lon2):
+    """Vectorized haversine over broadcastable arrays of coordinates."""
+    coords = [_as_coords(v) for v in (lat1, lon1, lat2, lon2)]
+    lat1, lon1, lat2, lon2 = (np.radians(c) for c, _ in coords)
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    distances = EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    invalid = [mask for _, mask in coords if mask is not None]
+    if invalid:
+        distances = np.where(np.logical_or.reduce(np.broadcast_arrays(*invalid)), np.inf, distances)
+    return distances
+
+def distances_from(lat, lon, restaurants_df):
+    """Distance from one point to every restaurant, as a Series aligned with restaurants_df."""
+    return pd.Series(haversine_array(lat, lon, restaurants_df['latitude'], restaurants_df['longitude']), index=restaurants_df.index)
+
+def add_distance_travelled(meals_df, users_df, restaurants_df):
+    """Returns a copy of meals_df with the user→restaurant distance of every meal."""
+    meals_df = meals_df.copy()
+    user_locs = users_df.drop_duplicates('id').set_index('id')
+    rest_locs = restaurants_df.drop_duplicates('id').set_index('id')
+    # Unknown ids map to NaN, which is what the row-wise version produced.
+    meals_df['distance_travelled'] = haversine_array(
+        meals_df['user_id'].map(user_locs['latitude']).astype(float), meals_df['user_id'].map(user_locs['longitude']).astype(float),
+        meals_df['restaurant_id'].map(rest_locs['latitude']).astype(float), meals_df['restaurant_id'].map(rest_locs['longitude']).astype(float),
+    )
+    return meals_df
+
+# --- Users x Restaurants Distance Matrix ---
+class DistanceMatrix:
+    """Distances from every user to every restaurant, in km, with the same missing-value rules as distances_from."""
+
+    def __init__(self, users_df, restaurants_df):
+        self.user_index = pd.Index(users_df['id']); self.restaurant_index = pd.Index(restaurants_df['id'])
+        self.values = haversine_array(
+            users_df['latitude'].to_numpy()[:, None], users_df['longitude'].to_numpy()[:, None],
+            restaurants_df['latitude'].to_numpy()[None, :], restaurants_df['longitude'].to_numpy()[None, :],
+        )
+
+    def row(self, user_id):
+        """Distances from one user to every restaurant, or None for an unknown user."""
+        u = self.user_index.get_indexer([user_id])[0]
+        return None if u < 0 else self.values[u]
+
+# (users frame, restaurants frame, matrix). A reloaded catalogue or user
+# list is a new frame object, so the matrix is rebuilt once per version of
+# either; holding the frames keeps their ids from being reused meanwhile.
+_matrix = (None, None, None)
+_matrix_lock = threading.Lock()
+
+def get_distance_matrix(users_df, restaurants_df):
+    """Returns the DistanceMatrix for these two frames, building it once. It costs 8 bytes per user x restaurant."""
+    global _matrix
+    users, restaurants, matrix = _matrix
+    if users is users_df and restaurants is restaurants_df: return matrix
+    with _matrix_lock:
+        if _matrix[0] is not users_df or _matrix[1] is not restaurants_df:
+            _matrix = (users_df, restaurants_df, DistanceMatrix(users_df, restaurants_df))
+        return _matrix[2]
@@ -0,0 +1,207 @@
+# ----------------------------------------------------------------------
+# FILE: interaction_queue.py (Write-Behind Swipe Ingestion)
+# ----------------------------------------------------------------------
+# Swipes arrive far more often than ratings, so /api/interactions doesn't
+# commit each one. A batch of events is appended to an on-disk journal and
+# fsynced before the request is acknowledged, then buffered in memory. A
+# background thread writes the buffer to interaction_log with multi-row
+# inserts once FLUSH_SIZE events are waiting or every FLUSH_INTERVAL
+# seconds, and bumps the decline counters in user_restaurant_stats in the
+# same transaction.
+#
+# The journal is split into segments: each flush closes the active
+# segment and deletes it once its rows are committed. Segments left behind
+# by a crash are replayed when the queue starts. Every event carries its
+# interaction id from the moment it is acknowledged, and inserts skip ids
+# that already exist, so a replay never writes an event twice. Decline
+# counters are bumped only for rows that were actually inserted.
+#
+# Each process keeps its own segments and holds an exclusive lock on them,
+# so one worker never replays a segment another worker is still using.
+# Events become visible to the recommender when they are flushed; until
+# then the client's exclude_ids cover the cards it has just swiped.
+# ----------------------------------------------------------------------
+import os
+import glob
+import json
+import math
+import atexit
+import datetime
+import threading
+import uuid
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError: # Windows: single-process development only
+    fcntl = None
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from data_store import engine, has_table
+from app.models import InteractionLog, UserRestaurantStats
+
+JOURNAL_DIR = os.environ.get('INTERACTION_JOURNAL_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'interaction_journal')
+FLUSH_SIZE = int(os.environ.get('INTERACTION_FLUSH_SIZE', 500))
+FLUSH_INTERVAL = float(os.environ.get('INTERACTION_FLUSH_INTERVAL', 1.0))
+INSERT_CHUNK = 500 # rows per INSERT statement, well under SQLite's bound-parameter limit
+
+# --- Events ---
+def swipe_event(user_id, data, now):
+    """
+    Validates one swipe from a request body into a journal event (without
+    its id). Timestamps are stored as naive local time like the rest of
+    interaction_log; `now` is used when the client doesn't send one.
+    Raises ValueError with a message for the client.
+    """
+    if not isinstance(data, dict): raise ValueError('Each event must be an object')
+    restaurant_id = data.get('restaurant_id'); action = data.get('action', data.get('user_action'))
+    if not isinstance(restaurant_id, str) or not restaurant_id: raise ValueError('Each event needs a restaurant_id')
+    if not isinstance(action, str) or not action or len(action) > 50: raise ValueError('Each event needs an action')
+    event = {'user_id': user_id, 'restaurant_id': restaurant_id, 'user_action': action}
+    for field, value in [('recommendation_rank', data.get('rank', data.get('recommendation_rank'))), ('swipe_time_sec', data.get('swipe_time_sec'))]:
+        # JSON accepts Infinity and NaN, which int() can't convert.
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value != int(value)): raise ValueError(f'{field} must be an integer')
+        event[field] = int(value) if value is not None else None
+    timestamp = data.get('timestamp')
+    try: timestamp = datetime.datetime.fromisoformat(timestamp) if timestamp is not None else now
+    except (TypeError, ValueError): raise ValueError('timestamp must be an ISO 8601 string')
+    if timestamp.tzinfo is not None and now.tzinfo is not None: timestamp = timestamp.astimezone(now.tzinfo)
+    event['timestamp'] = timestamp.replace(tzinfo=None).isoformat()
+    return event
+
+# --- Writing ---
+def _insert(conn):
+    return postgresql_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+
+def write_interactions(conn, events):
+    """
+    Inserts journaled events into interaction_log, skipping ids that are
+    already there, and adds the new declines to user_restaurant_stats (if
+    that table has been built). Returns the number of rows inserted.
+    """
+    table = InteractionLog.__table__; insert = _insert(conn)
+    rows = [dict(event, timestamp=datetime.datetime.fromisoformat(event['timestamp'])) for event in events]
+    inserted = []
+    for start in range(0, len(rows), INSERT_CHUNK):
+        stmt = insert(table).values(rows[start:start + INSERT_CHUNK]).on_conflict_do_nothing(index_elements=['id'])
+        inserted += conn.execute(stmt.returning(table.c.user_id, table.c.restaurant_id, table.c.user_action)).all()
+    declines = Counter((user_id, restaurant_id) for user_id, restaurant_id, action in inserted if action == 'decline')
+    if declines and has_table('user_restaurant_stats'):
+        stats = UserRestaurantStats.__table__
+        stmt = insert(stats).values([{'user_id': u, 'restaurant_id': r, 'weekday_meals': 0, 'weekend_meals': 0, 'declines': n} for (u, r), n in declines.items()])
+        conn.execute(stmt.on_conflict_do_update(index_elements=['user_id', 'restaurant_id'], set_={'declines': stats.c.declines + stmt.excluded.declines}))
+    return len(inserted)
+
+# --- Journal Segments ---
+class _Segment:
+    """One journal file, locked for as long as this process owns it."""
+
+    def __init__(self, path, handle):
+        self.path = path; self.handle = handle
+
+    @classmethod
+    def create(cls, journal_dir, run_id, seq):
+        path = os.path.join(journal_dir, f"interactions-{run_id}-{seq:06}.jsonl")
+        handle = open(path, 'a', encoding='utf-8')
+        if fcntl: fcntl.flock(handle, fcntl.LOCK_EX)
+        return cls(path, handle)
+
+    @classmethod
+    def claim(cls, path):
+        """Opens a leftover segment, or returns None if a live process still holds it."""
+        handle = open(path, 'r+', encoding='utf-8')
+        if fcntl:
+            try: fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return None
+        return cls(path, handle)
+
+    def append(self, lines):
+        self.handle.write(lines); self.handle.flush(); os.fsync(self.handle.fileno())
+
+    def read_events(self):
+        self.handle.seek(0); events = []
+        for line in self.handle:
+            # A torn last line is a batch that was never acknowledged.
+            try: events.append(json.loads(line))
+            except ValueError: pass
+        return events
+
+    def discard(self):
+        os.remove(self.path); self.handle.close()
+
+# --- Queue ---
+class InteractionQueue:
+    def __init__(self, journal_dir=JOURNAL_DIR, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.journal_dir = journal_dir; self.flush_size = flush_size; self.flush_interval = flush_interval
+        os.makedirs(journal_dir, exist_ok=True)
+        self._lock = threading.Lock() # buffer and active segment
+        self._flush_lock = threading.Lock() # one flush at a time
+        self._buffer = []; self._segment = None; self._seq = 0
+        self._run_id = uuid.uuid4().hex[:12] # segment names never collide with a previous run's
+        self._pending = [] # (segment, events) closed for writing, not yet committed
+        self._wake = threading.Event(); self._stopped = False
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name='interaction-flusher', daemon=True); self._thread.start()
+
+    def _recover(self):
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, 'interactions-*.jsonl'))):
+            segment = _Segment.claim(path)
+            if segment is None: continue
+            events = segment.read_events()
+            print(f"[DEBUG] Replaying {len(events)} journaled interactions from {os.path.basename(path)}.")
+            self._pending.append((segment, events))
+        if self._pending: self.flush()
+
+    def submit(self, events):
+        """Journals events durably, then queues them for the next flush. Returns once they are safe to acknowledge."""
+        lines = ''.join(json.dumps(event) + '\n' for event in events)
+        with self._lock:
+            if self._segment is None:
+                self._seq += 1; self._segment = _Segment.create(self.journal_dir, self._run_id, self._seq)
+            self._segment.append(lines)
+            self._buffer.extend(events)
+            full = len(self._buffer) >= self.flush_size
+        if full: self._wake.set()
+
+    def flush(self):
+        """Writes everything journaled so far. Segments stay on disk until their rows are committed."""
+        with self._flush_lock:
+            with self._lock:
+                if self._segment is not None:
+                    self._pending.append((self._segment, self._buffer))
+                    self._segment = None; self._buffer = []
+            written = 0
+            while self._pending:
+                segment, events = self._pending[0]
+                try:
+                    with engine.begin() as conn: written += write_interactions(conn, events)
+                except Exception as e:
+                    print(f"❌ Could not write {len(events)} interactions, will retry: {e}")
+                    break
+                segment.discard(); self._pending.pop(0)
+            return written
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval); self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._stopped = True; self._wake.set()
+        self.flush()
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_interaction_queue():
+    """The process-wide queue, started (and any leftover journal replayed) on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = InteractionQueue()
+            atexit.register(_queue.close)
+        return _queue
@@ -0,0 +1,151 @@
+# ----------------------------------------------------------------------
+# FILE: metrics.py (In-Process Latency Metrics)
+# ----------------------------------------------------------------------
+# Timing spans around the recommender stages and the database work of each
+# route, aggregated per stage and per endpoint into latency histograms.
+# /api/metrics serves them in the Prometheus text format: a histogram
+# (buckets, sum, count) that can be aggregated across workers, plus a
+# summary with the p50/p95/p99 of the last METRICS_WINDOW observations.
+# Each worker process keeps its own numbers.
+#
+# Wrap a block in `with span('recommend.scoring'):` to time it. When a
+# request carries an `X-Request-Timing: 1` header, every span it runs is
+# also listed in a Server-Timing response header, so one slow request can
+# be broken down without turning on the [DEBUG] output.
+# ----------------------------------------------------------------------
+import os
+import time
+import threading
+import contextlib
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+
+import numpy as np
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # seconds
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = int(os.environ.get('METRICS_WINDOW', 1024))
+TIMING_HEADER = 'X-Request-Timing'
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a window of recent samples for the quantiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1); self.total = 0.0; self.count = 0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1; self.total += seconds; self.count += 1
+        self.recent.append(seconds)
+
+    def quantiles(self):
+        return dict(zip(QUANTILES, np.quantile(self.recent, QUANTILES))) if self.recent else {}
+
+_stages = {} # stage -> LatencyHistogram
+_endpoints = {} # (endpoint, method) -> LatencyHistogram
+_responses = {} # (endpoint, method, status) -> count
+_lock = threading.Lock()
+_request_spans = ContextVar('request_spans', default=None)
+
+# --- Recording ---
+def observe_stage(name, seconds):
+    with _lock:
+        histogram = _stages.get(name) or _stages.setdefault(name, LatencyHistogram())
+        histogram.observe(seconds)
+    spans = _request_spans.get()
+    if spans is not None: spans.append((name, seconds))
+
+@contextlib.contextmanager
+def span(name):
+    """Times the block as stage `name`. Exceptions still record the time spent."""
+    start = time.perf_counter()
+    try: yield
+    finally: observe_stage(name, time.perf_counter() - start)
+
+def observe_request(endpoint, method, status, seconds):
+    with _lock:
+        histogram = _endpoints.get((endpoint, method)) or _endpoints.setdefault((endpoint, method), LatencyHistogram())
+        histogram.observe(seconds)
+        _responses[(endpoint, method, status)] = _responses.get((endpoint, method, status), 0) + 1
+
+def reset_metrics():
+    with _lock:
+        _stages.clear(); _endpoints.clear(); _responses.clear()
+
+# --- Prometheus Text Format ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+def _copy(histogram):
+    """A consistent copy to render outside the lock."""
+    copy = LatencyHistogram(); copy.counts = list(histogram.counts); copy.total = histogram.total; copy.count = histogram.count
+    copy.recent = deque(histogram.recent, maxlen=WINDOW)
+    return copy
+
+def _render_family(lines, name, help_text, series):
+    """series: [(labels dict, LatencyHistogram)], rendered as a histogram and a windowed summary."""
+    lines += [f'# HELP {name}_seconds {help_text}', f'# TYPE {name}_seconds histogram']
+    for labels, histogram in series:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_seconds_bucket{{{_labels(**labels, le=_number(bound))}}} {cumulative}')
+        lines.append(f'{name}_seconds_sum{{{_labels(**labels)}}} {_number(histogram.total)}')
+        lines.append(f'{name}_seconds_count{{{_labels(**labels)}}} {histogram.count}')
+    lines += [f'# HELP {name}_recent_seconds {help_text} Quantiles over the last {WINDOW} observations.', f'# TYPE {name}_recent_seconds summary']
+    for labels, histogram in series:
+        for q, value in histogram.quantiles().items():
+            lines.append(f'{name}_recent_seconds{{{_labels(**labels, quantile=q)}}} {_number(value)}')
+        lines.append(f'{name}_recent_seconds_sum{{{_labels(**labels)}}} {_number(sum(histogram.recent))}')
+        lines.append(f'{name}_recent_seconds_count{{{_labels(**labels)}}} {len(histogram.recent)}')
+
+def render_metrics():
+    """Every metric of this process in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        stages = [({'stage': name}, _copy(h)) for name, h in sorted(_stages.items())]
+        endpoints = [({'endpoint': endpoint, 'method': method}, _copy(h)) for (endpoint, method), h in sorted(_endpoints.items())]
+        responses = sorted(_responses.items())
+    lines = []
+    _render_family(lines, 'nomnom_stage_duration', 'Time spent in each recommender stage and route database call.', stages)
+    _render_family(lines, 'nomnom_request_duration', 'Time spent handling each API endpoint.', endpoints)
+    lines += ['# HELP nomnom_responses_total Responses sent per endpoint and status code.', '# TYPE nomnom_responses_total counter']
+    lines += [f'nomnom_responses_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}' for (endpoint, method, status), count in responses]
+    return '\n'.join(lines) + '\n'
+
+# --- Flask Integration ---
+def server_timing(spans, total):
+    """Server-Timing header value: one entry per span, in the order they ran, then the whole request."""
+    entries = [f'{name.replace(".", "-")};dur={seconds * 1000:.2f}' for name, seconds in spans]
+    return ', '.join(entries + [f'total;dur={total * 1000:.2f}'])
+
+def init_app(app):
+    """Times every request by endpoint and adds the Server-Timing breakdown when asked for."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = _request_spans.set([] if request.headers.get(TIMING_HEADER) else None)
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None: return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe_request(endpoint, request.method, response.status_code, elapsed)
+        spans = _request_spans.get()
+        if spans is not None: response.headers['Server-Timing'] = server_timing(spans, elapsed)
+        return response
+
+    @app.teardown_request
+    def _end_spans(error=None):
+        token = g.pop('metrics_token', None)
+        if token is not None: _request_spans.reset(token)
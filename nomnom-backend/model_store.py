@@ -0,0 +1,222 @@
+# ----------------------------------------------------------------------
+# FILE: model_store.py (Persisted Factor Models)
+# ----------------------------------------------------------------------
+# Training runs out of band (see scripts/train_model.py). Each run writes a
+# versioned .npz artifact holding the learned biases and latent factors,
+# and the serving path loads the newest artifact once and reuses it.
+# Artifacts are named <kind>-<version>.npz, where kind is the candidate
+# engine that produced them ('svd' or 'als'). Between retrains, new SVD
+# ratings are folded into a single user's row; those rows are stored next
+# to the artifact in svd-<version>.folds/ and are dropped naturally when
+# the next full retrain writes a new artifact.
+# ----------------------------------------------------------------------
+import os
+import glob
+import shutil
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from surprise import Dataset, Reader, SVD
+
+MODEL_DIR = os.environ.get('MODEL_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_artifacts')
+RATING_SCALE = (1, 7)
+REG_ALL = 0.02
+
+def _as_float(values):
+    values = np.asarray(values)
+    return values if values.dtype.kind == 'f' else values.astype(float)
+
+class FactorModel:
+    """
+    Biases and latent factors of a trained factor model, keyed by raw ids.
+    Estimates are clipped to `clip` (the SVD rating scale); ALS scores are
+    unbounded preferences, so ALS models are built with clip=None.
+    """
+
+    def __init__(self, user_ids, item_ids, global_mean, bu, bi, pu, qi, version=None, kind='svd', clip=RATING_SCALE):
+        self.user_ids = np.asarray(user_ids).astype(str); self.item_ids = np.asarray(item_ids).astype(str)
+        self.global_mean = float(global_mean)
+        self.bu = _as_float(bu); self.bi = _as_float(bi)
+        self.pu = _as_float(pu); self.qi = _as_float(qi)
+        self.version = version; self.kind = kind
+        self.clip = tuple(clip) if clip is not None and len(clip) else None
+        self.user_index = {uid: i for i, uid in enumerate(self.user_ids)}
+        self.item_index = {iid: i for i, iid in enumerate(self.item_ids)}
+        self._item_lookup = pd.Index(self.item_ids)
+
+    def predict(self, user_id, item_id):
+        """Estimates a rating the same way surprise.SVD.predict does for biased SVD."""
+        u = self.user_index.get(user_id); i = self.item_index.get(item_id)
+        est = self.global_mean
+        if u is not None: est += self.bu[u]
+        if i is not None: est += self.bi[i]
+        if u is not None and i is not None: est += float(np.dot(self.qi[i], self.pu[u]))
+        return min(self.clip[1], max(self.clip[0], est)) if self.clip else est
+
+    def score_items(self, user_ids, item_ids):
+        """
+        Returns a (len(user_ids), len(item_ids)) matrix of clipped estimates,
+        identical to calling predict() for every pair, from one matrix product.
+        """
+        item_pos = self._item_lookup.get_indexer(np.asarray(item_ids).astype(str)); known_items = item_pos >= 0
+        user_pos = np.array([self.user_index.get(uid, -1) for uid in user_ids], dtype=int); known_users = user_pos >= 0
+        scores = np.full((len(user_pos), len(item_pos)), self.global_mean, dtype=self.qi.dtype)
+        scores += np.where(known_users, self.bu[user_pos], 0.0)[:, None]
+        scores[:, known_items] += self.bi[item_pos[known_items]]
+        if known_users.any() and known_items.any():
+            dots = self.pu[user_pos[known_users]] @ self.qi[item_pos[known_items]].T
+            scores[np.ix_(known_users, known_items)] += dots
+        return np.clip(scores, self.clip[0], self.clip[1]) if self.clip else scores
+
+    def top_k(self, user_ids, item_ids, seen_ids=None, k=100):
+        """
+        Returns the k highest-scoring item ids for each user, best first.
+        seen_ids holds one collection of ids to skip per user (or None).
+        """
+        item_ids = np.asarray(item_ids)
+        scores = self.score_items(user_ids, item_ids)
+        if seen_ids is not None:
+            for row, seen in enumerate(seen_ids):
+                if seen: scores[row, pd.Index(item_ids).isin(list(seen))] = -np.inf
+        k = min(k, len(item_ids))
+        if k == 0: return [[] for _ in user_ids]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        return [item_ids[row[np.isfinite(scores[i, row])]].tolist() for i, row in enumerate(top)]
+
+    def recommend(self, user_id, item_ids, seen_ids=(), k=100):
+        """Single-user top_k."""
+        return self.top_k([user_id], item_ids, [seen_ids], k)[0]
+
+    def fold_in(self, user_id, item_ids, ratings, reg=REG_ALL):
+        """
+        Re-fits one user's bias and factors against the fixed item factors
+        with a single regularized least-squares solve, and stores the result.
+        Ratings for items the model has never seen are ignored.
+        """
+        pairs = [(self.item_index[iid], float(r)) for iid, r in zip(item_ids, ratings) if iid in self.item_index]
+        if not pairs: return None
+        idx = np.array([i for i, _ in pairs]); y = np.array([r for _, r in pairs]) - self.global_mean - self.bi[idx]
+        # Solve for [bu, pu] jointly. SGD applies reg once per rating, hence reg * n.
+        X = np.hstack([np.ones((len(idx), 1)), self.qi[idx]])
+        w = np.linalg.solve(X.T @ X + reg * len(idx) * np.eye(X.shape[1]), X.T @ y)
+        self.set_user(user_id, w[0], w[1:])
+        return w[0], w[1:]
+
+    def set_user(self, user_id, bu, pu):
+        """
+        Replaces (or adds) one user's row. Writers must hold model_store._lock;
+        readers don't lock, so the row goes into new arrays that are swapped
+        in whole and a concurrent score never sees a half-written row.
+        """
+        u = self.user_index.get(user_id)
+        if u is not None:
+            new_bu = self.bu.copy(); new_pu = self.pu.copy()
+            new_bu[u] = bu; new_pu[u] = pu
+            self.bu = new_bu; self.pu = new_pu
+            return
+        # Grow the arrays before publishing the index entry, so a concurrent
+        # reader never sees an index that points past the end of them.
+        self.bu = np.append(self.bu, bu); self.pu = np.vstack([self.pu, pu]); self.user_ids = np.append(self.user_ids, user_id)
+        self.user_index[user_id] = len(self.user_ids) - 1
+
+def fit_svd_factors(implicit_reviews_df, random_state=None):
+    """Fits SVD on (user_id, restaurant_id, implicit_rating) rows and returns its factors."""
+    reader = Reader(rating_scale=RATING_SCALE); data = Dataset.load_from_df(implicit_reviews_df[['user_id', 'restaurant_id', 'implicit_rating']], reader)
+    trainset = data.build_full_trainset(); model = SVD(n_factors=50, n_epochs=20, lr_all=0.005, reg_all=REG_ALL, random_state=random_state); model.fit(trainset)
+    user_ids = [trainset.to_raw_uid(u) for u in range(trainset.n_users)]
+    item_ids = [trainset.to_raw_iid(i) for i in range(trainset.n_items)]
+    return FactorModel(user_ids, item_ids, trainset.global_mean, model.bu, model.bi, model.pu, model.qi)
+
+def save_model(model, model_dir=MODEL_DIR):
+    """Writes the model as a new versioned artifact and returns its path."""
+    os.makedirs(model_dir, exist_ok=True)
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    path = os.path.join(model_dir, f"{model.kind}-{version}.npz")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, user_ids=model.user_ids, item_ids=model.item_ids, global_mean=model.global_mean, bu=model.bu, bi=model.bi, pu=model.pu, qi=model.qi, clip=np.array(model.clip or [], dtype=float))
+    # Rename into place so a serving process never sees a half-written file.
+    os.replace(tmp_path, path)
+    model.version = version
+    return path
+
+def load_model(path):
+    kind, version = os.path.basename(path)[:-len('.npz')].split('-', 1)
+    with np.load(path, allow_pickle=False) as data:
+        clip = data['clip'] if 'clip' in data.files else RATING_SCALE
+        return FactorModel(data['user_ids'], data['item_ids'], data['global_mean'], data['bu'], data['bi'], data['pu'], data['qi'], version=version, kind=kind, clip=clip)
+
+def list_artifacts(model_dir=MODEL_DIR, kind='svd'):
+    """Returns artifact paths oldest first. Version stamps sort chronologically."""
+    return sorted(glob.glob(os.path.join(model_dir, f'{kind}-*.npz')))
+
+def prune_artifacts(keep, model_dir=MODEL_DIR, kind='svd'):
+    for path in list_artifacts(model_dir, kind)[:-keep] if keep > 0 else []:
+        os.remove(path)
+        shutil.rmtree(folds_dir(path), ignore_errors=True)
+
+# --- Folded-in User Rows ---
+def folds_dir(artifact_path):
+    return artifact_path[:-len('.npz')] + '.folds'
+
+def save_user_fold(artifact_path, user_id, bu, pu):
+    directory = folds_dir(artifact_path)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{user_id}.npz"); tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, bu=bu, pu=pu)
+    os.replace(tmp_path, path)
+
+def apply_user_folds(model, artifact_path):
+    """Overlays every folded-in user row stored for artifact_path onto model."""
+    for path in glob.glob(os.path.join(folds_dir(artifact_path), '*.npz')):
+        with np.load(path, allow_pickle=False) as data:
+            model.set_user(os.path.basename(path)[:-len('.npz')], float(data['bu']), data['pu'])
+    return model
+
+def _folds_mtime(artifact_path):
+    try: return os.stat(folds_dir(artifact_path)).st_mtime_ns
+    except FileNotFoundError: return None
+
+# --- Serving Cache ---
+# kind -> (artifact path, folds dir mtime, model). The mtime check lets a
+# process pick up rows another worker folded in without reloading the artifact.
+_loaded = {}
+_lock = threading.Lock()
+
+def load_latest_model(model_dir=MODEL_DIR, kind='svd'):
+    """Returns the newest artifact of the given kind as a FactorModel, or None if none exists yet."""
+    artifacts = list_artifacts(model_dir, kind)
+    if not artifacts: return None
+    latest = artifacts[-1]; folds_mtime = _folds_mtime(latest)
+    path, mtime, model = _loaded.get(kind, (None, None, None))
+    if path == latest and mtime == folds_mtime: return model
+    with _lock:
+        path, mtime, model = _loaded.get(kind, (None, None, None))
+        if path != latest:
+            print(f"[DEBUG] Loading {kind.upper()} model artifact {os.path.basename(latest)}")
+            model = apply_user_folds(load_model(latest), latest)
+        elif mtime != folds_mtime:
+            model = apply_user_folds(model, latest)
+        _loaded[kind] = (latest, folds_mtime, model)
+        return model
+
+def fold_in_user(user_id, item_ids, ratings, model_dir=MODEL_DIR):
+    """Folds a user's ratings into the newest SVD artifact and persists the new row."""
+    model = load_latest_model(model_dir, 'svd')
+    if model is None: return None
+    artifact_path = os.path.join(model_dir, f"svd-{model.version}.npz")
+    # The shared model is only written under the lock, so two fold-ins (or a
+    # fold-in and a folds reload) can't both grow the arrays from the same base.
+    with _lock:
+        result = model.fold_in(user_id, item_ids, ratings)
+        if result is None: return None
+        save_user_fold(artifact_path, user_id, *result)
+        # Our own write bumped the folds dir; no need to re-read it.
+        if _loaded.get('svd', (None, None, None))[2] is model: _loaded['svd'] = (artifact_path, _folds_mtime(artifact_path), model)
+    return result
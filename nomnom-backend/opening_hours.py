@@ -0,0 +1,43 @@
+# ----------------------------------------------------------------------
+# FILE: opening_hours.py (Precompiled Opening-Hours Index)
+# ----------------------------------------------------------------------
+# Turns every restaurant's opening/closing minutes (see features.py) into
+# numeric hours once and answers "which restaurants are open at time t"
+# for the whole catalogue with a few vectorized comparisons. Follows
+# is_restaurant_open exactly: missing or unparseable hours and identical
+# open/close strings mean always open, and a closing time before the
+# opening time is an overnight range (e.g. 16:00-03:00).
+# ----------------------------------------------------------------------
+import numpy as np
+
+from data_store import cached_for_frame
+from features import restaurant_features, minutes_to_hours
+
+class OpeningHoursIndex:
+    def __init__(self, restaurants_df):
+        # Snapshot frames already carry the stored open/close minutes; any
+        # other catalogue frame has them parsed here.
+        hours = restaurants_df if 'open_minute' in restaurants_df.columns else restaurant_features(restaurants_df)
+        self.ids = restaurants_df['id'].to_numpy()
+        self.open_minute = hours['open_minute'].to_numpy(dtype=float, na_value=np.nan); self.close_minute = hours['close_minute'].to_numpy(dtype=float, na_value=np.nan)
+        self.open_hours = minutes_to_hours(self.open_minute); self.close_hours = minutes_to_hours(self.close_minute)
+        self.always_open = hours['always_open'].to_numpy(dtype=bool)
+        self.overnight = self.close_hours < self.open_hours
+
+    def open_mask(self, current_time_float):
+        """Boolean array, aligned with the catalogue rows, of restaurants open at the given hour."""
+        t = current_time_float
+        with np.errstate(invalid='ignore'):
+            same_day = (self.open_hours <= t) & (t < self.close_hours)
+            overnight = (t >= self.open_hours) | (t < self.close_hours)
+        return self.always_open | np.where(self.overnight, overnight, same_day)
+
+    def open_ids(self, current_time_float):
+        return self.ids[self.open_mask(current_time_float)]
+
+    def closed_ids(self, current_time_float):
+        return self.ids[~self.open_mask(current_time_float)]
+
+def get_opening_hours_index(restaurants_df):
+    """The OpeningHoursIndex for this catalogue frame, compiled once per frame."""
+    return cached_for_frame('opening_hours', restaurants_df, OpeningHoursIndex)
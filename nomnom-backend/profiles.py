@@ -0,0 +1,103 @@
+# ----------------------------------------------------------------------
+# FILE: profiles.py (Incrementally Maintained User Profiles)
+# ----------------------------------------------------------------------
+# build_user_profile() re-reads a user's whole meal and interaction
+# history on every request. Instead, the user_restaurant_stats table keeps
+# running counters per (user, restaurant): weekday meals, weekend meals and
+# declines (see features.user_restaurant_stats). Each write bumps them in
+# the same transaction as the meal or interaction itself, and the profile
+# is derived from those counters joined with the current catalogue. The
+# cost scales with the number of restaurants a user has been to, not with
+# how many meals they have logged.
+#
+# Because every meal at a restaurant has the same travel distance, the
+# weekday/weekend medians are exact weighted medians, not estimates. The
+# result matches build_user_profile() within these tolerances:
+#   - avg_price and the travel medians agree to 1e-9 relative (float
+#     summation order only);
+#   - top_tags holds the same tags; ties are all kept and sorted, as
+#     Series.mode() does;
+#   - disliked_tags can differ only when several tags tie for third place.
+#     Here ties are broken alphabetically; value_counts() leaves them in
+#     unspecified order.
+# ----------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+from data_store import cached_for_frame
+from features import parse_prices
+from geo import haversine_array
+
+TAG_COLUMNS = ['tag_1', 'tag_2', 'tag_3']
+
+def _weighted_mean(values, weights):
+    keep = ~np.isnan(values) & (weights > 0)
+    total = weights[keep].sum()
+    return float((values[keep] * weights[keep]).sum() / total) if total else np.nan
+
+def _weighted_median(values, weights):
+    """Median of each value repeated weights times, skipping NaN like Series.median()."""
+    keep = ~np.isnan(values) & (weights > 0)
+    values, weights = values[keep], weights[keep]
+    total = int(weights.sum())
+    if total == 0: return np.nan
+    order = np.argsort(values, kind='stable'); values = values[order]; cumulative = np.cumsum(weights[order])
+    low = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]; high = values[np.searchsorted(cumulative, total // 2, side='right')]
+    return (low + high) / 2
+
+def _tag_counts(tags, weights):
+    """Weighted count of every non-null tag across the tag columns, one count per tag slot like stack()."""
+    flat = tags.ravel(); flat_weights = np.repeat(weights, tags.shape[1])
+    keep = pd.notna(flat) & (flat_weights > 0)
+    return pd.Series(flat_weights[keep]).groupby(flat[keep]).sum()
+
+def _user_rows(stats_df, user_id):
+    positions = cached_for_frame('stats_by_user', stats_df, lambda df: df.groupby('user_id').indices).get(user_id)
+    return stats_df.iloc[positions] if positions is not None else stats_df.iloc[:0]
+
+def build_profile_from_stats(user, stats_df, restaurants_df, include_declines=True):
+    """
+    The build_user_profile() dict for `user`, derived from their
+    user_restaurant_stats rows. include_declines=False matches the new-user
+    path, which builds its profile without interactions.
+    """
+    print(f"[DEBUG] Building profile for user {user['id']} from stored counters...")
+    rows = _user_rows(stats_df, user['id'])
+    weekday = rows['weekday_meals'].to_numpy(dtype=float); weekend = rows['weekend_meals'].to_numpy(dtype=float)
+    if (weekday + weekend).sum() == 0:
+        print("[DEBUG] User has no meal data. Returning empty profile.")
+        return {}
+
+    catalogue = cached_for_frame('restaurants_by_id', restaurants_df, lambda df: df.drop_duplicates('id').set_index('id'))
+    details = catalogue.reindex(rows['restaurant_id'].to_numpy())
+    # Meals at restaurants with no price strings are left out, like the
+    # dropna(subset=['price_min', 'price_max']) in build_user_profile.
+    priced = (details['price_min'].notna() & details['price_max'].notna()).to_numpy()
+    weekday = weekday * priced; weekend = weekend * priced; meals = weekday + weekend
+
+    if meals.sum() == 0: avg_price = 30.0
+    else:
+        price_min = details['price_min_value'] if 'price_min_value' in details.columns else parse_prices(details['price_min'])
+        price_max = details['price_max_value'] if 'price_max_value' in details.columns else parse_prices(details['price_max'])
+        avg_price = (_weighted_mean(price_min.to_numpy(dtype=float), meals) + _weighted_mean(price_max.to_numpy(dtype=float), meals)) / 2
+
+    user_lat, user_lon = (np.nan if user.get(c) is None else float(user[c]) for c in ('latitude', 'longitude'))
+    distances = haversine_array(user_lat, user_lon, details['latitude'].to_numpy(dtype=float), details['longitude'].to_numpy(dtype=float))
+
+    tags = details[TAG_COLUMNS].to_numpy(dtype=object)
+    tag_counts = _tag_counts(tags, meals)
+    disliked_tags = []
+    declines = rows['declines'].to_numpy(dtype=float)
+    if include_declines and declines.sum() > 0:
+        decline_counts = _tag_counts(tags, declines)
+        disliked_tags = sorted(decline_counts.items(), key=lambda item: (-item[1], item[0]))[:3]
+        disliked_tags = [tag for tag, _ in disliked_tags]
+
+    profile = {
+        'top_tags': sorted(tag_counts.index[tag_counts == tag_counts.max()]) if not tag_counts.empty else [],
+        'disliked_tags': disliked_tags, 'avg_price': avg_price,
+        'weekday_travel_dist': _weighted_median(distances, weekday) if weekday.sum() > 0 else 5.0,
+        'weekend_travel_dist': _weighted_median(distances, weekend) if weekend.sum() > 0 else 15.0,
+    }
+    print(f"[DEBUG] Profile built: {profile}")
+    return profile
@@ -1,31 +1,31 @@
 # ----------------------------------------------------------------------
 # FILE: recommender.py (With SVD Fallback Logic)
 # ----------------------------------------------------------------------
-import pandas as pd
-from sqlalchemy import create_engine, text
-from math import radians, sin, cos, sqrt, atan2, log
 import os
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+from math import log
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from surprise import Dataset, Reader, SVD
 from datetime import datetime
 import numpy as np
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.preprocessing import LabelEncoder
 from zoneinfo import ZoneInfo
+from data_store import cached_for_frame, get_catalogue, load_user, load_user_meals, load_user_interactions, load_user_stats, meal_time_counts
+from geo import haversine, haversine_array, distances_from
+from model_store import fit_svd_factors, load_latest_model, fold_in_user
+from als import fit_als_factors
+from opening_hours import get_opening_hours_index
+from features import implicit_ratings, parse_prices
+from profiles import build_profile_from_stats
+from metrics import span
 
-# --- Database Connection ---
-db_url = os.environ.get('DATABASE_URL')
-if db_url and db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://", 1)
-engine = create_engine(db_url or 'sqlite:///nomnom.db')
+# Collaborative filtering engine used for warm-start candidates: 'svd' or 'als'.
+CANDIDATE_ENGINE = os.environ.get('CANDIDATE_ENGINE', 'svd').lower()
 
 # --- Helper & Context Functions ---
-def haversine(lat1, lon1, lat2, lon2):
-    if any(v is None or not isinstance(v, (int, float)) for v in [lat1, lon1, lat2, lon2]):
-        return float('inf')
-    R = 6371; lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2]); dlon = lon2 - lon1; dlat = lat2 - lat1; a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2; c = 2 * atan2(sqrt(a), sqrt(1 - a)); return R * c
-
 def is_restaurant_open(restaurant_row, current_time_float):
     opening_time_str = restaurant_row['opening_time']
     closing_time_str = restaurant_row['closing_time']
@@ -75,8 +75,10 @@ def build_user_profile(user_id, meals_df, restaurants_df, interactions_df):
     
     user_meals_details = pd.merge(user_meals, restaurants_df, left_on='restaurant_id', right_on='id', how='left').dropna(subset=['price_min', 'price_max'])
     
-    price_min_numeric = pd.to_numeric(user_meals_details['price_min'], errors='coerce')
-    price_max_numeric = pd.to_numeric(user_meals_details['price_max'], errors='coerce')
+    if 'price_min_value' in user_meals_details.columns:
+        price_min_numeric = user_meals_details['price_min_value']; price_max_numeric = user_meals_details['price_max_value']
+    else:
+        price_min_numeric = parse_prices(user_meals_details['price_min']); price_max_numeric = parse_prices(user_meals_details['price_max'])
     avg_price = (price_min_numeric.mean() + price_max_numeric.mean()) / 2 if not user_meals_details.empty else 30.0
 
     weekday_meals = user_meals_details[~user_meals_details['day'].isin(['Saturday', 'Sunday'])]
@@ -87,10 +89,10 @@ def build_user_profile(user_id, meals_df, restaurants_df, interactions_df):
         declined_interactions = interactions_df[(interactions_df['user_id'] == user_id) & (interactions_df['user_action'] == 'decline')]
         if not declined_interactions.empty:
             declined_details = pd.merge(declined_interactions, restaurants_df, left_on='restaurant_id', right_on='id', how='left')
-            disliked_tags = declined_details[['tag_1', 'tag_2', 'tag_3']].stack().value_counts().nlargest(3).index.tolist()
+            disliked_tags = declined_details[['tag_1', 'tag_2', 'tag_3']].astype(object).stack().value_counts().nlargest(3).index.tolist()
 
     profile = {
-        'top_tags': user_meals_details[['tag_1', 'tag_2', 'tag_3']].stack().mode().tolist(),
+        'top_tags': user_meals_details[['tag_1', 'tag_2', 'tag_3']].astype(object).stack().mode().tolist(),
         'disliked_tags': disliked_tags, 'avg_price': avg_price,
         'weekday_travel_dist': weekday_meals['distance_travelled'].median() if not weekday_meals.empty and 'distance_travelled' in weekday_meals.columns else 5.0,
         'weekend_travel_dist': weekend_meals['distance_travelled'].median() if not weekend_meals.empty and 'distance_travelled' in weekend_meals.columns else 15.0,
@@ -99,15 +101,10 @@ def build_user_profile(user_id, meals_df, restaurants_df, interactions_df):
     return profile
 
 def create_implicit_ratings(reviews_df):
-    df = reviews_df.copy()
-    def calculate_score(row):
-        score = float(row['rating'])
-        if row.get('price_satisfaction') == True: score += 1.0
-        if pd.notna(row.get('visit_frequency')) and row['visit_frequency'] > 2: score += 1.0
-        if row.get('price_satisfaction') == False: score -= 0.5
-        return min(7.0, max(1.0, score))
-    df['implicit_rating'] = df.apply(calculate_score, axis=1)
-    return df
+    """reviews_df with an implicit_rating column; snapshot reviews already carry the stored one."""
+    if 'implicit_rating' in reviews_df.columns: return reviews_df
+    if reviews_df.empty: return reviews_df.assign(implicit_rating=pd.Series(dtype=float))
+    return reviews_df.assign(implicit_rating=implicit_ratings(reviews_df))
 
 def calculate_relevance_score(restaurant, user, user_profile, context, predicted_tag):
     day, meal_time, _ = context
@@ -118,7 +115,7 @@ def calculate_relevance_score(restaurant, user, user_profile, context, predicted
     actual_dist = haversine(user['latitude'], user['longitude'], restaurant['latitude'], restaurant['longitude'])
     score += max(0, 1 - (actual_dist / (expected_dist * 2))) * weights['distance']
     if user_profile.get('avg_price', 0) < 20: weights['price'] = 0.3
-    restaurant_price = (pd.to_numeric(restaurant['price_min'], errors='coerce') + pd.to_numeric(restaurant['price_max'], errors='coerce')) / 2
+    restaurant_price = parse_prices([restaurant['price_min'], restaurant['price_max']]).mean(skipna=False)
     if pd.notna(restaurant_price) and user_profile.get('avg_price'):
         score += max(0, 1 - (abs(restaurant_price - user_profile['avg_price']) / user_profile['avg_price'])) * weights['price']
     restaurant_tags = set([t for t in [restaurant['tag_1'], restaurant['tag_2'], restaurant['tag_3']] if pd.notna(t)])
@@ -128,32 +125,79 @@ def calculate_relevance_score(restaurant, user, user_profile, context, predicted
     if predicted_tag and predicted_tag in restaurant_tags: score += weights['pattern']
     return score
 
+def calculate_relevance_scores(restaurants_df, user, user_profile, context, predicted_tag, distances=None):
+    """
+    Batch version of calculate_relevance_score: scores every row of
+    restaurants_df in one NumPy pass and returns the scores as an array in
+    row order. Matches the scalar function term by term, including how it
+    treats missing values. distances, if given, holds the precomputed
+    user→restaurant distance of each row.
+    """
+    day, meal_time, _ = context
+    n = len(restaurants_df); score = np.zeros(n); weights = {'distance': 0.3, 'price': 0.2, 'tag': 0.2, 'popularity': 0.1, 'pattern': 0.2}
+    is_weekend = day in ['Saturday', 'Sunday']
+    expected_dist = user_profile.get('weekend_travel_dist', 15.0) if is_weekend else user_profile.get('weekday_travel_dist', 5.0)
+    if expected_dist > 20: weights['distance'] = 0.2
+    actual_dist = haversine_array(user['latitude'], user['longitude'], restaurants_df['latitude'], restaurants_df['longitude']) if distances is None else np.asarray(distances, dtype=float)
+    # fmax/fmin ignore NaN the same way the scalar max(0, nan) / min(1, nan) do.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score += np.fmax(0, 1 - (actual_dist / (expected_dist * 2))) * weights['distance']
+        if user_profile.get('avg_price', 0) < 20: weights['price'] = 0.3
+        if 'price_mid' in restaurants_df.columns: restaurant_price = restaurants_df['price_mid'].to_numpy(dtype=float)
+        else: restaurant_price = ((parse_prices(restaurants_df['price_min']) + parse_prices(restaurants_df['price_max'])) / 2).to_numpy(dtype=float)
+        if user_profile.get('avg_price'):
+            price_term = np.fmax(0, 1 - (np.abs(restaurant_price - user_profile['avg_price']) / user_profile['avg_price'])) * weights['price']
+            score += np.where(np.isnan(restaurant_price), 0.0, price_term)
+    tags = restaurants_df[['tag_1', 'tag_2', 'tag_3']].to_numpy(dtype=object)
+    if user_profile.get('top_tags'): score += np.isin(tags, list(user_profile['top_tags'])).any(axis=1) * weights['tag']
+    if user_profile.get('disliked_tags'): score -= np.isin(tags, list(user_profile['disliked_tags'])).any(axis=1) * 0.3
+    # `x or 0` maps None to 0 but keeps NaN, and min(1, log(nan)) is 1.
+    num_reviews = pd.to_numeric(restaurants_df['num_google_reviews'], errors='coerce').to_numpy(dtype=float)
+    num_reviews = np.where(restaurants_df['num_google_reviews'].to_numpy(dtype=object) == None, 0.0, num_reviews) # noqa: E711 (element-wise)
+    score += np.where(np.isnan(num_reviews), 1.0, np.minimum(1, np.log(np.nan_to_num(num_reviews) + 1) / 7)) * weights['popularity']
+    if predicted_tag: score += (tags == predicted_tag).any(axis=1) * weights['pattern']
+    return score
+
 # --- Recommendation Models ---
-def recommend_for_new_user(user, restaurants_df, meals_df, exclude_ids=[]):
-    return recommend_for_active_user(user, restaurants_df, pd.DataFrame(), pd.DataFrame(), meals_df, exclude_ids, is_new_user=True)
+def recommend_for_new_user(user, restaurants_df, meals_df, exclude_ids=[], user_distances=None, user_profile=None, context=None, popularity=None):
+    return recommend_for_active_user(user, restaurants_df, pd.DataFrame(), pd.DataFrame(), meals_df, exclude_ids, is_new_user=True, context=context, user_distances=user_distances, user_profile=user_profile, popularity=popularity)
 
-def recommend_for_active_user(user, restaurants_df, interactions_df, reviews_df, meals_df, exclude_ids=[], is_new_user=False, context=None):
+def recommend_for_active_user(user, restaurants_df, interactions_df, reviews_df, meals_df, exclude_ids=[], is_new_user=False, context=None, cf_model=None, engine=None, user_distances=None, user_profile=None, popularity=None, pattern_table=None):
+    """
+    Scores candidates for one user. meals_df only needs the user's own meals
+    when popularity (meals per restaurant at the current meal time) is
+    given; otherwise the cold-start path counts them from meals_df.
+    pattern_table, if given, is get_pattern_table() for these meals ({} for
+    none), so callers scoring many contexts look it up once.
+    """
     print(f"[DEBUG] Running model for user {user['id']} (New User: {is_new_user})")
     if context is None:
         context = get_current_context()
     
     day, meal_time, current_time_float = context
-    user_profile = build_user_profile(user['id'], meals_df, restaurants_df, interactions_df)
+    # Closed restaurants are dropped before candidate generation, so every
+    # slot in the candidate pool goes to a restaurant the user can visit now.
+    with span('recommend.open_filter'):
+        is_open = pd.Series(get_opening_hours_index(restaurants_df).open_mask(current_time_float), index=restaurants_df.index)
+        closed_ids = set(restaurants_df.loc[~is_open, 'id'])
+    if user_profile is None:
+        with span('recommend.user_profile'): user_profile = build_user_profile(user['id'], meals_df, restaurants_df, interactions_df)
     predicted_tag = None
     if not is_new_user and not meals_df.empty:
-        pattern_model, encoders = train_pattern_recognition_model(user['id'], meals_df, restaurants_df)
-        if pattern_model:
-            try:
-                day_encoded = encoders['day'].transform([day])[0]; meal_time_encoded = encoders['meal_time'].transform([meal_time])[0]
-                predicted_tag_encoded = pattern_model.predict([[day_encoded, meal_time_encoded]])[0]
-                predicted_tag = encoders['tag'].inverse_transform([predicted_tag_encoded])[0]
-                print(f"[DEBUG] Pattern model predicts user is in the mood for: {predicted_tag}")
-            except Exception as e: print(f"[DEBUG] Could not predict tag: {e}")
+        if pattern_table is None:
+            with span('recommend.pattern_model'): pattern_table = get_pattern_table(user['id'], meals_df, restaurants_df)
+        if pattern_table:
+            predicted_tag = pattern_table.get((day, meal_time))
+            if predicted_tag: print(f"[DEBUG] Pattern model predicts user is in the mood for: {predicted_tag}")
+            else: print(f"[DEBUG] Could not predict tag: {day}/{meal_time} is not in the user's meal history.")
     if is_new_user:
-        popular_now_ids = meals_df[meals_df['meal_time'] == meal_time]['restaurant_id'].value_counts().nlargest(30).index.tolist()
-        restaurants_df['distance'] = restaurants_df.apply(lambda r: haversine(user['latitude'], user['longitude'], r['latitude'], r['longitude']), axis=1)
-        nearby_ids = restaurants_df.sort_values('distance').head(30)['id'].tolist()
-        candidate_ids = list(dict.fromkeys(popular_now_ids + nearby_ids))
+        with span('recommend.cold_start_candidates'):
+            if popularity is None: popularity = meals_df[meals_df['meal_time'] == meal_time]['restaurant_id'].value_counts()
+            popular_now_ids = popularity[~popularity.index.isin(closed_ids)].nlargest(30).index.tolist()
+            if user_distances is None:
+                user_distances = distances_from(user['latitude'], user['longitude'], restaurants_df)
+            nearby_ids = restaurants_df.loc[user_distances[is_open].sort_values().index[:30], 'id'].tolist()
+            candidate_ids = list(dict.fromkeys(popular_now_ids + nearby_ids))
         print(f"[DEBUG] Cold-start generated {len(candidate_ids)} candidates.")
     else:
         all_seen_ids = set(exclude_ids)
@@ -161,41 +205,99 @@ def recommend_for_active_user(user, restaurants_df, interactions_df, reviews_df,
             user_interactions = interactions_df[interactions_df['user_id'] == user['id']]
             all_seen_ids.update(user_interactions['restaurant_id'].unique())
         
-        candidate_ids = get_svd_recs(user['id'], reviews_df, restaurants_df, all_seen_ids)
-        print(f"[DEBUG] Warm-start (SVD) generated {len(candidate_ids)} candidates.")
+        skip_ids = all_seen_ids | closed_ids
+        # A model passed in decides the engine it belongs to, whatever CANDIDATE_ENGINE says.
+        engine = engine or (cf_model.kind if cf_model is not None else CANDIDATE_ENGINE)
+        with span(f'recommend.{engine}_candidates'):
+            if engine == 'als':
+                candidate_ids = get_als_recs(user['id'], restaurants_df, skip_ids, model=cf_model)
+            else:
+                candidate_ids = get_svd_recs(user['id'], reviews_df, restaurants_df, skip_ids, model=cf_model)
+        print(f"[DEBUG] Warm-start ({engine.upper()}) generated {len(candidate_ids)} candidates.")
         
         if not candidate_ids:
-            print("[DEBUG] SVD returned no candidates. Falling back to Content-Based model.")
-            candidate_ids = get_content_based_recs(user['id'], restaurants_df, meals_df, all_seen_ids)
+            print(f"[DEBUG] {engine.upper()} returned no candidates. Falling back to Content-Based model.")
+            with span('recommend.content_candidates'): candidate_ids = get_content_based_recs(user['id'], restaurants_df, meals_df, skip_ids)
             print(f"[DEBUG] Content-Based fallback generated {len(candidate_ids)} candidates.")
 
     candidate_details = restaurants_df[restaurants_df['id'].isin(candidate_ids)]
     if candidate_details.empty: 
         print("[DEBUG] No candidate details found after generation. Returning empty list.")
         return []
-    open_candidates = candidate_details[candidate_details.apply(is_restaurant_open, args=(current_time_float,), axis=1)]
+    open_candidates = candidate_details[is_open.loc[candidate_details.index]]
     if open_candidates.empty: 
         print("[DEBUG] All candidates are closed. Returning empty list.")
         return []
     print(f"[DEBUG] Found {len(open_candidates)} open candidates to score.")
-    scored_recs = [(r['id'], calculate_relevance_score(r, user, user_profile, context, predicted_tag)) for _, r in open_candidates.iterrows()]
-    scored_recs.sort(key=lambda x: x[1], reverse=True)
+    with span('recommend.scoring'):
+        candidate_distances = user_distances.loc[open_candidates.index] if user_distances is not None else None
+        scores = calculate_relevance_scores(open_candidates, user, user_profile, context, predicted_tag, candidate_distances)
+        scored_recs = list(zip(open_candidates['id'], scores.tolist()))
+        scored_recs.sort(key=lambda x: x[1], reverse=True)
     print(f"[DEBUG] Top 5 scored recommendations: {scored_recs[:5]}")
     final_rec_ids = [rec_id for rec_id, score in scored_recs if rec_id not in exclude_ids]
     print(f"[DEBUG] Returning {len(final_rec_ids[:15])} final recommendations.")
     return final_rec_ids[:15]
 
-def get_svd_recs(user_id, reviews_df, restaurants_df, all_seen_ids):
-    if reviews_df.empty: 
-        print("[DEBUG] SVD model: reviews_df is empty. Cannot generate candidates.")
+def train_svd_model(reviews_df, random_state=None):
+    """Trains an SVD FactorModel on implicit ratings derived from reviews_df."""
+    if reviews_df.empty: return None
+    return fit_svd_factors(create_implicit_ratings(reviews_df), random_state=random_state)
+
+def update_user_factors(user_id, user_reviews_df):
+    """Folds a user's current implicit ratings into the stored SVD model without a full retrain."""
+    if user_reviews_df.empty: return None
+    implicit_reviews_df = create_implicit_ratings(user_reviews_df)
+    result = fold_in_user(user_id, implicit_reviews_df['restaurant_id'].tolist(), implicit_reviews_df['implicit_rating'].tolist())
+    print(f"[DEBUG] Folded {len(implicit_reviews_df)} ratings into SVD factors for user {user_id}." if result else f"[DEBUG] No SVD model to fold ratings into for user {user_id}.")
+    return result
+
+def get_svd_recs(user_id, reviews_df, restaurants_df, all_seen_ids, model=None):
+    """Ranks unseen restaurants with a trained SVD model. Uses the newest stored artifact unless a model is given."""
+    if model is None:
+        model = load_latest_model()
+    if model is None:
+        print("[DEBUG] SVD model: no trained model artifact available. Cannot generate candidates.")
         return []
-    implicit_reviews_df = create_implicit_ratings(reviews_df)
-    reader = Reader(rating_scale=(1, 7)); data = Dataset.load_from_df(implicit_reviews_df[['user_id', 'restaurant_id', 'implicit_rating']], reader)
-    trainset = data.build_full_trainset(); model = SVD(n_factors=50, n_epochs=20, lr_all=0.005, reg_all=0.02); model.fit(trainset)
-    unseen_ids = set(restaurants_df['id']) - all_seen_ids
-    predictions = [model.predict(user_id, rest_id) for rest_id in unseen_ids]
-    predictions.sort(key=lambda x: x.est, reverse=True)
-    return [pred.iid for pred in predictions[:100]]
+    return model.recommend(user_id, restaurants_df['id'].to_numpy(), all_seen_ids, k=100)
+
+def train_als_model(reviews_df, meals_df, interactions_df, restaurants_df=None, random_state=None, **als_params):
+    """Trains an implicit ALS FactorModel on reviews, meals and swipe interactions."""
+    implicit_reviews_df = create_implicit_ratings(reviews_df) if not reviews_df.empty else None
+    item_ids = restaurants_df['id'].to_numpy() if restaurants_df is not None else None
+    return fit_als_factors(implicit_reviews_df, meals_df, interactions_df, item_ids=item_ids, random_state=random_state, **als_params)
+
+def get_als_recs(user_id, restaurants_df, all_seen_ids, model=None):
+    """Ranks unseen restaurants with a trained ALS model. Uses the newest stored artifact unless a model is given."""
+    if model is None:
+        model = load_latest_model(kind='als')
+    if model is None:
+        print("[DEBUG] ALS model: no trained model artifact available. Cannot generate candidates.")
+        return []
+    if user_id not in model.user_index:
+        print(f"[DEBUG] ALS model: user {user_id} has no factors yet. Cannot generate candidates.")
+        return []
+    return model.recommend(user_id, restaurants_df['id'].to_numpy(), all_seen_ids, k=100)
+
+# --- Content-Based Tag Index ---
+def build_tag_index(restaurants_df):
+    """TF-IDF matrix of every restaurant's tags (rows L2-normalized) and the id of each row."""
+    # Plain values: a catalogue read from an exported snapshot holds the tags as categoricals.
+    tags_combined = restaurants_df[['tag_1', 'tag_2', 'tag_3']].astype(object).fillna('').agg(' '.join, axis=1)
+    return TfidfVectorizer(stop_words='english').fit_transform(tags_combined).tocsr(), pd.Index(restaurants_df['id'])
+
+def get_tag_index(restaurants_df):
+    """build_tag_index for this catalogue frame, fitted once per frame."""
+    return cached_for_frame('tag_index', restaurants_df, build_tag_index)
+
+def top_n_positions(scores, n):
+    """Positions of the n highest finite scores, best first. Ties keep row order, like a stable sort."""
+    n = min(n, int(np.isfinite(scores).sum()))
+    if n == 0: return np.array([], dtype=int)
+    kth = np.partition(scores, len(scores) - n)[len(scores) - n]
+    above = np.flatnonzero(scores > kth); ties = np.flatnonzero(scores == kth)[:n - len(above)]
+    top = np.concatenate([above, ties])
+    return top[np.argsort(-scores[top], kind='stable')]
 
 def get_content_based_recs(user_id, restaurants_df, meals_df, all_seen_ids):
     """Generates recommendations based on content (tags) using meal history."""
@@ -203,37 +305,31 @@ def get_content_based_recs(user_id, restaurants_df, meals_df, all_seen_ids):
     eaten_restaurant_ids = user_eaten_restaurants['restaurant_id'].unique()
     if len(eaten_restaurant_ids) == 0: return []
 
-    restaurants_df['tags_combined'] = restaurants_df[['tag_1', 'tag_2', 'tag_3']].fillna('').agg(' '.join, axis=1)
-    tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(restaurants_df['tags_combined'])
-    
-    user_profile_indices = restaurants_df[restaurants_df['id'].isin(eaten_restaurant_ids)].index
-    if len(user_profile_indices) == 0: return []
-    
-    # FIX: Convert the numpy.matrix to a numpy.ndarray to prevent the error
-    user_profile_vector = np.asarray(tfidf_matrix[user_profile_indices].mean(axis=0))
-    
-    cosine_sim = cosine_similarity(user_profile_vector, tfidf_matrix)
-    sim_scores = sorted(list(enumerate(cosine_sim[0])), key=lambda x: x[1], reverse=True)
-    
-    recommended_ids = []
-    for idx, score in sim_scores:
-        restaurant_id = restaurants_df.iloc[idx]['id']
-        if restaurant_id not in all_seen_ids:
-            recommended_ids.append(restaurant_id)
-        if len(recommended_ids) >= 50:
-            break
-    return recommended_ids
+    tfidf_matrix, row_ids = get_tag_index(restaurants_df)
+    user_profile_rows = np.flatnonzero(row_ids.isin(eaten_restaurant_ids))
+    if len(user_profile_rows) == 0: return []
 
-def train_pattern_recognition_model(user_id, meals_df, restaurants_df):
+    # Rows are unit length, so ranking by the dot product with the mean
+    # profile vector is ranking by cosine similarity.
+    user_profile_vector = np.asarray(tfidf_matrix[user_profile_rows].mean(axis=0)).ravel()
+    sim_scores = tfidf_matrix @ user_profile_vector
+    if all_seen_ids: sim_scores[row_ids.isin(list(all_seen_ids))] = -np.inf
+    return row_ids[top_n_positions(sim_scores, 50)].tolist()
+
+def _pattern_training_data(user_id, meals_df, restaurants_df):
+    """The user's (day, meal_time, tag_1) meal rows the pattern model learns from, or None if there are too few."""
     user_meals = meals_df[meals_df['user_id'] == user_id]
     if len(user_meals) < 10: 
         print("[DEBUG] Not enough data to train pattern model (<10 meals).")
-        return None, None
-    training_data = pd.merge(user_meals, restaurants_df, left_on='restaurant_id', right_on='id').dropna(subset=['day', 'meal_time', 'tag_1'])
+        return None
+    tag_by_id = cached_for_frame('tag_by_id', restaurants_df, lambda df: df.set_index('id')['tag_1'])
+    training_data = pd.DataFrame({'day': user_meals['day'].to_numpy(), 'meal_time': user_meals['meal_time'].to_numpy(), 'tag_1': user_meals['restaurant_id'].map(tag_by_id).to_numpy()}).dropna()
     if len(training_data) < 10: 
         print("[DEBUG] Not enough clean data to train pattern model after merge.")
-        return None, None
+        return None
+    return training_data
+
+def _fit_pattern_model(training_data):
     encoders = {'day': LabelEncoder().fit(training_data['day']), 'meal_time': LabelEncoder().fit(training_data['meal_time']), 'tag': LabelEncoder().fit(training_data['tag_1'])}
     X = pd.DataFrame({'day': encoders['day'].transform(training_data['day']), 'meal_time': encoders['meal_time'].transform(training_data['meal_time'])})
     y = encoders['tag'].transform(training_data['tag_1'])
@@ -241,36 +337,75 @@ def train_pattern_recognition_model(user_id, meals_df, restaurants_df):
     print("[DEBUG] Pattern recognition model trained successfully.")
     return model, encoders
 
+def train_pattern_recognition_model(user_id, meals_df, restaurants_df):
+    training_data = _pattern_training_data(user_id, meals_df, restaurants_df)
+    if training_data is None: return None, None
+    return _fit_pattern_model(training_data)
+
+def predict_pattern_table(model, encoders):
+    """
+    Predicts the tag for every (day, meal_time) pair the model was trained
+    on, in one call. Pairs it never saw are left out, as their encoding fails.
+    """
+    days = encoders['day'].classes_; meal_times = encoders['meal_time'].classes_
+    X = pd.DataFrame({'day': np.repeat(np.arange(len(days)), len(meal_times)), 'meal_time': np.tile(np.arange(len(meal_times)), len(days))})
+    tags = encoders['tag'].inverse_transform(model.predict(X))
+    return {(days[d], meal_times[m]): tag for d, m, tag in zip(X['day'], X['meal_time'], tags)}
+
+# --- Pattern Table Cache ---
+# The pattern model only ever answers "which tag for this (day, meal_time)",
+# so each user's model is reduced to that lookup table and cached, keyed by
+# a fingerprint of the meals it was trained on. A new meal changes the
+# fingerprint; the stale entry just ages out of the LRU.
+PATTERN_CACHE_SIZE = int(os.environ.get('PATTERN_CACHE_SIZE', 1024))
+_pattern_tables = OrderedDict()
+_pattern_lock = threading.Lock()
+
+def get_pattern_table(user_id, meals_df, restaurants_df):
+    """Returns the user's {(day, meal_time): tag} table, or None when there's too little history to fit one."""
+    training_data = _pattern_training_data(user_id, meals_df, restaurants_df)
+    if training_data is None: return None
+    fingerprint = hashlib.sha1(pd.util.hash_pandas_object(training_data, index=False).to_numpy().tobytes()).hexdigest()
+    key = (user_id, fingerprint)
+    with _pattern_lock:
+        table = _pattern_tables.get(key)
+        if table is not None:
+            _pattern_tables.move_to_end(key)
+            return table
+    table = predict_pattern_table(*_fit_pattern_model(training_data))
+    with _pattern_lock:
+        _pattern_tables[key] = table
+        while len(_pattern_tables) > PATTERN_CACHE_SIZE: _pattern_tables.popitem(last=False)
+    return table
+
 # --- Main Orchestrator ---
 def get_recommendations(user_id, exclude_ids=[]):
     print(f"\n--- Starting new recommendation request for user {user_id} ---")
     try:
-        users_df = pd.read_sql_table('user', engine); reviews_df = pd.read_sql_table('review', engine); restaurants_df = pd.read_sql_table('restaurant', engine); interactions_df = pd.read_sql_table('interaction_log', engine); meals_df = pd.read_sql_table('meal', engine)
-        print(f"[DEBUG] Data loaded: {len(users_df)} users, {len(restaurants_df)} restaurants, {len(meals_df)} meals, {len(reviews_df)} reviews.")
+        with span('recommend.load_user'): user_df = load_user(user_id)
+        if user_df.empty:
+            print(f"[ERROR] User {user_id} not found in database.")
+            return []
+        with span('recommend.catalogue'): restaurants_df = get_catalogue()
+        with span('recommend.load_history'):
+            meals_df = load_user_meals(user_df, restaurants_df); interactions_df = load_user_interactions(user_id)
+            stats_df = load_user_stats(user_id, meals_df, interactions_df)
+        print(f"[DEBUG] Data loaded for user {user_id}: {len(restaurants_df)} restaurants, {len(meals_df)} meals, {len(interactions_df)} interactions.")
     except Exception as e:
         print(f"[ERROR] Failed to load data from database: {e}")
         return []
-    try:
-        current_user = users_df[users_df['id'] == user_id].iloc[0].to_dict()
-    except IndexError: 
-        print(f"[ERROR] User {user_id} not found in database.")
-        return []
-    if not meals_df.empty and not users_df.empty and not restaurants_df.empty:
-        user_locs = users_df.set_index('id')[['latitude', 'longitude']].to_dict('index')
-        rest_locs = restaurants_df.set_index('id')[['latitude', 'longitude']].to_dict('index')
-        meals_df['user_lat'] = meals_df['user_id'].map(lambda x: user_locs.get(x, {}).get('latitude'))
-        meals_df['user_lon'] = meals_df['user_id'].map(lambda x: user_locs.get(x, {}).get('longitude'))
-        meals_df['rest_lat'] = meals_df['restaurant_id'].map(lambda x: rest_locs.get(x, {}).get('latitude'))
-        meals_df['rest_lon'] = meals_df['restaurant_id'].map(lambda x: rest_locs.get(x, {}).get('longitude'))
-        meals_df['distance_travelled'] = meals_df.apply(lambda r: haversine(r['user_lat'], r['user_lon'], r['rest_lat'], r['rest_lon']), axis=1)
-        meals_df.drop(columns=['user_lat', 'user_lon', 'rest_lat', 'rest_lon'], inplace=True)
-    else:
-        print("[DEBUG] One or more dataframes are empty. Skipping distance calculation.")
+    current_user = user_df.iloc[0].to_dict()
     
-    df_for_counting = interactions_df if not interactions_df.empty else meals_df
-    meal_count = get_meal_count(user_id, df_for_counting)
+    # A user's own history decides whether they are new: their meals or their swipes, whichever is longer.
+    meal_count = max(get_meal_count(user_id, meals_df), get_meal_count(user_id, interactions_df))
+    is_new_user = meal_count < 15
+    with span('recommend.user_profile'): user_profile = build_profile_from_stats(current_user, stats_df, restaurants_df, include_declines=not is_new_user)
     
-    if meal_count < 15:
-        return recommend_for_new_user(current_user, restaurants_df, meals_df, exclude_ids)
+    if is_new_user:
+        context = get_current_context()
+        with span('recommend.distance'):
+            user_distances = distances_from(current_user['latitude'], current_user['longitude'], restaurants_df)
+        with span('recommend.popularity'): popularity = meal_time_counts(context[1])
+        return recommend_for_new_user(current_user, restaurants_df, meals_df, exclude_ids, user_distances, user_profile, context, popularity)
     else:
-        return recommend_for_active_user(current_user, restaurants_df, interactions_df, reviews_df, meals_df, exclude_ids)
\ No newline at end of file
+        return recommend_for_active_user(current_user, restaurants_df, interactions_df, pd.DataFrame(), meals_df, exclude_ids, user_profile=user_profile)
@@ -0,0 +1,217 @@
+# =======================================================================
+# NomNom AI: Recommender Benchmark Suite
+# Generates a synthetic dataset (scripts/generate_data.py) at a given
+# scale, bulk loads it into a database of its own, trains an SVD model and
+# then times every stage of a recommendation separately for a sample of
+# users: data load, distance computation, the user profile, the pattern
+# model, SVD and content-based candidates, the opening-hours filter,
+# scoring, and get_recommendations end to end.
+#
+# Results are written as JSON (median/p95/mean milliseconds per stage plus
+# the one-off setup timings). Passing --baseline compares each stage's
+# median with a previous result and exits with status 1 if any stage got
+# slower than the tolerance allows, so it can gate a change in CI.
+#
+# Examples:
+#   python scripts/benchmark.py --meals 10000 --save-baseline
+#   python scripts/benchmark.py --meals 100000 --database postgresql://localhost/nomnom_bench
+#   python scripts/benchmark.py --meals 10000 --reuse --baseline benchmarks/baseline-10000.json
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import io
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import numpy as np
+
+BENCHMARK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+STAGES = ['data_load', 'distance', 'user_profile', 'pattern_model', 'open_filter', 'svd_candidates', 'content_candidates', 'scoring', 'end_to_end']
+FORMAT_VERSION = 1
+
+# =======================================================================
+#  Timing Helpers
+# =======================================================================
+class StageTimer:
+    """Collects wall-clock samples per stage, in milliseconds."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try: yield
+        finally: self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        return {name: {'median_ms': float(np.median(values)), 'p95_ms': float(np.percentile(values, 95)), 'mean_ms': float(np.mean(values)), 'runs': len(values)} for name, values in self.samples.items()}
+
+def quiet():
+    """Swallows the recommender's [DEBUG] output, which would otherwise dominate the timings."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+# =======================================================================
+#  Setup & Measurement
+# =======================================================================
+def prepare_database(args, setup):
+    """Generates the dataset and loads it into args.database, unless --reuse finds it already there."""
+    from data_store import engine, has_table
+    from generate_data import generate_dataset, write_dataset
+    from bulk_load import bulk_load
+    from build_features import build_features
+    if args.reuse and has_table('meal'):
+        print(f"Reusing the dataset already in {engine.url.render_as_string(hide_password=True)}.")
+        return
+    start = time.perf_counter()
+    frames = generate_dataset(args.meals, args.users, args.restaurants, args.swipes_per_meal, args.seed)
+    setup['generate_s'] = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as data_dir:
+        with quiet(): write_dataset(frames, data_dir)
+        start = time.perf_counter()
+        bulk_load(data_dir, mode='replace', chunk_size=args.chunk_size, features=False, prehashed=True)
+        setup['bulk_load_s'] = time.perf_counter() - start
+    start = time.perf_counter()
+    with quiet(): build_features()
+    setup['build_features_s'] = time.perf_counter() - start
+
+def measure_user(timer, user_id, svd_model, context):
+    """Times each stage of one recommendation the way get_recommendations runs it."""
+    from data_store import get_catalogue, load_user, load_user_meals, load_user_interactions, load_user_stats
+    from features import meal_features
+    from geo import distances_from
+    from profiles import build_profile_from_stats
+    from opening_hours import get_opening_hours_index
+    from recommender import train_pattern_recognition_model, predict_pattern_table, get_svd_recs, get_content_based_recs, calculate_relevance_scores, get_recommendations
+
+    with timer.stage('data_load'):
+        user_df = load_user(user_id); restaurants_df = get_catalogue()
+        meals_df = load_user_meals(user_df, restaurants_df); interactions_df = load_user_interactions(user_id)
+        stats_df = load_user_stats(user_id, meals_df, interactions_df)
+    user = user_df.iloc[0].to_dict(); day, meal_time, hour = context
+    with timer.stage('distance'):
+        meal_features(meals_df, user_df, restaurants_df) # distance_travelled, as computed for meals without stored features
+        user_distances = distances_from(user['latitude'], user['longitude'], restaurants_df)
+    with timer.stage('user_profile'):
+        profile = build_profile_from_stats(user, stats_df, restaurants_df)
+    with timer.stage('pattern_model'):
+        # Fitted from scratch: get_pattern_table() would serve repeat runs from its cache.
+        model, encoders = train_pattern_recognition_model(user_id, meals_df, restaurants_df)
+        predicted_tag = predict_pattern_table(model, encoders).get((day, meal_time)) if model is not None else None
+    with timer.stage('open_filter'):
+        is_open = get_opening_hours_index(restaurants_df).open_mask(hour)
+        closed_ids = set(restaurants_df['id'].to_numpy()[~is_open])
+    seen_ids = set(interactions_df['restaurant_id']) | closed_ids
+    with timer.stage('svd_candidates'):
+        candidate_ids = get_svd_recs(user_id, None, restaurants_df, seen_ids, model=svd_model)
+    with timer.stage('content_candidates'):
+        content_ids = get_content_based_recs(user_id, restaurants_df, meals_df, seen_ids)
+    with timer.stage('scoring'):
+        candidates = restaurants_df[restaurants_df['id'].isin(candidate_ids or content_ids).to_numpy() & is_open]
+        calculate_relevance_scores(candidates, user, profile, context, predicted_tag, user_distances.loc[candidates.index])
+    with timer.stage('end_to_end'):
+        get_recommendations(user_id)
+
+def run_benchmark(args):
+    from data_store import engine, get_catalogue
+    from model_store import MODEL_DIR, load_latest_model
+    from train_model import train
+    import pandas as pd
+
+    setup = {}
+    prepare_database(args, setup)
+    start = time.perf_counter()
+    with quiet(): train(MODEL_DIR, keep=1, random_state=args.seed)
+    setup['train_svd_s'] = time.perf_counter() - start
+    start = time.perf_counter()
+    get_catalogue()
+    setup['catalogue_load_s'] = time.perf_counter() - start
+    svd_model = load_latest_model()
+
+    counts = pd.read_sql('SELECT (SELECT COUNT(*) FROM "user") AS users, (SELECT COUNT(*) FROM restaurant) AS restaurants, (SELECT COUNT(*) FROM meal) AS meals, (SELECT COUNT(*) FROM review) AS reviews, (SELECT COUNT(*) FROM interaction_log) AS interactions', engine).iloc[0]
+    user_ids = pd.read_sql('SELECT id FROM "user" ORDER BY id', engine)['id'].to_numpy()
+    sample = np.random.default_rng(args.seed).choice(user_ids, size=min(args.sample_users, len(user_ids)), replace=False)
+    print(f"Timing {len(sample)} users against {counts['users']:,} users, {counts['restaurants']:,} restaurants, {counts['meals']:,} meals, {counts['reviews']:,} reviews, {counts['interactions']:,} interactions...")
+    # Lunch on a weekday, so the opening-hours filter and the pattern model both have work to do.
+    context = ('Wednesday', 'Lunch', 13.0)
+    with quiet(): measure_user(StageTimer(), sample[0], svd_model, context) # warm-up: per-frame caches and imports
+    timer = StageTimer()
+    with quiet():
+        for user_id in sample: measure_user(timer, user_id, svd_model, context)
+    return {
+        'format': FORMAT_VERSION, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'dataset': {'target_meals': args.meals, 'seed': args.seed, **{k: int(v) for k, v in counts.items()}},
+        'database': engine.dialect.name, 'sample_users': len(sample),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'setup': {k: round(v, 4) for k, v in setup.items()},
+        'stages': {name: timer.summary()[name] for name in STAGES},
+    }
+
+# =======================================================================
+#  Reporting
+# =======================================================================
+def print_stages(result, baseline=None, tolerance=0.25, floor_ms=1.0):
+    """Prints the per-stage table and returns the stages that regressed against the baseline."""
+    regressions = []
+    print(f"\n{'stage':<20}{'median ms':>12}{'p95 ms':>12}" + (f"{'baseline':>12}{'change':>10}" if baseline else ''))
+    for name, stats in result['stages'].items():
+        line = f"{name:<20}{stats['median_ms']:>12.2f}{stats['p95_ms']:>12.2f}"
+        reference = baseline['stages'].get(name) if baseline else None
+        if reference:
+            change = stats['median_ms'] / reference['median_ms'] - 1 if reference['median_ms'] else 0.0
+            # Sub-millisecond stages are mostly timer noise; only flag real slowdowns.
+            regressed = change > tolerance and stats['median_ms'] - reference['median_ms'] > floor_ms
+            if regressed: regressions.append(name)
+            line += f"{reference['median_ms']:>12.2f}{change:>+10.0%}" + ("  ❌ REGRESSION" if regressed else '')
+        print(line)
+    for name, seconds in result['setup'].items(): print(f"{name:<20}{seconds:>12.2f}s")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark each recommender stage on a synthetic dataset and compare against a saved baseline.")
+    parser.add_argument('--meals', type=int, default=10000, help="Synthetic dataset size in meals (e.g. 10000, 100000, 1000000).")
+    parser.add_argument('--users', type=int, default=None, help="Synthetic users (default: scaled from --meals).")
+    parser.add_argument('--restaurants', type=int, default=None, help="Synthetic restaurants (default: scaled from --meals).")
+    parser.add_argument('--swipes-per-meal', type=float, default=1.0, help="Interaction log rows per meal.")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the dataset, the model and the user sample.")
+    parser.add_argument('--database', default=None, help="Database to load into (default: a SQLite file in benchmarks/). Its tables are replaced.")
+    parser.add_argument('--reuse', action='store_true', help="Skip generating and loading if the database already holds a dataset.")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="Rows per bulk-load chunk.")
+    parser.add_argument('--sample-users', type=int, default=50, help="Users to time each stage for.")
+    parser.add_argument('--output', default=None, help="Result JSON path (default: benchmarks/results-<meals>.json).")
+    parser.add_argument('--baseline', default=None, help="Baseline JSON to compare against; exits 1 on a regression.")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the result to benchmarks/baseline-<meals>.json.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown of a stage's median before it counts as a regression.")
+    args = parser.parse_args()
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    # data_store and model_store bind their database and model folder on import.
+    os.environ['DATABASE_URL'] = args.database or f"sqlite:///{os.path.abspath(os.path.join(BENCHMARK_DIR, f'bench-{args.meals}.db'))}"
+    os.environ['MODEL_DIR'] = os.path.abspath(os.path.join(BENCHMARK_DIR, f'models-{args.meals}'))
+    print(f"--- Recommender Benchmark (~{args.meals:,} meals) ---")
+    result = run_benchmark(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+    regressions = print_stages(result, baseline, args.tolerance)
+    output = args.output or os.path.join(BENCHMARK_DIR, f'results-{args.meals}.json')
+    with open(output, 'w') as f: json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.save_baseline:
+        baseline_path = os.path.join(BENCHMARK_DIR, f'baseline-{args.meals}.json')
+        with open(baseline_path, 'w') as f: json.dump(result, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+    if regressions:
+        print(f"❌ {len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
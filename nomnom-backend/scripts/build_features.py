@@ -0,0 +1,49 @@
+# =======================================================================
+# NomNom AI: Recommender Feature Backfill
+# Recomputes every materialized recommender feature (see features.py), the
+# per-user profile counters (see profiles.py) and the /api/profile stats
+# from the raw tables and rewrites their tables, creating them if needed.
+# /api/rate and the seed scripts keep them current; run this once on a
+# database that predates these tables, or after editing data by hand.
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import time
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+from data_store import engine
+from app import db
+from app.models import RestaurantFeature, MealFeature, ReviewFeature, UserRestaurantStats, UserStats, UserTagStats
+from features import restaurant_features, meal_features, review_features, feature_table_rows, user_restaurant_stats, user_profile_stats
+
+def build_features():
+    print("--- Rebuilding Recommender Features ---")
+    start = time.time()
+    users_df = pd.read_sql_table('user', engine); restaurants_df = pd.read_sql_table('restaurant', engine); meals_df = pd.read_sql_table('meal', engine); reviews_df = pd.read_sql_table('review', engine); interactions_df = pd.read_sql_table('interaction_log', engine)
+    user_stats_df, user_tags_df = user_profile_stats(users_df, meals_df, reviews_df, restaurants_df)
+    feature_tables = [(RestaurantFeature, restaurant_features(restaurants_df)), (MealFeature, meal_features(meals_df, users_df, restaurants_df)), (ReviewFeature, review_features(reviews_df)), (UserRestaurantStats, user_restaurant_stats(meals_df, interactions_df)), (UserStats, user_stats_df), (UserTagStats, user_tags_df)]
+
+    db.metadata.create_all(engine, tables=[model.__table__ for model, _ in feature_tables])
+    # One transaction, so readers see either the old features or the new ones.
+    with engine.begin() as conn:
+        for model, features_df in feature_tables:
+            conn.execute(model.__table__.delete())
+            # Feature frames are keyed by 'id'; the counters already carry their key columns.
+            if 'id' in features_df.columns: features_df = feature_table_rows(features_df, model.__table__.primary_key.columns.keys()[0])
+            rows = features_df.to_dict('records')
+            if rows: conn.execute(model.__table__.insert(), rows)
+            print(f"-> {model.__tablename__}: {len(rows)} rows")
+    print(f"✅ Features rebuilt in {time.time() - start:.2f}s.")
+
+if __name__ == '__main__':
+    build_features()
@@ -0,0 +1,206 @@
+# =======================================================================
+# NomNom AI: Bulk Loader
+# Streams the CSVs in data/ (users, restaurants, meals, reviews and
+# interaction logs) into the database in chunks. Postgres loads each chunk
+# with COPY, and other databases (SQLite locally) with one executemany per
+# chunk. New users' passwords are bcrypt-hashed across a process pool,
+# unless users.csv already holds hashes (--prehashed, e.g.
+# scripts/generate_data.py); users already in the table keep theirs.
+#
+# Modes:
+#   replace  drop and recreate every table first, like seed.py
+#   append   insert rows whose id isn't in the table yet, keep the rest
+#   upsert   insert new rows and overwrite existing ones by id, except
+#            for the columns in PRESERVED_ON_UPSERT
+# append and upsert leave the rest of the database alone, so a large
+# interaction history can be reloaded without drop_all. Afterwards the
+# recommender features are rebuilt (see build_features.py) and the id
+# counters moved past the loaded ids (see app/ids.py).
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import io
+import time
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from dotenv import load_dotenv
+from flask_bcrypt import Bcrypt
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+from data_store import engine
+from app import db
+from app.models import User, Restaurant, Meal, Review, InteractionLog
+from app.ids import raise_counters
+from build_features import build_features
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+MODES = ['replace', 'append', 'upsert']
+
+# --- Row Cleaning ---
+# Each cleaner turns a raw CSV chunk into column values the model accepts,
+# parsed the same way seed.py parses them row by row. `existing` holds the
+# chunk's ids that are already in the table (only looked up for tables in
+# PRESERVED_ON_UPSERT; empty otherwise).
+def hash_password(password):
+    return Bcrypt().generate_password_hash(password).decode('utf-8')
+
+def _dates(values, fmt='%Y-%m-%d'):
+    return pd.to_datetime(values, format=fmt, errors='coerce').dt.date
+
+def _ints(values):
+    return pd.to_numeric(values, errors='coerce').astype('Int64')
+
+def clean_users(chunk, pool, existing):
+    """
+    pool hashes the passwords of new users; None means the password column
+    already holds bcrypt hashes. Existing users' passwords are never
+    written, so they aren't hashed.
+    """
+    chunk = chunk.copy()
+    chunk['username'] = chunk['username'].str.lower(); chunk['email'] = chunk['email'].str.lower()
+    chunk['dob'] = _dates(chunk['dob']); chunk['age'] = _ints(chunk['age'])
+    for column in ['last_login', 'created_at']:
+        if column in chunk.columns: chunk[column] = pd.to_datetime(chunk[column], errors='coerce')
+    if 'created_at' not in chunk.columns: chunk['created_at'] = pd.NaT
+    chunk['created_at'] = chunk['created_at'].fillna(pd.Timestamp(datetime.datetime.utcnow()))
+    passwords = [str(p) if pd.notna(p) else "default_password" for p in chunk['password']]
+    if pool is not None:
+        new = [i for i, user_id in enumerate(chunk['id']) if user_id not in existing]
+        for i, hashed in zip(new, pool.map(hash_password, [passwords[i] for i in new], chunksize=16)): passwords[i] = hashed
+    chunk['password'] = passwords
+    return chunk
+
+def clean_restaurants(chunk, pool, existing):
+    return chunk
+
+def clean_meals(chunk, pool, existing):
+    return chunk.assign(date=_dates(chunk['date']))
+
+def clean_reviews(chunk, pool, existing):
+    satisfied = chunk['price_satisfaction'].map(lambda v: bool(v) if pd.notna(v) else None)
+    return chunk.assign(date=_dates(chunk['date']), rating=_ints(chunk['rating']), price_satisfaction=satisfied, visit_frequency=_ints(chunk['visit_frequency']))
+
+def _flag(value):
+    value = str(value).lower()
+    if value in ['true', '1', 't', 'y', 'yes']: return True
+    if value in ['false', '0', 'f', 'n', 'no']: return False
+    return None
+
+def clean_interactions(chunk, pool, existing):
+    final_ordered = chunk['final_ordered'].map(lambda v: _flag(v) if pd.notna(v) else None)
+    return chunk.assign(timestamp=pd.to_datetime(chunk['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce'), recommendation_rank=_ints(chunk['recommendation_rank']), swipe_time_sec=_ints(chunk['swipe_time_sec']), final_ordered=final_ordered)
+
+# In foreign-key order.
+TABLES = [
+    ('users.csv', User, clean_users),
+    ('restaurants.csv', Restaurant, clean_restaurants),
+    ('meals.csv', Meal, clean_meals),
+    ('reviews.csv', Review, clean_reviews),
+    ('interaction_logs.csv', InteractionLog, clean_interactions),
+]
+
+# --- Writing ---
+# Columns an upsert doesn't overwrite on rows that already exist: users.csv
+# holds plaintext passwords (and a reload its own sign-up times), which
+# mustn't replace what the app has stored.
+PRESERVED_ON_UPSERT = {'user': {'password', 'created_at'}}
+
+def _records(chunk, columns):
+    rows = chunk[columns].astype(object)
+    return rows.where(rows.notna(), None).to_dict('records')
+
+def _updated_columns(table, columns):
+    return [c for c in columns if c != 'id' and c not in PRESERVED_ON_UPSERT.get(table.name, ())]
+
+def _existing_ids(table, ids):
+    with engine.connect() as conn: return set(conn.execute(select(table.c.id).where(table.c.id.in_(ids.tolist()))).scalars())
+
+def _conflict_clause(table, columns, mode):
+    if mode == 'append': return 'ON CONFLICT (id) DO NOTHING'
+    updates = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in _updated_columns(table, columns))
+    return f'ON CONFLICT (id) DO UPDATE SET {updates}'
+
+def copy_chunk(conn, table, chunk, columns, mode):
+    """Postgres: COPY the chunk in, straight into the table or through a temp table for append/upsert."""
+    buffer = io.StringIO()
+    chunk[columns].to_csv(buffer, index=False, header=False); buffer.seek(0)
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    cursor = conn.connection.cursor()
+    if mode == 'replace':
+        cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+        return len(chunk)
+    conn.execute(text(f'CREATE TEMP TABLE bulk_load_chunk (LIKE "{table.name}" INCLUDING DEFAULTS) ON COMMIT DROP'))
+    cursor.copy_expert(f'COPY bulk_load_chunk ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    result = conn.execute(text(f'INSERT INTO "{table.name}" ({column_list}) SELECT {column_list} FROM bulk_load_chunk {_conflict_clause(table, columns, mode)}'))
+    return result.rowcount
+
+def insert_chunk(conn, table, chunk, columns, mode):
+    """Other databases: one executemany for the whole chunk."""
+    rows = _records(chunk, columns)
+    if mode == 'replace':
+        conn.execute(table.insert(), rows)
+        return len(rows)
+    stmt = sqlite_insert(table) if conn.dialect.name == 'sqlite' else postgresql_insert(table)
+    stmt = stmt.on_conflict_do_nothing(index_elements=['id']) if mode == 'append' else stmt.on_conflict_do_update(index_elements=['id'], set_={c: stmt.excluded[c] for c in _updated_columns(table, columns)})
+    return conn.execute(stmt, rows).rowcount
+
+def load_table(path, model, clean, mode, chunk_size, pool):
+    table = model.__table__; write_chunk = copy_chunk if engine.dialect.name == 'postgresql' else insert_chunk
+    start = time.time(); read = written = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if chunk.empty: continue
+        existing = _existing_ids(table, chunk['id']) if mode != 'replace' and table.name in PRESERVED_ON_UPSERT else set()
+        chunk = clean(chunk, pool, existing)
+        columns = [c for c in chunk.columns if c in table.c]
+        # One transaction per chunk: a failure keeps every chunk before it.
+        with engine.begin() as conn: changed = write_chunk(conn, table, chunk, columns, mode)
+        read += len(chunk); written += max(changed, 0)
+        elapsed = time.time() - start
+        print(f"   {table.name}: {read:,} rows read, {written:,} written ({read / elapsed if elapsed else 0:,.0f} rows/s)")
+    elapsed = time.time() - start
+    print(f"-> {table.name}: {read:,} rows in {elapsed:.2f}s ({read / elapsed if elapsed else 0:,.0f} rows/s)")
+    return read
+
+def bulk_load(data_dir=DATA_DIR, mode='append', chunk_size=5000, workers=None, features=True, prehashed=False):
+    print(f"--- Bulk Loading ({mode}, {engine.dialect.name}) ---")
+    start = time.time()
+    if mode == 'replace':
+        print("Dropping and recreating all tables...")
+        db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename, model, clean in TABLES:
+            path = os.path.join(data_dir, filename)
+            if not os.path.exists(path):
+                print(f"-> {model.__tablename__}: {filename} not found, skipped")
+                continue
+            total += load_table(path, model, clean, mode, chunk_size, None if prehashed else pool)
+    with engine.begin() as conn: raise_counters(conn)
+    print(f"✅ Loaded {total:,} rows in {time.time() - start:.2f}s.")
+    if features: build_features()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream the CSVs in data/ into the database in bulk.")
+    parser.add_argument('--mode', choices=MODES, default='append', help="replace: drop and recreate all tables; append: skip rows that already exist; upsert: overwrite them, keeping users' passwords and sign-up times (default: append).")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Folder holding the CSV files.")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per chunk and transaction.")
+    parser.add_argument('--workers', type=int, default=None, help="Password hashing processes (default: one per CPU).")
+    parser.add_argument('--skip-features', action='store_true', help="Don't rebuild the recommender features afterwards.")
+    parser.add_argument('--prehashed', action='store_true', help="users.csv already holds bcrypt password hashes; load them as they are.")
+    args = parser.parse_args()
+    bulk_load(args.data_dir, args.mode, args.chunk_size, args.workers, features=not args.skip_features, prehashed=args.prehashed)
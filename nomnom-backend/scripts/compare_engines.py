@@ -0,0 +1,148 @@
+# =======================================================================
+# NomNom AI: SVD vs ALS Candidate Engine Comparison
+# Trains both collaborative filtering engines on the same chronological
+# split and reports training time, scoring time and top-K quality, first
+# on the seeded CSV data and then on a synthetic dataset of any size.
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+import pandas as pd
+
+from recommender import train_svd_model, train_als_model
+
+K = 10
+MINIMUM_MEALS_FOR_TESTING = 20
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+# =======================================================================
+#  Data Preparation
+# =======================================================================
+def load_seeded_data():
+    meals_df = pd.read_csv(os.path.join(DATA_PATH, 'meals.csv'), parse_dates=['date'])
+    reviews_df = pd.read_csv(os.path.join(DATA_PATH, 'reviews.csv'), parse_dates=['date'])
+    restaurants_df = pd.read_csv(os.path.join(DATA_PATH, 'restaurants.csv'))
+    return meals_df, reviews_df, restaurants_df
+
+def make_synthetic_data(n_users, n_restaurants, meals_per_user, seed=42):
+    """
+    Generates users with a preference over a few restaurant clusters and
+    Zipf-like restaurant popularity, so both engines have structure to learn.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = max(2, n_restaurants // 25)
+    restaurant_ids = np.array([f"RST_{i:06d}" for i in range(n_restaurants)])
+    clusters = rng.integers(0, n_clusters, n_restaurants)
+    popularity = 1.0 / np.arange(1, n_restaurants + 1) ** 0.8; rng.shuffle(popularity)
+    members = [np.flatnonzero(clusters == c) for c in range(n_clusters)]
+    member_probs = [popularity[m] / popularity[m].sum() if len(m) else None for m in members]
+
+    user_ids = np.array([f"USR_{i:06d}" for i in range(n_users)])
+    prefs = rng.dirichlet(np.full(n_clusters, 0.1), n_users)
+    n_meals = np.maximum(1, rng.poisson(meals_per_user, n_users))
+    meal_users = np.repeat(np.arange(n_users), n_meals)
+    # Pick a cluster per meal from the user's preference, then a restaurant
+    # within it by popularity.
+    cum = prefs.cumsum(axis=1)[meal_users]
+    meal_clusters = (rng.random(len(meal_users))[:, None] > cum).sum(axis=1).clip(0, n_clusters - 1)
+    meal_restaurants = np.empty(len(meal_users), dtype=int)
+    for c in range(n_clusters):
+        mask = meal_clusters == c
+        if not mask.any(): continue
+        if len(members[c]) == 0: meal_restaurants[mask] = rng.integers(0, n_restaurants, mask.sum()); continue
+        meal_restaurants[mask] = rng.choice(members[c], size=mask.sum(), p=member_probs[c])
+    start = np.datetime64('2025-01-01')
+    offsets = np.concatenate([np.sort(rng.integers(0, 365, n)) for n in n_meals])
+    meals_df = pd.DataFrame({
+        'id': [f"MEAL_{i:08d}" for i in range(len(meal_users))],
+        'user_id': user_ids[meal_users], 'restaurant_id': restaurant_ids[meal_restaurants],
+        'date': pd.to_datetime(start + offsets.astype('timedelta64[D]')),
+    })
+
+    # Roughly a third of meals get a review, rated higher for favourite clusters.
+    reviewed = rng.random(len(meals_df)) < 0.33
+    favourite = prefs[meal_users, clusters[meal_restaurants]] > 0.3
+    ratings = np.clip(np.round(3 + 1.5 * favourite + rng.normal(0, 1, len(meals_df))), 1, 5).astype(int)
+    reviews_df = pd.DataFrame({
+        'id': [f"REV_{i:08d}" for i in range(reviewed.sum())],
+        'user_id': meals_df['user_id'][reviewed].to_numpy(), 'restaurant_id': meals_df['restaurant_id'][reviewed].to_numpy(),
+        'date': meals_df['date'][reviewed].to_numpy(), 'rating': ratings[reviewed],
+        'price_satisfaction': rng.random(reviewed.sum()) < 0.7, 'visit_frequency': rng.integers(1, 5, reviewed.sum()),
+    })
+    restaurants_df = pd.DataFrame({'id': restaurant_ids})
+    return meals_df, reviews_df, restaurants_df
+
+def chronological_split(meals_df, reviews_df, min_meals=MINIMUM_MEALS_FOR_TESTING):
+    """
+    Holds out each eligible user's last 20% of meals, like scripts/evaluation.py.
+    Everyone else's history stays in the training set.
+    """
+    meals_df = meals_df.sort_values(['user_id', 'date'], kind='stable')
+    position = meals_df.groupby('user_id').cumcount(); size = meals_df.groupby('user_id')['id'].transform('size')
+    is_test = (size >= min_meals) & (position >= (size * 0.8).astype(int))
+    train_meals, test_meals = meals_df[~is_test], meals_df[is_test]
+    cutoff = train_meals.groupby('user_id')['date'].max()
+    train_reviews = reviews_df[reviews_df['date'] <= reviews_df['user_id'].map(cutoff)]
+    return train_meals, test_meals, train_reviews
+
+# =======================================================================
+#  Evaluation
+# =======================================================================
+def evaluate(model, test_meals, restaurants_df):
+    """Top-K hit rate and recall over each test user's held-out restaurants, plus scoring time."""
+    truth = test_meals.groupby('user_id')['restaurant_id'].agg(set)
+    user_ids = [uid for uid in truth.index if uid in model.user_index]
+    start = time.time()
+    top = model.top_k(user_ids, restaurants_df['id'].to_numpy(), k=K) if user_ids else []
+    scoring_time = time.time() - start
+    hits = [len(truth[uid].intersection(recs)) for uid, recs in zip(user_ids, top)]
+    return {
+        'users': len(user_ids),
+        f'hit_rate@{K}': float(np.mean([h > 0 for h in hits])) if hits else 0.0,
+        f'recall@{K}': float(np.mean([h / len(truth[uid]) for uid, h in zip(user_ids, hits)])) if hits else 0.0,
+        'score_s': scoring_time,
+    }
+
+def compare(name, meals_df, reviews_df, restaurants_df, threads=None, factors=50, iterations=15):
+    print(f"\n--- {name}: {meals_df['user_id'].nunique()} users, {len(restaurants_df)} restaurants, {len(meals_df)} meals, {len(reviews_df)} reviews ---")
+    train_meals, test_meals, train_reviews = chronological_split(meals_df, reviews_df)
+    empty_interactions = pd.DataFrame(columns=['user_id', 'restaurant_id', 'user_action'])
+    rows = []
+    for engine in ['svd', 'als']:
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()): # silence per-iteration debug output
+            if engine == 'svd':
+                model = train_svd_model(train_reviews, random_state=0)
+            else:
+                model = train_als_model(train_reviews, train_meals, empty_interactions, restaurants_df, random_state=0, threads=threads, factors=factors, iterations=iterations)
+        train_time = time.time() - start
+        rows.append({'engine': engine, 'train_s': train_time, **evaluate(model, test_meals, restaurants_df)})
+    result = pd.DataFrame(rows).set_index('engine')
+    print(result.to_string(float_format=lambda v: f"{v:.4f}"))
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare SVD and ALS candidate engines on seeded and synthetic data.")
+    parser.add_argument('--users', type=int, default=20000, help="Synthetic users.")
+    parser.add_argument('--restaurants', type=int, default=2000, help="Synthetic restaurants.")
+    parser.add_argument('--meals-per-user', type=int, default=30, help="Mean synthetic meals per user.")
+    parser.add_argument('--threads', type=int, default=None, help="ALS worker threads.")
+    parser.add_argument('--factors', type=int, default=50, help="ALS latent factors.")
+    parser.add_argument('--iterations', type=int, default=15, help="ALS iterations.")
+    parser.add_argument('--skip-synthetic', action='store_true', help="Only compare on the seeded CSV data.")
+    args = parser.parse_args()
+
+    compare("Seeded data", *load_seeded_data(), threads=args.threads, factors=args.factors, iterations=args.iterations)
+    if not args.skip_synthetic:
+        compare("Synthetic data", *make_synthetic_data(args.users, args.restaurants, args.meals_per_user), threads=args.threads, factors=args.factors, iterations=args.iterations)
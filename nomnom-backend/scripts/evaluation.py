@@ -10,6 +10,13 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # ---------------------
 
+import io
+import math
+import time
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
@@ -17,14 +24,17 @@ import warnings
 import numpy as np
 
 # Import the core recommendation logic from your existing file
-from recommender import recommend_for_active_user, get_meal_count, haversine
+from recommender import recommend_for_active_user, get_meal_count, train_svd_model, build_user_profile, get_pattern_table
+from geo import add_distance_travelled, get_distance_matrix
+from features import with_restaurant_features, with_review_features
+from snapshot_files import read_snapshot, list_snapshots
 
 # Suppress UserWarning from sklearn about feature names
 warnings.filterwarnings('ignore', category=UserWarning, module='sklearn')
 
 # --- Configuration ---
 MINIMUM_MEALS_FOR_TESTING = 20
-K = 10 # Using @10 for all metrics
+K = 10 # Default cut-off for all metrics; --k evaluates several at once
 
 # Maps a mealtime name to a representative float hour
 MEAL_TIME_TO_HOUR_MAP = {
@@ -36,149 +46,280 @@ MEAL_TIME_TO_HOUR_MAP = {
 # =======================================================================
 #  Metric Calculation Functions
 # =======================================================================
-def calculate_all_metrics(recommendations, ground_truth_ids, k):
-    """Calculates and prints all metrics for a single prediction."""
-    
-    is_hit = 1 if any(rec in ground_truth_ids for rec in recommendations) else 0
+METRIC_NAMES = ['hit_rate', 'precision_at_k', 'recall_at_k', 'average_precision_at_k', 'ndcg_at_k']
+
+def relevance_matrix(recommendations, ground_truths, k):
+    """
+    (predictions × k) boolean matrix: whether each prediction's j-th
+    recommendation is in its ground-truth set. Lists shorter than k count
+    as misses in the missing positions.
+    """
+    n = len(recommendations)
+    ranked = pd.DataFrame([list(recs[:k]) for recs in recommendations], index=range(n)).reindex(columns=range(k)).to_numpy(dtype=object)
+    truth = pd.MultiIndex.from_arrays([np.repeat(np.arange(n), [len(t) for t in ground_truths]), [rid for t in ground_truths for rid in t]])
+    return pd.MultiIndex.from_arrays([np.repeat(np.arange(n), k), ranked.ravel()]).isin(truth).reshape(n, k)
+
+def ranking_metrics(relevance, n_relevant):
+    """Hit rate, precision, recall, average precision and nDCG at k = relevance.shape[1], one value per row."""
+    relevance = np.asarray(relevance, dtype=float); n_relevant = np.asarray(n_relevant, dtype=float); k = relevance.shape[1]
+    hits = relevance.sum(axis=1)
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    # The ideal ranking puts the same hits in the top positions.
+    idcg = np.concatenate([[0.0], discounts.cumsum()])[hits.astype(int)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision_at_hits = relevance.cumsum(axis=1) / np.arange(1, k + 1) * relevance
+        return {
+            'hit_rate': (hits > 0).astype(int), 'precision_at_k': hits / k if k > 0 else np.zeros(len(hits)),
+            'recall_at_k': np.where(n_relevant > 0, hits / n_relevant, 0.0),
+            'average_precision_at_k': np.where(n_relevant > 0, precision_at_hits.sum(axis=1) / n_relevant, 0.0),
+            'ndcg_at_k': np.where(idcg > 0, (relevance @ discounts) / idcg, 0.0),
+        }
+
+def calculate_metrics(recommendations, ground_truths, ks):
+    """One row per prediction and a '<metric>@<k>' column per metric and k, from a single relevance matrix."""
+    relevance = relevance_matrix(recommendations, ground_truths, max(ks)); n_relevant = [len(t) for t in ground_truths]
+    return pd.DataFrame({f"{name}@{k}": values for k in ks for name, values in ranking_metrics(relevance[:, :k], n_relevant).items()})
+
+def print_metric_steps(recommendations, ground_truth_ids, k, row):
+    """Prints how each metric of one prediction was calculated."""
+    hits = len(set(recommendations[:k]).intersection(ground_truth_ids))
     print(f"     - Hit Rate @{k}:")
     print(f"       Formula: 1 if (Recommended ∩ GroundTruth) > 0 else 0")
-    print(f"       Calculation: {'1 (Hit!)' if is_hit else '0 (Miss)'}")
-
-    hits = len(set(recommendations).intersection(ground_truth_ids))
-    precision = hits / k if k > 0 else 0
+    print(f"       Calculation: {'1 (Hit!)' if row[f'hit_rate@{k}'] else '0 (Miss)'}")
     print(f"     - Precision @{k}:")
     print(f"       Formula: |Recommended ∩ GroundTruth| / k")
-    print(f"       Calculation: {hits} / {k} = {precision:.4f}")
-
-    recall = hits / len(ground_truth_ids) if ground_truth_ids else 0
+    print(f"       Calculation: {hits} / {k} = {row[f'precision_at_k@{k}']:.4f}")
     print(f"     - Recall @{k}:")
     print(f"       Formula: |Recommended ∩ GroundTruth| / |GroundTruth|")
-    print(f"       Calculation: {hits} / {len(ground_truth_ids)} = {recall:.4f}")
-
-    ap_hits = 0; ap_sum = 0; ap_steps = []
-    for i, rec_id in enumerate(recommendations):
-        if rec_id in ground_truth_ids:
-            ap_hits += 1
-            precision_at_i = ap_hits / (i + 1)
-            ap_sum += precision_at_i
-            ap_steps.append(f"(Hit {ap_hits} at pos {i+1} -> Precision={precision_at_i:.2f})")
-    
-    ap = ap_sum / len(ground_truth_ids) if ground_truth_ids else 0
+    print(f"       Calculation: {hits} / {len(ground_truth_ids)} = {row[f'recall_at_k@{k}']:.4f}")
+    hit_positions = [i + 1 for i, rec_id in enumerate(recommendations[:k]) if rec_id in ground_truth_ids]
+    ap_steps = [f"(Hit {n} at pos {pos} -> Precision={n / pos:.2f})" for n, pos in enumerate(hit_positions, 1)]
     print(f"     - Average Precision @{k}:")
     print(f"       Formula: (Σ [Precision of each hit]) / |GroundTruth|")
     if ap_steps: print(f"       Steps: {', '.join(ap_steps)}")
-    print(f"       Calculation: {ap_sum:.2f} / {len(ground_truth_ids)} = {ap:.4f}")
-
-    relevance = [1 if rec in ground_truth_ids else 0 for rec in recommendations]
-    ideal_relevance = sorted(relevance, reverse=True)
-    dcg = sum([rel / np.log2(i + 2) for i, rel in enumerate(relevance)])
-    idcg = sum([rel / np.log2(i + 2) for i, rel in enumerate(ideal_relevance)])
-    ndcg = dcg / idcg if idcg > 0 else 0
+    print(f"       Calculation: {sum(n / pos for n, pos in enumerate(hit_positions, 1)):.2f} / {len(ground_truth_ids)} = {row[f'average_precision_at_k@{k}']:.4f}")
     print(f"     - nDCG @{k}:")
     print(f"       Formula: DCG / IDCG")
-    print(f"       Calculation: {dcg:.2f} / {idcg:.2f} = {ndcg:.4f}")
-    
-    return {'hit_rate': is_hit, 'precision_at_k': precision, 'recall_at_k': recall, 'average_precision_at_k': ap, 'ndcg_at_k': ndcg}
+    print(f"       Calculation: {sum(1 / np.log2(pos + 1) for pos in hit_positions):.2f} / {sum(1 / np.log2(i + 2) for i in range(len(hit_positions))):.2f} = {row[f'ndcg_at_k@{k}']:.4f}")
+
+def print_summary(metrics, ks, indent=''):
+    """Prints the averaged metrics for every k."""
+    for k in ks:
+        print(f"{indent}Hit Rate @ {k}: {metrics[f'hit_rate@{k}']:.2%}")
+        print(f"{indent}Precision @ {k}: {metrics[f'precision_at_k@{k}']:.2%}")
+        print(f"{indent}Recall @ {k}: {metrics[f'recall_at_k@{k}']:.2%}")
+        print(f"{indent}Mean Average Precision (MAP) @ {k}: {metrics[f'average_precision_at_k@{k}']:.2%}")
+        print(f"{indent}Normalized Discounted Cumulative Gain (nDCG) @ {k}: {metrics[f'ndcg_at_k@{k}']:.2%}")
 
 # =======================================================================
-#  Main Evaluation Function
+#  Data Loading
 # =======================================================================
-def evaluate_model():
-    print("--- Starting Offline Recommendation Model Evaluation ---")
+def load_frames(snapshot_path=None):
+    """(users, reviews, restaurants, meals) from the database, or from an exported snapshot if snapshot_path is given ('' for the newest)."""
     load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+    if snapshot_path is not None:
+        # Snapshot frames already carry the stored features and distances.
+        snapshot = read_snapshot(snapshot_path or None)
+        users_df, reviews_df, restaurants_df, meals_df = snapshot.users, snapshot.reviews, snapshot.restaurants, snapshot.meals
+        print(f"Data loaded: {len(users_df)} users, {len(meals_df)} meals.")
+        return users_df, reviews_df, restaurants_df, meals_df
+
     db_url = os.environ.get('DATABASE_URL')
     if not db_url: raise ValueError("DATABASE_URL not found in .env file.")
     if db_url.startswith("postgres://"): db_url = db_url.replace("postgres://", "postgresql://", 1)
-    
+
     engine = create_engine(db_url)
     users_df = pd.read_sql_table('user', engine)
     reviews_df = pd.read_sql_table('review', engine)
     restaurants_df = pd.read_sql_table('restaurant', engine)
     meals_df = pd.read_sql_table('meal', engine)
-    
+
     meals_df['date'] = pd.to_datetime(meals_df['date'])
     reviews_df['date'] = pd.to_datetime(reviews_df['date'])
-    
+
     print(f"Data loaded: {len(users_df)} users, {len(meals_df)} meals.")
+    # Derive the numeric features once instead of on every recommendation.
+    restaurants_df = with_restaurant_features(restaurants_df); reviews_df = with_review_features(reviews_df)
 
     if not meals_df.empty:
-        user_locs = users_df.set_index('id')[['latitude', 'longitude']].to_dict('index')
-        rest_locs = restaurants_df.set_index('id')[['latitude', 'longitude']].to_dict('index')
-        meals_df['user_lat'] = meals_df['user_id'].map(lambda x: user_locs.get(x, {}).get('latitude'))
-        meals_df['user_lon'] = meals_df['user_id'].map(lambda x: user_locs.get(x, {}).get('longitude'))
-        meals_df['rest_lat'] = meals_df['restaurant_id'].map(lambda x: rest_locs.get(x, {}).get('latitude'))
-        meals_df['rest_lon'] = meals_df['restaurant_id'].map(lambda x: rest_locs.get(x, {}).get('longitude'))
-        meals_df['distance_travelled'] = meals_df.apply(lambda r: haversine(r['user_lat'], r['user_lon'], r['rest_lat'], r['rest_lon']), axis=1)
-        meals_df.drop(columns=['user_lat', 'user_lon', 'rest_lat', 'rest_lon'], inplace=True)
+        meals_df = add_distance_travelled(meals_df, users_df, restaurants_df)
         print("Distance travelled for all meals calculated.")
+    return users_df, reviews_df, restaurants_df, meals_df
 
-    test_users = [uid for uid in users_df['id'] if get_meal_count(uid, meals_df) >= MINIMUM_MEALS_FOR_TESTING]
-    if not test_users:
-        print("\nNo users found with enough meal history for testing. Aborting.")
-        return
-
-    print(f"\nFound {len(test_users)} users for testing.")
-    all_user_metrics = []
-    debug_results = []
+# =======================================================================
+#  Per-User Evaluation
+# =======================================================================
+def evaluate_user(user_id, frames, restaurant_name_map, quiet=False, seed=42, ks=(K,)):
+    """
+    Replays one user's last 20% of meals against models trained on the
+    first 80%. The fold's SVD model, profile and pattern table are built
+    once and reused for every test meal. Returns (per-prediction metrics,
+    debug rows). With quiet, nothing is printed, including the
+    recommender's [DEBUG] output.
+    """
+    users_df, reviews_df, restaurants_df, meals_df = frames
+    verbose = not quiet; top_k = max(ks)
+    if verbose: print(f"\n{'='*25}\n--- Evaluating for User: {user_id} ---\n{'='*25}")
+    user_meals = meals_df[meals_df['user_id'] == user_id].sort_values('date')
+    split_point = int(len(user_meals) * 0.8)
+    train_meals = user_meals.iloc[:split_point]
+    test_meals = user_meals.iloc[split_point:]
     
-    restaurant_name_map = restaurants_df.set_index('id')['name'].to_dict()
-
-    for user_id in test_users:
-        print(f"\n{'='*25}\n--- Evaluating for User: {user_id} ---\n{'='*25}")
-        user_meals = meals_df[meals_df['user_id'] == user_id].sort_values('date')
-        split_point = int(len(user_meals) * 0.8)
-        train_meals = user_meals.iloc[:split_point]
-        test_meals = user_meals.iloc[split_point:]
-        
-        max_train_date = train_meals['date'].max()
-        train_reviews = reviews_df[(reviews_df['user_id'] == user_id) & (reviews_df['date'] <= max_train_date)]
-        
-        train_interactions = pd.DataFrame(columns=['id', 'user_id', 'restaurant_id', 'user_action', 'timestamp'])
-        
-        current_user = users_df[users_df['id'] == user_id].iloc[0].to_dict()
-        user_predictions_metrics = []
-        
+    max_train_date = train_meals['date'].max()
+    train_reviews = reviews_df[(reviews_df['user_id'] == user_id) & (reviews_df['date'] <= max_train_date)]
+    
+    train_interactions = pd.DataFrame(columns=['id', 'user_id', 'restaurant_id', 'user_action', 'timestamp'])
+    
+    current_user = users_df[users_df['id'] == user_id].iloc[0].to_dict()
+    
+    if verbose:
         test_set_names = [restaurant_name_map.get(rid, rid) for rid in test_meals['restaurant_id'].unique()]
         print(f"Training with {len(train_meals)} meals. Testing against {len(test_meals)} future meals.")
         print(f"Future meals (Ground Truth): {', '.join(test_set_names)}")
-        
-        for i, (_, test_meal) in enumerate(test_meals.iterrows()):
+
+    # --- Fold models: the training data is the same for every test meal ---
+    with _silenced(quiet):
+        cf_model = train_svd_model(train_reviews, random_state=seed)
+        user_profile = build_user_profile(user_id, train_meals, restaurants_df, train_interactions)
+        pattern_table = (get_pattern_table(user_id, train_meals, restaurants_df) if not train_meals.empty else None) or {}
+    # Every user is scored against the same catalogue, so their distances come from one shared matrix.
+    user_distances = pd.Series(get_distance_matrix(users_df, restaurants_df).row(user_id), index=restaurants_df.index)
+    
+    all_recommendations = []; ground_truths = []; debug_results = []
+    for i, (_, test_meal) in enumerate(test_meals.iterrows()):
+        ground_truth_id = test_meal['restaurant_id']
+        ground_truth_name = restaurant_name_map.get(ground_truth_id, "Unknown")
+        if verbose:
             print(f"\n  Test #{i+1}: Predicting for meal on {test_meal['date'].date()} ({test_meal['day']} {test_meal['meal_time']})")
-            ground_truth_id = test_meal['restaurant_id']
-            ground_truth_name = restaurant_name_map.get(ground_truth_id, "Unknown")
             print(f"  Real Outcome: User went to '{ground_truth_name}' ({ground_truth_id})")
 
-            simulated_context = (test_meal['day'], test_meal['meal_time'], MEAL_TIME_TO_HOUR_MAP.get(test_meal['meal_time'], 14.0))
-            
+        simulated_context = (test_meal['day'], test_meal['meal_time'], MEAL_TIME_TO_HOUR_MAP.get(test_meal['meal_time'], 14.0))
+        
+        with _silenced(quiet):
             recommendations = recommend_for_active_user(
                 user=current_user, restaurants_df=restaurants_df,
                 interactions_df=train_interactions, reviews_df=train_reviews,
-                meals_df=train_meals, exclude_ids=[], context=simulated_context
-            )[:K]
-            
-            rec_names = [restaurant_name_map.get(rid, rid) for rid in recommendations]
-            print(f"  Top {K} Recommendations: {', '.join(rec_names)}")
-            
-            metrics = calculate_all_metrics(recommendations, {ground_truth_id}, K)
-            user_predictions_metrics.append(metrics)
-
-            debug_results.append({
-                'user_id': user_id, 'simulated_day': test_meal['day'], 'simulated_meal_time': test_meal['meal_time'],
-                'ground_truth_id': ground_truth_id, 'ground_truth_name': ground_truth_name,
-                'recommendation_1': restaurant_name_map.get(recommendations[0], None) if len(recommendations) > 0 else None,
-                'recommendation_2': restaurant_name_map.get(recommendations[1], None) if len(recommendations) > 1 else None,
-                'recommendation_3': restaurant_name_map.get(recommendations[2], None) if len(recommendations) > 2 else None,
-                'full_recommendation_ids': recommendations,
-                'hit': metrics['hit_rate']
-            })
-
-        if not user_predictions_metrics: continue
+                meals_df=train_meals, exclude_ids=[], context=simulated_context,
+                cf_model=cf_model, engine='svd', user_distances=user_distances, user_profile=user_profile, pattern_table=pattern_table
+            )[:top_k]
         
-        user_metrics_df = pd.DataFrame(user_predictions_metrics)
-        avg_user_metrics = user_metrics_df.mean().to_dict()
-        all_user_metrics.append(avg_user_metrics)
+        if verbose:
+            rec_names = [restaurant_name_map.get(rid, rid) for rid in recommendations]
+            print(f"  Top {top_k} Recommendations: {', '.join(rec_names)}")
+        all_recommendations.append(recommendations); ground_truths.append({ground_truth_id})
+
+        debug_results.append({
+            'user_id': user_id, 'simulated_day': test_meal['day'], 'simulated_meal_time': test_meal['meal_time'],
+            'ground_truth_id': ground_truth_id, 'ground_truth_name': ground_truth_name,
+            'recommendation_1': restaurant_name_map.get(recommendations[0], None) if len(recommendations) > 0 else None,
+            'recommendation_2': restaurant_name_map.get(recommendations[1], None) if len(recommendations) > 1 else None,
+            'recommendation_3': restaurant_name_map.get(recommendations[2], None) if len(recommendations) > 2 else None,
+            'full_recommendation_ids': recommendations,
+        })
+
+    if not all_recommendations: return None, debug_results
+    
+    metrics_df = calculate_metrics(all_recommendations, ground_truths, ks)
+    for row, hit in zip(debug_results, metrics_df[f'hit_rate@{top_k}']): row['hit'] = hit
+    if verbose:
+        for i, (recommendations, truth) in enumerate(zip(all_recommendations, ground_truths)):
+            print(f"\n  Test #{i+1} Metrics:")
+            for k in ks: print_metric_steps(recommendations, truth, k, metrics_df.iloc[i])
         print(f"\n   --- User {user_id} Summary ---")
-        print(f"   Avg Hit Rate: {avg_user_metrics['hit_rate']:.2%}, Avg Precision: {avg_user_metrics['precision_at_k']:.2%}, Avg Recall: {avg_user_metrics['recall_at_k']:.2%}, MAP: {avg_user_metrics['average_precision_at_k']:.2%}, Avg nDCG: {avg_user_metrics['ndcg_at_k']:.2%}")
+        print_summary(metrics_df.mean(), ks, indent='   Avg ')
+    return metrics_df.assign(user_id=user_id), debug_results
+
+def _silenced(quiet):
+    return contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+
+# =======================================================================
+#  Worker Pool
+# =======================================================================
+# Workers evaluate shards of consecutive test users. The loaded frames
+# reach them as cheaply as the platform allows: forked workers inherit
+# them copy-on-write, spawned workers re-open a snapshot memory-mapped,
+# and only spawned workers evaluating from the database get a pickled copy.
+_frames = None
+
+def _init_worker(frames, snapshot_path):
+    global _frames
+    if _frames is None:
+        with contextlib.redirect_stdout(io.StringIO()): _frames = frames if frames is not None else load_frames(snapshot_path)
+
+def evaluate_users(user_ids, quiet=False, seed=42, ks=(K,), capture=True):
+    """
+    Evaluates a shard of users with the frames of this process. Returns one
+    (user_id, per-prediction metrics, debug rows, printed output) per user, in order;
+    without capture the output goes straight to stdout instead.
+    """
+    restaurant_name_map = _frames[2].set_index('id')['name'].to_dict()
+    results = []
+    for user_id in user_ids:
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer) if capture else contextlib.nullcontext():
+            metrics, debug_rows = evaluate_user(user_id, _frames, restaurant_name_map, quiet, seed, ks)
+        results.append((user_id, metrics, debug_rows, buffer.getvalue()))
+    return results
+
+def _shards(user_ids, shard_size):
+    return [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+
+# =======================================================================
+#  Main Evaluation Function
+# =======================================================================
+def evaluate_model(snapshot_path=None, workers=1, quiet=False, shard_size=None, seed=42, ks=(K,)):
+    """
+    Evaluates against the database, or against an exported snapshot if
+    snapshot_path is given ('' for the newest). Users are spread over
+    `workers` processes in shards; the output is the same for any number
+    of workers. Metrics are reported at every cut-off in ks.
+    """
+    global _frames
+    ks = sorted(set(ks))
+    print("--- Starting Offline Recommendation Model Evaluation ---")
+    start = time.time()
+    if snapshot_path == '':
+        snapshots = list_snapshots()
+        if not snapshots: raise FileNotFoundError("No snapshot found. Run scripts/export_snapshot.py first.")
+        snapshot_path = snapshots[-1] # resolved once, so every worker reads the same one
+    _frames = load_frames(snapshot_path)
+    users_df, meals_df = _frames[0], _frames[3]
+    get_distance_matrix(users_df, _frames[2]) # built before any fork, so forked workers share it
+
+    test_users = [uid for uid in users_df['id'] if get_meal_count(uid, meals_df) >= MINIMUM_MEALS_FOR_TESTING]
+    if not test_users:
+        print("\nNo users found with enough meal history for testing. Aborting.")
+        return
+
+    print(f"\nFound {len(test_users)} users for testing.")
+    all_user_metrics = []
+    debug_results = []
+
+    # Several shards per worker keep every worker busy when users' histories differ in length.
+    shard_size = shard_size or max(1, math.ceil(len(test_users) / (workers * 4)))
+    shards = _shards(test_users, shard_size)
+    if workers > 1:
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if fork else None)
+        initargs = (None if fork or snapshot_path is not None else _frames, snapshot_path)
+        print(f"Evaluating in {len(shards)} shard(s) of up to {shard_size} users on {workers} worker processes...")
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=initargs)
+        shard_results = pool.map(evaluate_users, shards, [quiet] * len(shards), [seed] * len(shards), [ks] * len(shards))
+    else:
+        pool = None; shard_results = (evaluate_users(shard, quiet, seed, ks, capture=False) for shard in shards)
+
+    # Shards come back in submission order, so the output matches a sequential run.
+    done = 0
+    try:
+        for results in shard_results:
+            for user_id, metrics, debug_rows, output in results:
+                if output: print(output, end='')
+                debug_results.extend(debug_rows)
+                if metrics is not None: all_user_metrics.append(metrics)
+            done += len(results)
+            if quiet: print(f"Evaluated {done}/{len(test_users)} users ({time.time() - start:.1f}s).")
+    finally:
+        if pool is not None: pool.shutdown(cancel_futures=True)
 
     if not all_user_metrics:
         print("\nEvaluation could not be completed.")
@@ -190,17 +331,23 @@ def evaluate_model():
     debug_df.to_csv(output_path, index=False)
     print(f"\n\nDetailed debug file '{output_path}' has been generated.")
 
-    results_df = pd.DataFrame(all_user_metrics)
+    # Every user counts once, however many test meals they have.
+    results_df = pd.concat(all_user_metrics, ignore_index=True).groupby('user_id', sort=False).mean()
     final_metrics = results_df.mean()
 
     print("\n\n--- Overall Model Performance ---")
     print(f"Total Users Tested: {len(results_df)}")
-    print(f"Hit Rate @ {K}: {final_metrics['hit_rate']:.2%}")
-    print(f"Precision @ {K}: {final_metrics['precision_at_k']:.2%}")
-    print(f"Recall @ {K}: {final_metrics['recall_at_k']:.2%}")
-    print(f"Mean Average Precision (MAP) @ {K}: {final_metrics['average_precision_at_k']:.2%}")
-    print(f"Normalized Discounted Cumulative Gain (nDCG) @ {K}: {final_metrics['ndcg_at_k']:.2%}")
+    print_summary(final_metrics, ks)
     print("---------------------------------")
+    print(f"Evaluation took {time.time() - start:.1f}s.")
 
 if __name__ == '__main__':
-    evaluate_model()
+    parser = argparse.ArgumentParser(description="Replay each test user's later meals against the recommender and report ranking metrics.")
+    parser.add_argument('--snapshot', nargs='?', const='', default=None, metavar='PATH', help="Read an exported snapshot (scripts/export_snapshot.py) instead of the database; without PATH, the newest one.")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes to spread the test users over (e.g. the number of CPU cores).")
+    parser.add_argument('--shard-size', type=int, default=None, help="Users per shard handed to a worker (default: about four shards per worker).")
+    parser.add_argument('--quiet', action='store_true', help="Skip the per-prediction output (metric formulas and [DEBUG] lines) and only report progress and the summary.")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the SVD models, so results do not depend on the worker count.")
+    parser.add_argument('--k', default=str(K), help=f"Comma-separated cut-offs to report metrics at (default: {K}). The recommender returns at most 15.")
+    args = parser.parse_args()
+    evaluate_model(args.snapshot, args.workers, args.quiet, args.shard_size, args.seed, [int(k) for k in args.k.split(',')])
@@ -0,0 +1,85 @@
+# =======================================================================
+# NomNom AI: Query Plan Check
+# Runs EXPLAIN on the hot queries (login, register, profile, rate, the
+# recommender's user-scoped reads and the delta reads of the snapshot
+# export) and checks that each one is served by the indexes declared for
+# it in app/models.py. Works on SQLite and Postgres; exits non-zero if any
+# query falls back to a full scan. Run scripts/migrate_indexes.py first on databases that predate the
+# indexes, and scripts/build_features.py for the /api/profile stats tables.
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import argparse
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+from data_store import engine
+
+def _pkey(table):
+    """The name the dialect gives a table's primary key index."""
+    return f'{table}_pkey' if engine.dialect.name == 'postgresql' else f'sqlite_autoindex_{table}_1'
+
+# (name, SQL as issued by the routes and data_store, indexes expected to serve it)
+HOT_QUERIES = [
+    ('login by username', 'SELECT * FROM "user" WHERE lower("user".username) = :username LIMIT 1', 'ix_user_lower_username'),
+    ('register email check', 'SELECT * FROM "user" WHERE lower("user".email) = :email LIMIT 1', 'ix_user_lower_email'),
+    ('profile user, totals and favourite tag', 'SELECT "user".*, user_stats.*, (SELECT user_tag_stats.tag FROM user_tag_stats WHERE user_tag_stats.user_id = "user".id ORDER BY user_tag_stats.restaurant_count DESC, user_tag_stats.tag LIMIT 1) AS favorite_tag FROM "user" LEFT OUTER JOIN user_stats ON user_stats.user_id = "user".id WHERE "user".id = :user_id LIMIT 1', (_pkey('user_stats'), _pkey('user_tag_stats'))),
+    ('profile recent meals with latest rating', 'SELECT meal.*, restaurant.name, (SELECT review.rating FROM review WHERE review.user_id = meal.user_id AND review.restaurant_id = meal.restaurant_id ORDER BY review.date DESC LIMIT 1) AS rating FROM meal JOIN restaurant ON meal.restaurant_id = restaurant.id WHERE meal.user_id = :user_id ORDER BY meal.date DESC LIMIT 5', ('ix_meal_user_id_date', 'ix_review_user_id_restaurant_id_date')),
+    ('rate latest review', 'SELECT * FROM review WHERE review.user_id = :user_id AND review.restaurant_id = :restaurant_id ORDER BY review.date DESC LIMIT 1', 'ix_review_user_id_restaurant_id_date'),
+    ('reviews of restaurant', 'SELECT * FROM review WHERE review.restaurant_id = :restaurant_id', 'ix_review_restaurant_id'),
+    ('recommender user meals', 'SELECT * FROM meal WHERE user_id = :user_id', 'ix_meal_user_id_date'),
+    ('recommender meal features', 'SELECT f.* FROM meal_feature f JOIN meal m ON m.id = f.meal_id WHERE m.user_id = :user_id', 'ix_meal_user_id_date'),
+    ('recommender user interactions', 'SELECT * FROM interaction_log WHERE user_id = :user_id', 'ix_interaction_log_user_id_timestamp'),
+    ('snapshot meals since mark', 'SELECT * FROM meal WHERE "date" >= :mark', 'ix_meal_date'),
+    ('snapshot reviews since mark', 'SELECT * FROM review WHERE "date" >= :mark', 'ix_review_date'),
+    ('snapshot interactions since mark', 'SELECT * FROM interaction_log WHERE "timestamp" >= :mark', 'ix_interaction_log_timestamp'),
+    ('recommender meal-time popularity', 'SELECT restaurant_id, COUNT(*) AS meals FROM meal WHERE meal_time = :meal_time AND restaurant_id IS NOT NULL GROUP BY restaurant_id ORDER BY meals DESC, restaurant_id', 'ix_meal_meal_time_restaurant_id'),
+]
+PARAMS = {'username': 'someone', 'email': 'someone@example.com', 'user_id': 'USR_001', 'restaurant_id': 'RST_001', 'meal_time': 'Lunch', 'mark': '2030-01-01'}
+
+def _sqlite_plan(conn, sql):
+    rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), PARAMS).fetchall()
+    details = [row[-1] for row in rows]
+    return details, ' '.join(details)
+
+def _postgres_plan(conn, sql):
+    # Tiny tables are cheaper to scan than to index, so the planner would
+    # pick a seq scan anyway; disabling it shows whether the index is usable.
+    conn.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = conn.execute(text(f'EXPLAIN (FORMAT JSON) {sql}'), PARAMS).scalar()
+    nodes, details = [plan[0]['Plan']], []
+    while nodes:
+        node = nodes.pop(); nodes.extend(node.get('Plans', []))
+        details.append(f"{node['Node Type']} on {node.get('Relation Name', '-')}" + (f" using {node['Index Name']}" if 'Index Name' in node else ''))
+    return details, ' '.join(details)
+
+def explain_queries(verbose=False):
+    print(f"--- Checking Query Plans ({engine.dialect.name}) ---")
+    plan_for = _postgres_plan if engine.dialect.name == 'postgresql' else _sqlite_plan
+    failures = []
+    for name, sql, indexes in HOT_QUERIES:
+        with engine.begin() as conn:
+            details, plan = plan_for(conn, sql)
+        indexes = (indexes,) if isinstance(indexes, str) else indexes
+        missing = [index for index in indexes if index not in plan]
+        if missing: failures.append(name)
+        print(f"{'❌' if missing else '✅'} {name}: {'does not use ' + ', '.join(missing) if missing else 'uses ' + ', '.join(indexes)}")
+        if verbose or missing:
+            for line in details: print(f"     {line}")
+    print(f"\n{len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use their index.")
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot queries and check they use their indexes.")
+    parser.add_argument('--verbose', action='store_true', help="Print every query plan, not just the failing ones.")
+    args = parser.parse_args()
+    sys.exit(1 if explain_queries(verbose=args.verbose) else 0)
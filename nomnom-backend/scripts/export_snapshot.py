@@ -0,0 +1,55 @@
+# =======================================================================
+# NomNom AI: Snapshot Exporter
+# Writes the recommender tables (with their stored features) as a
+# columnar snapshot under snapshots/ (see snapshot_files.py). Training,
+# evaluation and freshly started workers can then load the snapshot from
+# local disk instead of streaming the database.
+# After the first export, each run starts from the newest snapshot and
+# reads only the rows written since (data_store.refresh_snapshot). Every
+# FULL_EXPORT_INTERVAL seconds, with --full, or when a table's row count
+# shows deletes, it reads every table again. Run it from cron; use --full
+# after build_features.py or large data imports.
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import argparse
+import time
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+from data_store import load_snapshot, refresh_snapshot
+from snapshot_files import SNAPSHOT_DIR, export_snapshot, list_snapshots, read_manifest, read_snapshot, version_age
+
+FULL_EXPORT_INTERVAL = float(os.environ.get('SNAPSHOT_FULL_EXPORT_INTERVAL', 86400))
+
+def export(snapshot_dir=SNAPSHOT_DIR, keep=3, full=False):
+    print("--- Exporting Data Snapshot ---")
+    start = time.time()
+    snapshots = list_snapshots(snapshot_dir); snapshot = full_version = None
+    manifest = read_manifest(snapshots[-1]) if snapshots else None
+    if not full and manifest is not None and version_age(manifest['full_version']) < FULL_EXPORT_INTERVAL:
+        snapshot = refresh_snapshot(read_snapshot(snapshots[-1]))
+        full_version = manifest['full_version']
+    if snapshot is None:
+        print("Reading every table...")
+        snapshot = load_snapshot(); full_version = None
+    print(f"Data loaded: {len(snapshot.users)} users, {len(snapshot.restaurants)} restaurants, {len(snapshot.meals)} meals, {len(snapshot.reviews)} reviews, {len(snapshot.interactions)} interactions.")
+    path = export_snapshot(snapshot, snapshot_dir, keep, full_version)
+    print(f"✅ Snapshot written to {path} in {time.time() - start:.2f}s.")
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the recommender tables as a columnar snapshot for fast loading.")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help="Directory the snapshots are written to.")
+    parser.add_argument('--keep', type=int, default=3, help="Number of most recent snapshots to keep.")
+    parser.add_argument('--full', action='store_true', help="Read every table instead of refreshing the newest snapshot.")
+    args = parser.parse_args()
+    export(args.dir, args.keep, args.full)
@@ -0,0 +1,163 @@
+# =======================================================================
+# NomNom AI: Synthetic Dataset Generator
+# Writes users, restaurants, meals, reviews and interaction logs at any
+# scale, in the same CSV layout as data/, so they load with bulk_load.py.
+# Everything is drawn from the seeded CSVs: restaurants are jittered
+# copies of the real ones (prices, opening hours, tags, coordinates),
+# users live around the seeded users, and meal times, ratings, price
+# satisfaction and visit frequencies follow the seeded distributions.
+# Each user prefers a few cuisines (tag_1) and picks restaurants within
+# them by a Zipf-like popularity, so the recommender has structure to find.
+# Passwords are all "default123", stored pre-hashed (load with --prehashed).
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from flask_bcrypt import Bcrypt
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SEEDED_MEALS_PER_USER = 48 # 528 meals over 11 users
+REVIEW_RATE = 0.33 # share of seeded meals that come with a review
+DECLINE_RATE = 0.6
+START_DATE = np.datetime64('2025-01-01')
+
+def default_scale(meals):
+    """Users and restaurants for a meal count: seeded meals per user, restaurants growing with its square root."""
+    return max(1, round(meals / SEEDED_MEALS_PER_USER)), max(86, round(86 * (meals / 528) ** 0.5))
+
+def _sample(rng, values, n):
+    """n draws from the empirical distribution of `values`."""
+    counts = pd.Series(values).value_counts()
+    return rng.choice(counts.index.to_numpy(), size=n, p=(counts / counts.sum()).to_numpy())
+
+# =======================================================================
+#  Tables
+# =======================================================================
+def make_restaurants(seed_df, n, rng):
+    template = seed_df.iloc[rng.integers(0, len(seed_df), n)].reset_index(drop=True)
+    ids = [f"RST_{i:03}" for i in range(1, n + 1)]
+    latitude = template['latitude'] + rng.normal(0, 0.01, n); longitude = template['longitude'] + rng.normal(0, 0.01, n)
+    reviews = np.round(template['num_google_reviews'].fillna(30) * rng.lognormal(0, 0.5, n))
+    return template.assign(
+        id=ids, name=[f"{name} {i}" for name, i in zip(template['name'], range(1, n + 1))],
+        google_rating=np.clip(np.round(template['google_rating'] + rng.normal(0, 0.2, n), 1), 1, 5),
+        num_google_reviews=pd.array(reviews, dtype='Int64'), latitude=latitude, longitude=longitude,
+        location=[f"{lat}, {lon}" if pd.notna(lat) else None for lat, lon in zip(latitude, longitude)],
+    )
+
+def make_users(seed_df, n, rng):
+    template = seed_df.iloc[rng.integers(0, len(seed_df), n)].reset_index(drop=True)
+    numbers = [f"{i:03}" for i in range(1, n + 1)]
+    latitude = template['latitude'] + rng.normal(0, 0.005, n); longitude = template['longitude'] + rng.normal(0, 0.005, n)
+    dob = START_DATE - 365 * rng.integers(19, 25, n).astype('timedelta64[D]') - rng.integers(0, 365, n).astype('timedelta64[D]')
+    created = pd.to_datetime(START_DATE) + pd.to_timedelta(rng.integers(0, 180 * 86400, n), unit='s')
+    password = Bcrypt().generate_password_hash('default123').decode('utf-8') # one hash shared by every synthetic user
+    return pd.DataFrame({
+        'id': [f"USR_{num}" for num in numbers], 'username': [f"user_{num}" for num in numbers], 'name': [f"Synthetic User {num}" for num in numbers],
+        'email': [f"user_{num}@example.com" for num in numbers], 'phone': [f"01{i:08}" for i in range(1, n + 1)],
+        'dob': pd.to_datetime(dob).strftime('%Y-%m-%d'), 'age': ((START_DATE - dob).astype(int) // 365).astype(int), 'gender': template['gender'].to_numpy(),
+        'location': [f"{lat}, {lon}" for lat, lon in zip(latitude, longitude)], 'latitude': latitude, 'longitude': longitude,
+        'last_login': None, 'password': password, 'created_at': created.strftime('%Y-%m-%d %H:%M:%S.%f'),
+    })
+
+def make_meals(users_df, restaurants_df, seed_meals_df, meals, rng):
+    """Each user's meals, in date order, at restaurants drawn from their preferred cuisines."""
+    n_users = len(users_df); n_restaurants = len(restaurants_df)
+    cuisines, cuisine_of = np.unique(restaurants_df['tag_1'].fillna('').to_numpy(), return_inverse=True)
+    popularity = 1.0 / np.arange(1, n_restaurants + 1) ** 0.8; rng.shuffle(popularity)
+    members = [np.flatnonzero(cuisine_of == c) for c in range(len(cuisines))]
+    member_probs = [popularity[m] / popularity[m].sum() for m in members]
+    prefs = rng.dirichlet(np.full(len(cuisines), 0.2), n_users)
+
+    per_user = np.maximum(1, rng.poisson(meals / n_users, n_users))
+    meal_users = np.repeat(np.arange(n_users), per_user)
+    cum = prefs.cumsum(axis=1)[meal_users]
+    meal_cuisines = (rng.random(len(meal_users))[:, None] > cum).sum(axis=1).clip(0, len(cuisines) - 1)
+    meal_restaurants = np.empty(len(meal_users), dtype=int)
+    for c in range(len(cuisines)):
+        mask = meal_cuisines == c
+        if mask.any(): meal_restaurants[mask] = rng.choice(members[c], size=mask.sum(), p=member_probs[c])
+    # About one meal a day, from each user's first day onwards.
+    offsets = np.concatenate([np.sort(rng.integers(0, max(30, round(n * 1.2)), n)) for n in per_user])
+    dates = pd.to_datetime(START_DATE + offsets.astype('timedelta64[D]'))
+    sequence = pd.Series(meal_users).groupby(meal_users).cumcount().to_numpy() + 1
+    user_numbers = users_df['id'].str.split('_').str[1].to_numpy()[meal_users]
+    meals_df = pd.DataFrame({
+        'id': [f"MEAL_{u}_{k:03}" for u, k in zip(user_numbers, sequence)],
+        'user_id': users_df['id'].to_numpy()[meal_users], 'restaurant_id': restaurants_df['id'].to_numpy()[meal_restaurants],
+        'date': dates.strftime('%Y-%m-%d'), 'day': dates.day_name(), 'meal_time': _sample(rng, seed_meals_df['meal_time'].dropna(), len(meal_users)),
+    })
+    favourite = prefs[meal_users, meal_cuisines] >= np.sort(prefs, axis=1)[meal_users, -2]
+    return meals_df, favourite
+
+def make_reviews(meals_df, favourite, seed_reviews_df, rng):
+    """A review for about a third of meals, a star higher for the user's two favourite cuisines."""
+    reviewed = rng.random(len(meals_df)) < REVIEW_RATE
+    rows = meals_df[reviewed]; n = len(rows)
+    ratings = np.clip(_sample(rng, seed_reviews_df['rating'], n) + (favourite[reviewed] & (rng.random(n) < 0.5)), 1, 5)
+    sequence = rows.groupby('user_id').cumcount().to_numpy() + 1
+    return pd.DataFrame({
+        'id': [f"REV_{u.split('_')[1]}_{k:03}" for u, k in zip(rows['user_id'], sequence)],
+        'user_id': rows['user_id'].to_numpy(), 'restaurant_id': rows['restaurant_id'].to_numpy(), 'date': rows['date'].to_numpy(),
+        'rating': ratings, 'price_satisfaction': _sample(rng, seed_reviews_df['price_satisfaction'].dropna().astype(int), n),
+        'visit_frequency': _sample(rng, seed_reviews_df['visit_frequency'].dropna().astype(int), n),
+    })
+
+def make_interactions(meals_df, restaurants_df, swipes_per_meal, rng):
+    """Swipes on recommendation cards around each meal; most are declines, some accepted cards are ordered."""
+    n = int(round(len(meals_df) * swipes_per_meal))
+    if n == 0: return pd.DataFrame(columns=['id', 'user_id', 'restaurant_id', 'recommendation_rank', 'user_action', 'timestamp', 'swipe_time_sec', 'final_ordered', 'user_feedback'])
+    source = meals_df.iloc[np.sort(rng.integers(0, len(meals_df), n))]
+    actions = np.where(rng.random(n) < DECLINE_RATE, 'decline', 'accept')
+    timestamps = pd.to_datetime(source['date'].to_numpy()) + pd.to_timedelta(rng.integers(7 * 3600, 23 * 3600, n), unit='s')
+    return pd.DataFrame({
+        'id': [f"INT_{i:06}" for i in range(1, n + 1)], 'user_id': source['user_id'].to_numpy(),
+        'restaurant_id': restaurants_df['id'].to_numpy()[rng.integers(0, len(restaurants_df), n)],
+        'recommendation_rank': rng.integers(1, 16, n), 'user_action': actions, 'timestamp': timestamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'swipe_time_sec': rng.integers(1, 11, n), 'final_ordered': np.where(actions == 'accept', rng.random(n) < 0.3, False), 'user_feedback': None,
+    })
+
+# =======================================================================
+#  Generation
+# =======================================================================
+def generate_dataset(meals, users=None, restaurants=None, swipes_per_meal=1.0, seed=42, seed_dir=DATA_DIR):
+    """Returns {csv file name: frame} for a dataset of about `meals` meals, drawn from the CSVs in seed_dir."""
+    rng = np.random.default_rng(seed)
+    default_users, default_restaurants = default_scale(meals)
+    seeded = {name: pd.read_csv(os.path.join(seed_dir, f'{name}.csv')) for name in ['users', 'restaurants', 'meals', 'reviews']}
+    restaurants_df = make_restaurants(seeded['restaurants'], restaurants or default_restaurants, rng)
+    users_df = make_users(seeded['users'], users or default_users, rng)
+    meals_df, favourite = make_meals(users_df, restaurants_df, seeded['meals'], meals, rng)
+    reviews_df = make_reviews(meals_df, favourite, seeded['reviews'], rng)
+    interactions_df = make_interactions(meals_df, restaurants_df, swipes_per_meal, rng)
+    return {'users.csv': users_df, 'restaurants.csv': restaurants_df, 'meals.csv': meals_df, 'reviews.csv': reviews_df, 'interaction_logs.csv': interactions_df}
+
+def write_dataset(frames, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for filename, df in frames.items():
+        df.to_csv(os.path.join(out_dir, filename), index=False)
+        print(f"-> {filename}: {len(df):,} rows")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset shaped like data/*.csv at any scale.")
+    parser.add_argument('--meals', type=int, default=10000, help="Approximate number of meals (e.g. 10000, 100000, 1000000).")
+    parser.add_argument('--users', type=int, default=None, help=f"Users (default: one per {SEEDED_MEALS_PER_USER} meals, like the seeded data).")
+    parser.add_argument('--restaurants', type=int, default=None, help="Restaurants (default: grows with the square root of --meals, at least 86).")
+    parser.add_argument('--swipes-per-meal', type=float, default=1.0, help="Interaction log rows per meal.")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed.")
+    parser.add_argument('--out', required=True, help="Directory the CSV files are written to; load it with bulk_load.py --data-dir DIR --prehashed.")
+    args = parser.parse_args()
+    print(f"--- Generating Synthetic Dataset (~{args.meals:,} meals) ---")
+    start = time.time()
+    write_dataset(generate_dataset(args.meals, args.users, args.restaurants, args.swipes_per_meal, args.seed), args.out)
+    print(f"✅ Dataset written to {args.out} in {time.time() - start:.2f}s.")
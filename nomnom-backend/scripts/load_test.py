@@ -0,0 +1,305 @@
+# =======================================================================
+# NomNom AI: API Load Test
+# Drives the Flask API with a realistic mix of /api/login, /api/recommend,
+# /api/rate and /api/profile from a number of concurrent virtual users,
+# then reports throughput, error rates and p50/p95/p99 latency per
+# endpoint for each concurrency level.
+#
+# Each virtual user plays the HomePage flow: it asks for recommendations
+# with every card it has already been shown in exclude_ids, so the list
+# grows with each call until the recommender runs out and the session
+# starts over. Tokens are minted up front with the app's JWT secret, so
+# only the share of requests given to login pays for bcrypt.
+#
+# Two ways to run the app:
+#   --mode inprocess  create_app() in this process, one test client per
+#                     thread (no network, one interpreter).
+#   --mode http       a gunicorn server over loopback, started from run.py
+#                     with --workers/--threads, or any server given by --url.
+#
+# The dataset comes from scripts/generate_data.py, loaded into a database
+# of its own (as in benchmark.py), or any database with --database and
+# --reuse. Note that /api/rate writes meals and reviews into it.
+#
+# Examples:
+#   python scripts/load_test.py --meals 10000 --concurrency 1,4,16
+#   python scripts/load_test.py --mode http --workers 4 --concurrency 8,32 --duration 60
+#   python scripts/load_test.py --reuse --baseline benchmarks/loadtest-baseline-inprocess-10000.json
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+import numpy as np
+
+from benchmark import BENCHMARK_DIR, quiet
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_MIX = 'recommend=6,profile=2,rate=1,login=1'
+EXPECTED_STATUS = {'login': 200, 'recommend': 200, 'rate': 201, 'profile': 200}
+MAX_EXCLUDED = 150 # a session that has swiped through this many cards starts over
+FORMAT_VERSION = 1
+
+# =======================================================================
+#  Clients
+# =======================================================================
+class InProcessClient:
+    """Calls the app through a Flask test client; one per thread."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpClient:
+    """Calls a server over HTTP/1.1, keeping the connection open while the server allows it."""
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url); self.host = parts.hostname; self.port = parts.port or 80; self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token: headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body) if body is not None else None
+        if self.connection is None: self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse(); data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close(); self.connection = None
+            raise
+        if response.getheader('Connection', '').lower() == 'close': self.connection.close(); self.connection = None
+        try: return response.status, json.loads(data) if data else None
+        except ValueError: return response.status, None
+
+# =======================================================================
+#  Virtual Users
+# =======================================================================
+class Session:
+    """One user's state: their token and the cards shown so far."""
+
+    def __init__(self, user_id, username, token):
+        self.user_id = user_id; self.username = username; self.token = token
+        self.seen_ids = []
+
+def run_action(action, session, client, args, restaurant_ids, rng):
+    """Sends one request for `action` and returns its status code."""
+    if action == 'login':
+        status, data = client.request('POST', '/api/login', {'username': session.username, 'password': args.password})
+        if status == 200 and data: session.token = data['access_token']
+    elif action == 'recommend':
+        status, data = client.request('POST', '/api/recommend', {'exclude_ids': list(session.seen_ids)}, session.token)
+        shown = [r['id'] for r in data['recommendations']] if status == 200 and data else []
+        session.seen_ids = session.seen_ids + shown if shown and len(session.seen_ids) < MAX_EXCLUDED else []
+    elif action == 'rate':
+        restaurant_id = rng.choice(session.seen_ids) if session.seen_ids else rng.choice(restaurant_ids)
+        status, _ = client.request('POST', '/api/rate', {'restaurant_id': restaurant_id, 'rating': rng.randint(1, 5)}, session.token)
+    else:
+        status, _ = client.request('GET', '/api/profile', token=session.token)
+    return status
+
+def virtual_user(client, sessions, args, restaurant_ids, actions, weights, seed, start_at, warmup_until, stop_at, samples):
+    """Picks a session and an action until stop_at. Only requests that start after the warm-up are recorded."""
+    rng = random.Random(seed)
+    while time.perf_counter() < start_at: time.sleep(0.001)
+    while True:
+        started = time.perf_counter()
+        if started >= stop_at: break
+        session = rng.choice(sessions); action = rng.choices(actions, weights)[0]
+        try: status = run_action(action, session, client, args, restaurant_ids, rng)
+        except Exception as e: status = f"{type(e).__name__}"
+        if started >= warmup_until: samples.append((action, status, time.perf_counter() - started))
+
+def summarize(samples, seconds):
+    """Per-endpoint and overall counts, error rate, throughput and latency percentiles (ms)."""
+    def stats(rows):
+        latencies = np.array([r[2] for r in rows]) * 1000
+        errors = sum(1 for action, status, _ in rows if status != EXPECTED_STATUS[action])
+        return {'requests': len(rows), 'errors': errors, 'error_rate': errors / len(rows), 'rps': len(rows) / seconds,
+                'p50_ms': float(np.percentile(latencies, 50)), 'p95_ms': float(np.percentile(latencies, 95)), 'p99_ms': float(np.percentile(latencies, 99)), 'mean_ms': float(latencies.mean())}
+    endpoints = {action: stats([s for s in samples if s[0] == action]) for action in EXPECTED_STATUS if any(s[0] == action for s in samples)}
+    statuses = {}
+    for action, status, _ in samples:
+        if status != EXPECTED_STATUS[action]: statuses[f"{action}:{status}"] = statuses.get(f"{action}:{status}", 0) + 1
+    return {'endpoints': endpoints, 'overall': stats(samples) if samples else None, 'unexpected_statuses': statuses}
+
+def run_level(make_client, sessions, args, restaurant_ids, concurrency):
+    """Runs `concurrency` virtual users for the warm-up plus the measured duration."""
+    mix = dict(item.split('=') for item in args.mix.split(','))
+    actions = list(mix); weights = [float(w) for w in mix.values()]
+    # Users are split between virtual users, so no two threads rate as the same user at once.
+    shards = [sessions[i::concurrency] or sessions for i in range(concurrency)]
+    samples = []; start_at = time.perf_counter() + 0.5
+    warmup_until = start_at + args.warmup; stop_at = warmup_until + args.duration
+    threads = [threading.Thread(target=virtual_user, args=(make_client(), shards[i], args, restaurant_ids, actions, weights, args.seed + i, start_at, warmup_until, stop_at, samples)) for i in range(concurrency)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return dict(concurrency=concurrency, duration_s=args.duration, **summarize(samples, args.duration))
+
+# =======================================================================
+#  Setup
+# =======================================================================
+def prepare(args):
+    """Loads the dataset (unless reused), trains a model if there is none, and returns the sessions and restaurant ids."""
+    from data_store import engine
+    from model_store import MODEL_DIR, load_latest_model
+    from benchmark import prepare_database
+    from train_model import train
+    import pandas as pd
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    prepare_database(args, {})
+    if load_latest_model() is None:
+        print("Training an SVD model for the warm-start users...")
+        with quiet(): train(MODEL_DIR, keep=1, random_state=args.seed)
+    users = pd.read_sql('SELECT id, username FROM "user" ORDER BY id', engine)
+    users = users.sample(n=min(args.sample_users, len(users)), random_state=args.seed)
+    restaurant_ids = pd.read_sql('SELECT id FROM restaurant', engine)['id'].tolist()
+    app = create_app()
+    with app.app_context():
+        # Non-expiring, so long runs never start failing on expired tokens.
+        sessions = [Session(row.id, row.username, create_access_token(identity=str(row.id), expires_delta=False)) for row in users.itertuples()]
+    return app, sessions, restaurant_ids
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0)); return s.getsockname()[1]
+
+def start_gunicorn(args):
+    """Starts run:app under gunicorn on a free loopback port and waits until it answers."""
+    port = free_port(); log_path = os.path.join(BENCHMARK_DIR, 'loadtest-gunicorn.log')
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--threads', str(args.threads), '--bind', f'127.0.0.1:{port}', '--timeout', '120', 'run:app']
+    log = open(log_path, 'w')
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'; deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None: raise RuntimeError(f"gunicorn exited with status {server.returncode}; see {log_path}.")
+        try:
+            status, _ = HttpClient(url, timeout=2).request('GET', '/api/debug')
+            if status == 200: break
+        except OSError: time.sleep(0.2)
+    else:
+        server.terminate(); raise RuntimeError(f"gunicorn did not answer within 60s; see {log_path}.")
+    print(f"Started gunicorn ({args.workers} worker(s) x {args.threads} thread(s)) on {url}, logging to {log_path}.")
+    return server, url
+
+# =======================================================================
+#  Reporting
+# =======================================================================
+def print_level(level, baseline_level=None, tolerance=0.25, floor_ms=1.0):
+    """Prints one concurrency level and returns what regressed against the baseline."""
+    regressions = []
+    print(f"\nconcurrency {level['concurrency']}: {level['overall']['rps']:.1f} req/s, {level['overall']['error_rate']:.1%} errors")
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" + (f"{'base p95':>10}{'change':>9}" if baseline_level else ''))
+    for name, stats in list(level['endpoints'].items()) + [('overall', level['overall'])]:
+        line = f"{name:<12}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>9.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        reference = (baseline_level['endpoints'].get(name) if name != 'overall' else baseline_level['overall']) if baseline_level else None
+        if reference:
+            change = stats['p95_ms'] / reference['p95_ms'] - 1 if reference['p95_ms'] else 0.0
+            slower = change > tolerance and stats['p95_ms'] - reference['p95_ms'] > floor_ms
+            failing = stats['error_rate'] > reference['error_rate'] + 0.01
+            if slower or failing: regressions.append(f"{name}@{level['concurrency']}")
+            line += f"{reference['p95_ms']:>10.1f}{change:>+9.0%}" + ("  ❌ SLOWER" if slower else '') + ("  ❌ ERRORS" if failing else '')
+        print(line)
+    if level['unexpected_statuses']: print(f"unexpected statuses: {level['unexpected_statuses']}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the API with concurrent virtual users, in-process or over HTTP.")
+    parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess', help="Call the app through test clients, or over HTTP.")
+    parser.add_argument('--url', default=None, help="With --mode http, test this running server instead of starting gunicorn.")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes.")
+    parser.add_argument('--threads', type=int, default=1, help="gunicorn threads per worker.")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated numbers of virtual users, run one level after another.")
+    parser.add_argument('--duration', type=float, default=20.0, help="Measured seconds per concurrency level.")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Seconds per level before measuring starts.")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Relative weight of each action (default: {DEFAULT_MIX}).")
+    parser.add_argument('--sample-users', type=int, default=200, help="Users the virtual users log in as.")
+    parser.add_argument('--password', default='default123', help="Password of the sampled users, for /api/login.")
+    parser.add_argument('--meals', type=int, default=10000, help="Synthetic dataset size in meals.")
+    parser.add_argument('--users', type=int, default=None, help="Synthetic users (default: scaled from --meals).")
+    parser.add_argument('--restaurants', type=int, default=None, help="Synthetic restaurants (default: scaled from --meals).")
+    parser.add_argument('--swipes-per-meal', type=float, default=1.0, help="Interaction log rows per meal.")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the dataset, the user sample and the request mix.")
+    parser.add_argument('--database', default=None, help="Database to test against (default: a SQLite file in benchmarks/). Without --reuse its tables are replaced.")
+    parser.add_argument('--reuse', action='store_true', help="Skip generating and loading if the database already holds a dataset.")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="Rows per bulk-load chunk.")
+    parser.add_argument('--output', default=None, help="Result JSON path (default: benchmarks/results-loadtest-<mode>-<meals>.json).")
+    parser.add_argument('--baseline', default=None, help="Baseline JSON to compare p95 and error rates against; exits 1 on a regression.")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the result to benchmarks/loadtest-baseline-<mode>-<meals>.json.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 slowdown before it counts as a regression.")
+    args = parser.parse_args()
+    unknown = set(item.split('=')[0] for item in args.mix.split(',')) - set(EXPECTED_STATUS)
+    if unknown: parser.error(f"unknown action(s) in --mix: {', '.join(sorted(unknown))}")
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    # data_store, model_store and the app config bind their database and model folder on import;
+    # a gunicorn server started from here inherits the same environment.
+    os.environ['DATABASE_URL'] = args.database or f"sqlite:///{os.path.abspath(os.path.join(BENCHMARK_DIR, f'loadtest-{args.meals}.db'))}"
+    os.environ['MODEL_DIR'] = os.path.abspath(os.path.join(BENCHMARK_DIR, f'models-loadtest-{args.meals}'))
+    print(f"--- API Load Test ({args.mode}, ~{args.meals:,} meals) ---")
+    app, sessions, restaurant_ids = prepare(args)
+
+    server = None
+    if args.mode == 'http':
+        if args.url: url = args.url.rstrip('/')
+        else: server, url = start_gunicorn(args)
+        make_client = lambda: HttpClient(url)
+    else:
+        make_client = lambda: InProcessClient(app)
+
+    levels = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            print(f"Running {concurrency} virtual user(s) for {args.warmup:g}s warm-up + {args.duration:g}s...")
+            if args.mode == 'inprocess':
+                with quiet(): levels.append(run_level(make_client, sessions, args, restaurant_ids, concurrency))
+            else: levels.append(run_level(make_client, sessions, args, restaurant_ids, concurrency))
+    finally:
+        if server is not None: server.terminate(); server.wait()
+
+    result = {
+        'format': FORMAT_VERSION, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'mode': args.mode,
+        'server': {'url': args.url} if args.url else {'workers': args.workers, 'threads': args.threads} if args.mode == 'http' else None,
+        'dataset': {'target_meals': args.meals, 'seed': args.seed, 'database': os.environ['DATABASE_URL'].split(':')[0]},
+        'mix': args.mix, 'sample_users': len(sessions),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'levels': levels,
+    }
+    baseline_levels = {}
+    if args.baseline:
+        with open(args.baseline) as f: baseline_levels = {level['concurrency']: level for level in json.load(f)['levels']}
+    regressions = []
+    for level in levels:
+        if level['overall'] is None: print(f"\nconcurrency {level['concurrency']}: no requests completed"); continue
+        regressions += print_level(level, baseline_levels.get(level['concurrency']), args.tolerance)
+    output = args.output or os.path.join(BENCHMARK_DIR, f'results-loadtest-{args.mode}-{args.meals}.json')
+    with open(output, 'w') as f: json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.save_baseline:
+        baseline_path = os.path.join(BENCHMARK_DIR, f'loadtest-baseline-{args.mode}-{args.meals}.json')
+        with open(baseline_path, 'w') as f: json.dump(result, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+    if regressions:
+        print(f"❌ {len(regressions)} endpoint(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+# =======================================================================
+# NomNom AI: Index Migration
+# Creates the secondary indexes declared in app/models.py on a database
+# that was created before they existed. Indexes that are already there
+# are skipped, so it is safe to run on every deploy. Tables are ANALYZEd
+# afterwards so the query planner has statistics to choose them with.
+# It also creates the id_counter table (app/ids.py), which starts empty
+# and needs no backfill; the feature tables come from build_features.py.
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import argparse
+import time
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+from data_store import engine
+from app import db
+from app.models import IdCounter # also registers every model (and its indexes) on db.metadata
+
+def _index_names(conn):
+    # Read from the catalogue directly: SQLAlchemy's reflection skips
+    # expression indexes like lower(username).
+    if engine.dialect.name == 'postgresql': return set(conn.execute(text('SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()')).scalars())
+    return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+
+def migrate_indexes(dry_run=False):
+    print("--- Migrating Database Indexes ---")
+    start = time.time()
+    if not dry_run: IdCounter.__table__.create(engine, checkfirst=True)
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.connect() as conn: existing = _index_names(conn)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables or not table.indexes: continue
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                print(f"-> {index.name}: already exists")
+                continue
+            print(f"-> {index.name}: {'would create' if dry_run else 'creating'}")
+            if not dry_run:
+                with engine.begin() as conn: conn.execute(CreateIndex(index, if_not_exists=True))
+            created.append(table.name)
+    if created and not dry_run:
+        with engine.begin() as conn:
+            for table_name in dict.fromkeys(created): conn.execute(text(f'ANALYZE {engine.dialect.identifier_preparer.quote(table_name)}'))
+    print(f"✅ {len(created)} index(es) {'missing' if dry_run else 'created'} in {time.time() - start:.2f}s.")
+    return created
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create any secondary indexes from app/models.py that the database is missing.")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the indexes that would be created.")
+    args = parser.parse_args()
+    migrate_indexes(dry_run=args.dry_run)
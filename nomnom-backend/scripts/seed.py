@@ -17,7 +17,8 @@ import numpy as np
 
 # --- Application Imports (for factory pattern) ---
 from app import create_app, db, bcrypt
-from app.models import User, Restaurant, Meal, Review, InteractionLog
+from app.models import User, Restaurant, Meal, Review, InteractionLog, RestaurantFeature, MealFeature, ReviewFeature, UserRestaurantStats, UserStats, UserTagStats
+from features import restaurant_features, meal_features, review_features, feature_table_rows, user_restaurant_stats, user_profile_stats
 
 # Create a Flask app instance to work with the database
 app = create_app()
@@ -122,6 +123,17 @@ def seed_data():
                 db.session.add(interaction)
             print(f"-> {len(interactions_df)} interaction logs ready.")
 
+            # --- 6. Materialize Recommender Features ---
+            print("\nPreparing recommender features...")
+            db.session.flush() # feature rows reference the rows staged above
+            for model, key, features_df in [(RestaurantFeature, 'restaurant_id', restaurant_features(restaurants_df)), (MealFeature, 'meal_id', meal_features(meals_df, users_df, restaurants_df)), (ReviewFeature, 'review_id', review_features(reviews_df))]:
+                db.session.add_all([model(**row) for row in feature_table_rows(features_df, key).to_dict('records')])
+            stats_df = user_restaurant_stats(meals_df, interactions_df)
+            db.session.add_all([UserRestaurantStats(**row) for row in stats_df.to_dict('records')])
+            user_stats_df, user_tags_df = user_profile_stats(users_df, meals_df, reviews_df, restaurants_df)
+            db.session.add_all([UserStats(**row) for row in user_stats_df.to_dict('records')] + [UserTagStats(**row) for row in user_tags_df.to_dict('records')])
+            print(f"-> Features ready for {len(restaurants_df)} restaurants, {len(meals_df)} meals and {len(reviews_df)} reviews; {len(stats_df)} profile counter rows; profile stats for {len(user_stats_df)} users.")
+
             # --- FINAL COMMIT ---
             print("\nCommitting all staged data to the database...")
             db.session.commit()
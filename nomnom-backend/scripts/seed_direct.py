@@ -17,6 +17,7 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from flask_bcrypt import Bcrypt
 import numpy as np # Import numpy for NaN checking
+from features import restaurant_features, meal_features, review_features, feature_table_rows, user_restaurant_stats, user_profile_stats
 
 # A simple bcrypt instance for hashing, independent of the Flask app
 bcrypt = Bcrypt()
@@ -112,6 +113,18 @@ def run_seeder():
         interactions_df.to_sql('interaction_log', engine, if_exists='append', index=False)
         print(f"-> Inserted {len(interactions_df)} interactions.")
 
+        # --- Materialized recommender features (see features.py) ---
+        feature_tables = [('restaurant_feature', 'restaurant_id', restaurant_features(restaurants_df)), ('meal_feature', 'meal_id', meal_features(meals_df, users_df, restaurants_df)), ('review_feature', 'review_id', review_features(reviews_df))]
+        for table, key, features_df in feature_tables:
+            feature_table_rows(features_df, key).to_sql(table, engine, if_exists='append', index=False)
+        print(f"-> Inserted recommender features for {len(restaurants_df)} restaurants, {len(meals_df)} meals and {len(reviews_df)} reviews.")
+        stats_df = user_restaurant_stats(meals_df, interactions_df)
+        stats_df.to_sql('user_restaurant_stats', engine, if_exists='append', index=False)
+        print(f"-> Inserted {len(stats_df)} user profile counter rows.")
+        user_stats_df, user_tags_df = user_profile_stats(users_df, meals_df, reviews_df, restaurants_df)
+        user_stats_df.to_sql('user_stats', engine, if_exists='append', index=False); user_tags_df.to_sql('user_tag_stats', engine, if_exists='append', index=False)
+        print(f"-> Inserted profile page stats for {len(user_stats_df)} users ({len(user_tags_df)} tag rows).")
+
         print("\n✅ Seeding complete! All data has been committed.")
 
     except Exception as e:
@@ -0,0 +1,58 @@
+# =======================================================================
+# NomNom AI: Collaborative Filtering Model Trainer
+# Trains the collaborative filtering model (SVD or ALS) out of band and
+# writes a new versioned artifact that the recommender picks up on its
+# next request.
+# Run it on a schedule (e.g. cron) or after large data imports.
+# =======================================================================
+
+# --- Path Correction ---
+# This block allows the script to be run from the 'scripts' folder and still
+# find the main application modules (like 'recommender').
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# ---------------------
+
+import argparse
+import time
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+from data_store import load_snapshot
+from snapshot_files import read_snapshot
+from model_store import MODEL_DIR, save_model, prune_artifacts
+from recommender import train_svd_model, train_als_model
+
+def train(model_dir=MODEL_DIR, keep=5, random_state=None, engine='svd', threads=None, snapshot_path=None):
+    print(f"--- Starting {engine.upper()} Model Training ---")
+    start = time.time()
+    # An exported snapshot ('' for the newest) saves reading every table from the database.
+    snapshot = read_snapshot(snapshot_path or None) if snapshot_path is not None else load_snapshot()
+    print(f"Data loaded: {len(snapshot.reviews)} reviews, {len(snapshot.meals)} meals, {len(snapshot.interactions)} interactions.")
+
+    if engine == 'als':
+        model = train_als_model(snapshot.reviews, snapshot.meals, snapshot.interactions, snapshot.restaurants, random_state=random_state, threads=threads)
+    else:
+        model = train_svd_model(snapshot.reviews, random_state=random_state)
+    if model is None or len(model.user_ids) == 0:
+        print("No training data found. Nothing to train.")
+        return None
+
+    path = save_model(model, model_dir)
+    prune_artifacts(keep, model_dir, engine)
+    print(f"✅ Model trained on {len(model.user_ids)} users x {len(model.item_ids)} restaurants in {time.time() - start:.2f}s.")
+    print(f"Artifact written to {path}")
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train a collaborative filtering model and write a versioned artifact.")
+    parser.add_argument('--engine', choices=['svd', 'als'], default='svd', help="Candidate engine to train.")
+    parser.add_argument('--threads', type=int, default=None, help="Worker threads for ALS (default: ALS_THREADS or all cores).")
+    parser.add_argument('--model-dir', default=MODEL_DIR, help="Directory the artifacts are written to.")
+    parser.add_argument('--keep', type=int, default=5, help="Number of most recent artifacts to keep.")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for reproducible training.")
+    parser.add_argument('--snapshot', nargs='?', const='', default=None, metavar='PATH', help="Train from an exported snapshot (scripts/export_snapshot.py) instead of the database; without PATH, the newest one.")
+    args = parser.parse_args()
+    train(args.model_dir, args.keep, args.seed, args.engine, args.threads, args.snapshot)
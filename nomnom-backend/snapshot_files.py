@@ -0,0 +1,122 @@
+# ----------------------------------------------------------------------
+# FILE: snapshot_files.py (Columnar On-Disk Snapshots)
+# ----------------------------------------------------------------------
+# Offline jobs (training, evaluation) and freshly started workers need the
+# whole data snapshot, and reading it through pd.read_sql_table means
+# streaming every row over the wire and re-inferring dtypes. Instead,
+# scripts/export_snapshot.py writes the frames of a data_store.Snapshot
+# to a versioned directory with one .npy file per column, plus a
+# manifest.json describing how to rebuild each frame.
+#
+# Numeric, boolean and datetime columns are stored as-is and read back
+# memory-mapped, so loading them costs no copy. day, meal_time and the tag
+# columns are stored as categorical codes plus a category list. Other text
+# columns are stored as fixed-width unicode arrays and converted back to
+# their original dtype on load. Snapshots are named snapshot-<version>,
+# where the version is a UTC timestamp, and only the newest few are kept.
+# The manifest also records full_version, the version of the last export
+# that read every table in full (see data_store.refresh_snapshot).
+# ----------------------------------------------------------------------
+import os
+import glob
+import json
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from data_store import Snapshot
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+CATEGORICAL_COLUMNS = {'day', 'meal_time', 'tag_1', 'tag_2', 'tag_3'}
+FORMAT_VERSION = 1
+VERSION_FORMAT = '%Y%m%dT%H%M%S%fZ'
+
+# --- Columns ---
+def _write_column(path, series):
+    """Saves one column and returns its manifest entry."""
+    values = series.to_numpy()
+    if series.name in CATEGORICAL_COLUMNS or isinstance(series.dtype, pd.CategoricalDtype):
+        categorical = pd.Categorical(series)
+        np.save(path, categorical.codes)
+        return {'kind': 'category', 'categories': [str(c) for c in categorical.categories]}
+    if values.dtype.kind in 'biufmM':
+        np.save(path, values)
+        return {'kind': 'array', 'dtype': str(series.dtype)}
+    missing = series.isna().to_numpy()
+    if all(isinstance(v, str) for v in values[~missing]):
+        np.save(path, np.where(missing, '', values).astype(str)); np.save(path[:-4] + '.mask.npy', missing)
+        return {'kind': 'string', 'dtype': str(series.dtype)}
+    np.save(path, values, allow_pickle=True)
+    return {'kind': 'object', 'dtype': str(series.dtype)}
+
+def _read_column(path, entry, mmap):
+    if entry['kind'] == 'category':
+        return pd.Categorical.from_codes(np.load(path, mmap_mode=mmap), entry['categories'])
+    if entry['kind'] == 'array':
+        return np.load(path, mmap_mode=mmap)
+    if entry['kind'] == 'string':
+        values = np.load(path).astype(object); values[np.load(path[:-4] + '.mask.npy')] = None
+        return pd.array(values, dtype=entry['dtype']) if entry['dtype'] != 'object' else values
+    return np.load(path, allow_pickle=True)
+
+# --- Export ---
+def export_snapshot(snapshot, snapshot_dir=SNAPSHOT_DIR, keep=3, full_version=None):
+    """
+    Writes every frame of `snapshot` to a new snapshot-<version> directory
+    and returns its path. Pass the full_version of the snapshot it was
+    refreshed from; without one it is recorded as a full load.
+    """
+    version = datetime.now(timezone.utc).strftime(VERSION_FORMAT)
+    final_path = os.path.join(snapshot_dir, f'snapshot-{version}'); tmp_path = final_path + '.tmp'
+    os.makedirs(tmp_path)
+    manifest = {'format': FORMAT_VERSION, 'version': version, 'full_version': full_version or version, 'frames': {}}
+    for frame in Snapshot._fields[1:]:
+        df = getattr(snapshot, frame).reset_index(drop=True); columns = []
+        for i, column in enumerate(df.columns):
+            entry = _write_column(os.path.join(tmp_path, f'{frame}.{i}.npy'), df[column])
+            columns.append(dict(entry, name=column, file=f'{frame}.{i}.npy'))
+        manifest['frames'][frame] = {'rows': len(df), 'columns': columns}
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f: json.dump(manifest, f, indent=1)
+    # Readers only ever see complete snapshots.
+    os.rename(tmp_path, final_path)
+    prune_snapshots(snapshot_dir, keep)
+    return final_path
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR):
+    """Complete snapshot directories, oldest first."""
+    return sorted(p for p in glob.glob(os.path.join(snapshot_dir, 'snapshot-*')) if not p.endswith('.tmp') and os.path.exists(os.path.join(p, 'manifest.json')))
+
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, keep=3):
+    for path in list_snapshots(snapshot_dir)[:-keep] if keep else []:
+        shutil.rmtree(path, ignore_errors=True)
+
+# --- Load ---
+def read_manifest(path):
+    with open(os.path.join(path, 'manifest.json')) as f: manifest = json.load(f)
+    manifest.setdefault('full_version', manifest['version']) # written before refreshes existed
+    return manifest
+
+def version_age(version):
+    """Seconds since a snapshot version's timestamp."""
+    return (datetime.now(timezone.utc) - datetime.strptime(version, VERSION_FORMAT).replace(tzinfo=timezone.utc)).total_seconds()
+
+def read_snapshot(path=None, snapshot_dir=SNAPSHOT_DIR, mmap=True):
+    """
+    Loads a snapshot directory (the newest in snapshot_dir by default) as a
+    data_store.Snapshot whose version is the snapshot's timestamp. With mmap,
+    numeric columns and categorical codes stay backed by the files; treat
+    the frames as read-only, like every shared snapshot.
+    """
+    if path is None:
+        snapshots = list_snapshots(snapshot_dir)
+        if not snapshots: raise FileNotFoundError(f"No snapshot found in {snapshot_dir}. Run scripts/export_snapshot.py first.")
+        path = snapshots[-1]
+    manifest = read_manifest(path)
+    frames = {}
+    for frame, spec in manifest['frames'].items():
+        data = {c['name']: _read_column(os.path.join(path, c['file']), c, 'r' if mmap else None) for c in spec['columns']}
+        frames[frame] = pd.DataFrame(data, copy=False) if data else pd.DataFrame(index=range(spec['rows']))
+    print(f"[DEBUG] Loaded snapshot {manifest['version']} from {path}.")
+    return Snapshot(manifest['version'], **{frame: frames[frame] for frame in Snapshot._fields[1:]})
@@ -0,0 +1,42 @@
+# =======================================================================
+# tests/conftest.py
+# -----------------------------------------------------------------------
+# Every test runs against a throwaway SQLite database seeded from data/
+# with scripts/bulk_load.py. data_store, model_store and the app config
+# bind their database and folders on import, so the environment is set
+# here, before any application module is imported.
+# =======================================================================
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, 'scripts')]
+
+_tmp = tempfile.mkdtemp(prefix='nomnom-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'nomnom.db')}"
+os.environ['MODEL_DIR'] = os.path.join(_tmp, 'models')
+os.environ['INTERACTION_JOURNAL_DIR'] = os.path.join(_tmp, 'interaction_journal')
+os.environ['SNAPSHOT_DIR'] = os.path.join(_tmp, 'snapshots')
+
+import io
+import contextlib
+import pytest
+
+def seed():
+    """Loads data/*.csv (and the recommender features) into the test database, replacing what's there."""
+    from bulk_load import bulk_load
+    import data_store
+    with contextlib.redirect_stdout(io.StringIO()): bulk_load(mode='replace', workers=1)
+    data_store._existing_tables.clear()
+    return data_store.engine
+
+@pytest.fixture(scope='session')
+def seeded_db():
+    return seed()
+
+@pytest.fixture
+def reseed(seeded_db):
+    """For tests that change the seeded data: puts it back afterwards for the tests that follow."""
+    try: yield seeded_db
+    finally: seed()
@@ -0,0 +1,36 @@
+# =======================================================================
+# tests/test_bulk_load.py
+# -----------------------------------------------------------------------
+# Reloading users.csv into a live database with append and upsert.
+# =======================================================================
+import io
+import contextlib
+
+import pandas as pd
+import pytest
+from flask_bcrypt import Bcrypt
+from sqlalchemy import text
+
+from bulk_load import DATA_DIR, bulk_load
+
+STORED_HASH = Bcrypt().generate_password_hash('changed-in-the-app').decode('utf-8')
+
+def _user(engine, user_id):
+    with engine.connect() as conn: return conn.execute(text('SELECT name, password, created_at FROM "user" WHERE id = :id'), {'id': user_id}).one_or_none()
+
+@pytest.mark.parametrize('mode', ['append', 'upsert'])
+def test_reload_keeps_existing_passwords(reseed, tmp_path, mode):
+    with reseed.begin() as conn: conn.execute(text("UPDATE \"user\" SET password = :p WHERE id = 'USR_001'"), {'p': STORED_HASH})
+    before = _user(reseed, 'USR_001')
+
+    users = pd.read_csv(f'{DATA_DIR}/users.csv', dtype=str).head(2)
+    users.loc[0, 'name'] = 'Renamed In CSV'
+    new_user = users.iloc[[1]].assign(id='USR_NEW', username='bulk_new', email='bulk_new@example.com', password='plain-secret')
+    pd.concat([users, new_user]).to_csv(tmp_path / 'users.csv', index=False)
+    with contextlib.redirect_stdout(io.StringIO()): bulk_load(str(tmp_path), mode=mode, workers=1, features=False)
+
+    after = _user(reseed, 'USR_001')
+    assert after.password == before.password and after.created_at == before.created_at
+    assert after.name == ('Renamed In CSV' if mode == 'upsert' else before.name)
+    added = _user(reseed, 'USR_NEW')
+    assert added.password.startswith('$2') and Bcrypt().check_password_hash(added.password, 'plain-secret')
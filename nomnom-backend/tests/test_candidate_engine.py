@@ -0,0 +1,20 @@
+# =======================================================================
+# tests/test_candidate_engine.py
+# -----------------------------------------------------------------------
+# A model handed to recommend_for_active_user is used by its own engine.
+# =======================================================================
+import io
+import contextlib
+
+import recommender
+from data_store import get_catalogue, load_snapshot
+
+def test_svd_model_is_used_as_svd_when_als_is_configured(seeded_db, monkeypatch):
+    monkeypatch.setattr(recommender, 'CANDIDATE_ENGINE', 'als')
+    def no_als(*args, **kwargs): raise AssertionError('an SVD model went through get_als_recs')
+    monkeypatch.setattr(recommender, 'get_als_recs', no_als)
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        snapshot = load_snapshot(); cf_model = recommender.train_svd_model(snapshot.reviews, random_state=42)
+        user = snapshot.users.set_index('id').loc['USR_001'].to_dict() | {'id': 'USR_001'}
+        recs = recommender.recommend_for_active_user(user, get_catalogue(), snapshot.interactions, snapshot.reviews, snapshot.meals, context=('Tuesday', 'Lunch', 12.5), cf_model=cf_model)
+    assert recs and 'Warm-start (SVD)' in out.getvalue()
@@ -0,0 +1,62 @@
+# =======================================================================
+# tests/test_data_store.py
+# -----------------------------------------------------------------------
+# The process-wide caches in data_store, and refreshing an exported
+# snapshot with only the rows written since.
+# =======================================================================
+import io
+import datetime
+import contextlib
+
+import pandas as pd
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+from app import create_app
+from data_store import load_snapshot, meal_time_counts, meals_changed, refresh_snapshot
+from export_snapshot import export
+from interaction_queue import get_interaction_queue
+from snapshot_files import export_snapshot, read_manifest, read_snapshot
+
+def test_meal_time_counts_refresh_after_meals_changed(seeded_db):
+    meals_changed(); before = meal_time_counts('Lunch').get('RST_010', 0)
+    with seeded_db.begin() as conn:
+        conn.execute(text("INSERT INTO meal (id, user_id, restaurant_id, date, day, meal_time) VALUES ('MEAL_TEST_1', 'USR_001', 'RST_010', :d, 'Tuesday', 'Lunch')"), {'d': datetime.date(2025, 7, 1)})
+    try:
+        assert meal_time_counts('Lunch').get('RST_010', 0) == before
+        meals_changed()
+        assert meal_time_counts('Lunch').get('RST_010', 0) == before + 1
+    finally:
+        with seeded_db.begin() as conn: conn.execute(text("DELETE FROM meal WHERE id = 'MEAL_TEST_1'"))
+        meals_changed()
+
+SORT_KEYS = {'user_restaurant_stats': ['user_id', 'restaurant_id']}
+
+def _frames(path):
+    snapshot = read_snapshot(path, mmap=False)
+    return {name: getattr(snapshot, name).sort_values(SORT_KEYS.get(name, ['id'])).reset_index(drop=True) for name in snapshot._fields[1:]}
+
+def test_refreshed_export_matches_full_export(reseed, tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = export(str(tmp_path / 'refreshed'))
+        app = create_app(); client = app.test_client()
+        with app.app_context(): headers = {'Authorization': f"Bearer {create_access_token(identity='USR_001')}"}
+        assert client.post('/api/register', json={'username': 'delta', 'fullName': 'Delta User', 'email': 'delta@example.com', 'password': 'pw', 'dob': '2000-01-01'}).status_code == 201
+        for restaurant_id, rating in [('RST_010', 4), ('RST_010', 2), ('RST_020', 5)]:
+            assert client.post('/api/rate', json={'restaurant_id': restaurant_id, 'rating': rating}, headers=headers).status_code == 201
+        assert client.post('/api/interactions', json={'events': [{'restaurant_id': 'RST_030', 'action': 'decline'}, {'restaurant_id': 'RST_031', 'action': 'accept'}]}, headers=headers).status_code == 202
+        get_interaction_queue().flush()
+        refreshed = export(str(tmp_path / 'refreshed'))
+        full = export_snapshot(load_snapshot(), str(tmp_path / 'full'))
+    assert read_manifest(refreshed)['full_version'] == read_manifest(first)['version']
+    expected = _frames(full)
+    for name, frame in _frames(refreshed).items():
+        pd.testing.assert_frame_equal(frame, expected[name], obj=name)
+
+def test_refresh_needs_full_load_after_delete(reseed, tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = export_snapshot(load_snapshot(), str(tmp_path))
+        with reseed.begin() as conn:
+            meal_id = conn.execute(text('SELECT id FROM meal LIMIT 1')).scalar()
+            conn.execute(text('DELETE FROM meal_feature WHERE meal_id = :id'), {'id': meal_id}); conn.execute(text('DELETE FROM meal WHERE id = :id'), {'id': meal_id})
+        assert refresh_snapshot(read_snapshot(path)) is None
@@ -0,0 +1,13 @@
+# =======================================================================
+# tests/test_explain_queries.py
+# -----------------------------------------------------------------------
+# The hot per-request queries are served by their indexes.
+# =======================================================================
+import io
+import contextlib
+
+from explain_queries import explain_queries
+
+def test_hot_queries_use_their_indexes(seeded_db):
+    with contextlib.redirect_stdout(io.StringIO()) as out: failures = explain_queries()
+    assert failures == [], out.getvalue()
@@ -0,0 +1,23 @@
+# =======================================================================
+# tests/test_geo.py
+# -----------------------------------------------------------------------
+# The users x restaurants matrix agrees with the per-user distances.
+# =======================================================================
+import numpy as np
+import pandas as pd
+
+from geo import distances_from, get_distance_matrix
+
+USERS = pd.DataFrame({'id': ['A', 'B', 'C', 'D'], 'latitude': [4.38, None, np.nan, 3.14], 'longitude': [100.97, 100.9, 101.0, 101.69]}).astype({'latitude': object})
+RESTAURANTS = pd.DataFrame({'id': ['R1', 'R2', 'R3'], 'latitude': [4.37, np.nan, 4.36], 'longitude': [100.98, 101.0, 100.97]})
+
+def test_matrix_rows_match_distances_from():
+    matrix = get_distance_matrix(USERS, RESTAURANTS)
+    for user in USERS.to_dict('records'):
+        np.testing.assert_array_equal(matrix.row(user['id']), distances_from(user['latitude'], user['longitude'], RESTAURANTS).to_numpy())
+    assert matrix.row('unknown') is None
+
+def test_matrix_is_cached_per_frame():
+    matrix = get_distance_matrix(USERS, RESTAURANTS)
+    assert get_distance_matrix(USERS, RESTAURANTS) is matrix
+    assert get_distance_matrix(USERS, RESTAURANTS.copy()) is not matrix
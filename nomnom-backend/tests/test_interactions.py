@@ -0,0 +1,34 @@
+# =======================================================================
+# tests/test_interactions.py
+# -----------------------------------------------------------------------
+# Validation of swipe events sent to /api/interactions.
+# =======================================================================
+import io
+import datetime
+import contextlib
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from interaction_queue import swipe_event
+
+NOW = datetime.datetime(2025, 7, 1, 12)
+
+@pytest.mark.parametrize('value', [float('inf'), float('-inf'), float('nan'), 1.5, True, '3'])
+def test_swipe_event_rejects_non_integer_numbers(value):
+    with pytest.raises(ValueError, match='recommendation_rank must be an integer'):
+        swipe_event('USR_001', {'restaurant_id': 'RST_001', 'action': 'like', 'rank': value}, NOW)
+
+def test_swipe_event_accepts_integral_numbers():
+    event = swipe_event('USR_001', {'restaurant_id': 'RST_001', 'action': 'like', 'rank': 3.0, 'swipe_time_sec': 2}, NOW)
+    assert (event['recommendation_rank'], event['swipe_time_sec']) == (3, 2)
+
+@pytest.mark.parametrize('literal', ['Infinity', '-Infinity', 'NaN'])
+def test_non_finite_json_is_a_bad_request(seeded_db, literal):
+    app = create_app()
+    with app.app_context(): token = create_access_token(identity='USR_001')
+    body = f'{{"events": [{{"restaurant_id": "RST_001", "action": "like", "swipe_time_sec": {literal}}}]}}'
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = app.test_client().post('/api/interactions', data=body, content_type='application/json', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400 and response.get_json() == {'message': 'swipe_time_sec must be an integer'}
@@ -0,0 +1,29 @@
+# =======================================================================
+# tests/test_model_store.py
+# -----------------------------------------------------------------------
+# Folding users into the shared serving model from several threads.
+# =======================================================================
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from model_store import FactorModel, save_model, load_latest_model, fold_in_user
+
+def test_concurrent_fold_ins_keep_every_row(tmp_path):
+    rng = np.random.default_rng(0); n_users, n_items, k = 30, 40, 8
+    item_ids = [f'RST_{i:03d}' for i in range(n_items)]
+    save_model(FactorModel([f'USR_{u:03d}' for u in range(n_users)], item_ids, 4.0, rng.normal(size=n_users), rng.normal(size=n_items), rng.normal(size=(n_users, k)), rng.normal(size=(n_items, k))), str(tmp_path))
+
+    # New users (appends) and existing ones (in-place rows), folded in at once.
+    users = [f'USR_NEW_{u:03d}' for u in range(40)] + [f'USR_{u:03d}' for u in range(0, n_users, 3)]
+    def fold(seed, user_id):
+        items = np.random.default_rng(seed).choice(item_ids, size=5, replace=False).tolist()
+        return user_id, fold_in_user(user_id, items, [5, 6, 3, 7, 4], str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = dict(pool.map(fold, range(len(users)), users))
+
+    model = load_latest_model(str(tmp_path))
+    assert len(model.user_ids) == len(model.bu) == len(model.pu) == n_users + 40
+    for user_id, (bu, pu) in results.items():
+        u = model.user_index[user_id]
+        assert model.user_ids[u] == user_id and model.bu[u] == bu and np.array_equal(model.pu[u], pu)
@@ -0,0 +1,26 @@
+# =======================================================================
+# tests/test_new_user.py
+# -----------------------------------------------------------------------
+# Whether a user is served cold-start depends on their own history only.
+# =======================================================================
+import re
+import datetime
+from sqlalchemy import text
+
+from recommender import get_recommendations
+
+def _served_as_new(user_id, capsys):
+    capsys.readouterr()
+    get_recommendations(user_id)
+    return re.search(rf"Running model for user {user_id} \(New User: (\w+)\)", capsys.readouterr().out).group(1) == 'True'
+
+def test_another_users_swipe_keeps_warm_users_warm(seeded_db, capsys):
+    with seeded_db.begin() as conn: conn.execute(text('DELETE FROM interaction_log'))
+    assert not _served_as_new('USR_001', capsys)
+    with seeded_db.begin() as conn:
+        conn.execute(text("INSERT INTO interaction_log (id, user_id, restaurant_id, recommendation_rank, user_action, timestamp) VALUES ('INT_TEST_1', 'USR_002', 'RST_010', 1, 'decline', :ts)"), {'ts': datetime.datetime(2025, 7, 1, 12)})
+    try:
+        assert not _served_as_new('USR_001', capsys)
+        assert not _served_as_new('USR_002', capsys)
+    finally:
+        with seeded_db.begin() as conn: conn.execute(text("DELETE FROM interaction_log WHERE id = 'INT_TEST_1'"))
@@ -0,0 +1,58 @@
+# =======================================================================
+# tests/test_rate.py
+# -----------------------------------------------------------------------
+# The write endpoints on a database that hasn't run
+# scripts/build_features.py yet.
+# =======================================================================
+import io
+import contextlib
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+import data_store
+from app import create_app
+
+FEATURE_TABLES = ['meal_feature', 'review_feature', 'user_restaurant_stats', 'user_stats', 'user_tag_stats']
+
+@pytest.fixture
+def without_feature_tables(reseed):
+    with reseed.begin() as conn:
+        for table in FEATURE_TABLES: conn.execute(text(f'DROP TABLE {table}'))
+    data_store._existing_tables.clear()
+    return reseed
+
+def _meal_count(engine):
+    with engine.connect() as conn: return conn.execute(text("SELECT COUNT(*) FROM meal WHERE user_id = 'USR_001'")).scalar()
+
+def test_rate_without_feature_tables(without_feature_tables):
+    app = create_app(); meals_before = _meal_count(without_feature_tables)
+    with app.app_context(): token = create_access_token(identity='USR_001')
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = app.test_client().post('/api/rate', json={'restaurant_id': 'RST_010', 'rating': 4}, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 201, response.get_json()
+    assert _meal_count(without_feature_tables) == meals_before + 1
+
+def test_register_without_feature_tables(without_feature_tables):
+    app = create_app()
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = app.test_client()
+        response = client.post('/api/register', json={'username': 'nofeatures', 'fullName': 'No Features', 'email': 'nofeatures@example.com', 'password': 'pw', 'dob': '2000-01-01'})
+        assert response.status_code == 201, response.get_json()
+        token = client.post('/api/login', json={'username': 'nofeatures', 'password': 'pw'}).get_json()['access_token']
+        profile = client.get('/api/profile', headers={'Authorization': f'Bearer {token}'})
+    assert profile.status_code == 200 and profile.get_json()['stats']['total_meals'] == 0
+
+def test_writes_without_id_counter(reseed):
+    with reseed.begin() as conn: conn.execute(text('DROP TABLE id_counter'))
+    data_store._existing_tables.clear()
+    app = create_app()
+    with app.app_context(): token = create_access_token(identity='USR_001')
+    headers = {'Authorization': f'Bearer {token}'}
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = app.test_client()
+        registered = client.post('/api/register', json={'username': 'nocounter', 'fullName': 'No Counter', 'email': 'nocounter@example.com', 'password': 'pw', 'dob': '2000-01-01'})
+        rated = client.post('/api/rate', json={'restaurant_id': 'RST_010', 'rating': 4}, headers=headers)
+        swiped = client.post('/api/interactions', json={'events': [{'restaurant_id': 'RST_010', 'action': 'decline'}]}, headers=headers)
+    assert (registered.status_code, rated.status_code, swiped.status_code) == (201, 201, 202), (registered.get_json(), rated.get_json(), swiped.get_json())
@@ -0,0 +1,49 @@
+# =======================================================================
+# tests/test_scoring.py
+# -----------------------------------------------------------------------
+# calculate_relevance_scores must give, row for row, what the scalar
+# calculate_relevance_score gives, missing values included.
+# =======================================================================
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import get_catalogue
+from features import RESTAURANT_FEATURES, with_restaurant_features
+from recommender import calculate_relevance_score, calculate_relevance_scores
+
+CONTEXTS = [('Saturday', 'Lunch', 12.5), ('Tuesday', 'Dinner', 19.0)]
+
+PROFILES = {
+    'empty': {},
+    'budget': {'top_tags': ['Thai', 'Malay'], 'disliked_tags': ['Western'], 'avg_price': 12.0, 'weekday_travel_dist': 3.0, 'weekend_travel_dist': 25.0},
+    'spender': {'top_tags': ['Cafe'], 'disliked_tags': ['Thai', 'Street-Side'], 'avg_price': 35.0, 'weekday_travel_dist': 8.0, 'weekend_travel_dist': 12.0},
+    'unknown_price': {'top_tags': ['Malay'], 'disliked_tags': [], 'avg_price': float('nan'), 'weekday_travel_dist': 5.0, 'weekend_travel_dist': 15.0},
+}
+
+USERS = {
+    'located': {'id': 'USR_TEST', 'latitude': 4.3685, 'longitude': 100.9715},
+    'unlocated': {'id': 'USR_TEST', 'latitude': None, 'longitude': None},
+}
+
+@pytest.fixture(scope='module')
+def restaurants(seeded_db):
+    """The catalogue plus rows with numeric, half-missing and missing prices and review counts."""
+    catalogue = get_catalogue()
+    extra = catalogue.head(6).copy()
+    extra['id'] = [f'RST_TEST_{i}' for i in range(len(extra))]
+    extra['price_min'] = ['8', '15.50', None, '30', 'RM5.00', 'n/a']
+    extra['price_max'] = ['14', '22', '18', None, '9', '40']
+    extra['num_google_reviews'] = pd.Series([np.nan, None, 0, 12, 2500, np.nan], index=extra.index, dtype=object)
+    return pd.concat([catalogue, extra], ignore_index=True).drop(columns=RESTAURANT_FEATURES)
+
+@pytest.mark.parametrize('stored_features', [True, False], ids=['features', 'raw'])
+@pytest.mark.parametrize('context', CONTEXTS, ids=[c[0] for c in CONTEXTS])
+@pytest.mark.parametrize('profile', PROFILES.values(), ids=PROFILES.keys())
+@pytest.mark.parametrize('user', USERS.values(), ids=USERS.keys())
+@pytest.mark.parametrize('predicted_tag', [None, 'Thai', 'Cafe'])
+def test_batch_scores_match_scalar(restaurants, stored_features, context, profile, user, predicted_tag):
+    df = with_restaurant_features(restaurants, None) if stored_features else restaurants
+    expected = [calculate_relevance_score(row, user, profile, context, predicted_tag) for _, row in df.iterrows()]
+    actual = calculate_relevance_scores(df, user, profile, context, predicted_tag)
+    assert actual == pytest.approx(expected, nan_ok=True)